@@ -15,8 +15,13 @@ function StudentQueryApp() {
   
   const [chatHistoryList, setChatHistoryList] = useState([]);
   const [currentConversationId, setCurrentConversationId] = useState(null);
+  // Both history endpoints return one page at a time; the cursor for the next
+  // page comes back in the X-Next-Cursor header and is absent on the last page.
+  const [conversationsCursor, setConversationsCursor] = useState(null);
+  const [messagesCursor, setMessagesCursor] = useState(null);
 
   const messagesEndRef = useRef(null);
+  const keepScrollRef = useRef(false);
 
   useEffect(() => {
     const storedToken = localStorage.getItem('authToken');
@@ -33,13 +38,20 @@ function StudentQueryApp() {
   }, []);
 
   useEffect(() => {
+    // Loading earlier messages should not jump to the bottom of the chat
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
-  const fetchConversationsList = async () => {
+  const fetchConversationsList = async (cursor = null) => {
     try {
-      const response = await apiClient.get("/conversations");
-      setChatHistoryList(response.data || []);
+      const response = await apiClient.get("/conversations", { params: cursor ? { cursor } : {} });
+      const page = response.data || [];
+      setChatHistoryList((prev) => (cursor ? [...prev, ...page.filter(c => !prev.some(p => p.id === c.id))] : page));
+      setConversationsCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error("Error fetching chat history list:", error.message);
     }
@@ -49,9 +61,11 @@ function StudentQueryApp() {
     if (loading) return;
     setLoading(true);
     setMessages([]);
+    setMessagesCursor(null);
     try {
       const response = await apiClient.get(`/conversation/${conversationId}`);
       setMessages(response.data);
+      setMessagesCursor(response.headers['x-next-cursor'] || null);
       setCurrentConversationId(conversationId);
     } catch (error) {
       console.error("Error fetching conversation:", error);
@@ -61,8 +75,26 @@ function StudentQueryApp() {
     }
   };
 
+  const handleLoadEarlierMessages = async () => {
+    if (loading || !messagesCursor || !currentConversationId) return;
+    setLoading(true);
+    try {
+      const response = await apiClient.get(`/conversation/${currentConversationId}`, {
+        params: { before: messagesCursor },
+      });
+      keepScrollRef.current = true;
+      setMessages((prev) => [...(response.data || []), ...prev]);
+      setMessagesCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error("Error fetching earlier messages:", error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleNewChat = () => {
     setMessages([]);
+    setMessagesCursor(null);
     setCurrentConversationId(null);
     setQuery('');
   };
@@ -132,6 +164,8 @@ function StudentQueryApp() {
         onSelectHistory={handleSelectConversation}
         onNewChat={handleNewChat}
         activeConversationId={currentConversationId}
+        hasMoreHistory={Boolean(conversationsCursor)}
+        onLoadMoreHistory={() => fetchConversationsList(conversationsCursor)}
       />
       
       <div className="flex flex-grow flex-col">
@@ -147,6 +181,17 @@ function StudentQueryApp() {
           ) : (
             // Chat messages
             <div className="mx-auto w-full max-w-3xl space-y-6">
+              {messagesCursor && (
+                <div className="flex justify-center">
+                  <button
+                    onClick={handleLoadEarlierMessages}
+                    disabled={loading}
+                    className="rounded-md border border-gray-600 px-3 py-1 text-sm text-gray-300 transition-colors hover:bg-gray-700 disabled:cursor-not-allowed"
+                  >
+                    Load earlier messages
+                  </button>
+                </div>
+              )}
               {messages.map((msg, index) => (
                 <div key={index} className={`flex items-start gap-3 ${msg.type === 'user' ? 'justify-end' : 'justify-start'}`}>
                   {/* Message Bubble */}
@@ -3,7 +3,7 @@ import { useState } from "react";
 
 // NOTE: Remember to remove the import for "./Sidebar.css"
 
-const Sidebar = ({ history, onSelectHistory, onNewChat, activeConversationId }) => {
+const Sidebar = ({ history, onSelectHistory, onNewChat, activeConversationId, hasMoreHistory, onLoadMoreHistory }) => {
   // The sidebar is expanded by default. It manages its own state.
   const [expanded, setExpanded] = useState(true);
 
@@ -72,6 +72,15 @@ const Sidebar = ({ history, onSelectHistory, onNewChat, activeConversationId })
               <span className={!expanded ? 'sr-only' : ''}>{chat.title}</span>
             </button>
           ))}
+          {/* Older conversations are loaded a page at a time */}
+          {expanded && hasMoreHistory && (
+            <button
+              className="w-full rounded-md p-2 text-left text-sm text-gray-400 transition-colors hover:bg-gray-800"
+              onClick={onLoadMoreHistory}
+            >
+              Load more
+            </button>
+          )}
         </div>
       </div>
 
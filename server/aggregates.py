@@ -0,0 +1,382 @@
+import logging
+import re
+import threading
+import time
+
+# Materialized views behind the common dashboard aggregates. Each needs a
+# unique index so it can be refreshed CONCURRENTLY, without blocking readers.
+VIEWS = [
+    ("chatbot_agg_student_totals", """
+        SELECT st.id AS student_id, st.name, st.roll_no, st.dept,
+               SUM(s.total_mark) AS total_marks, COUNT(s.total_mark) AS mark_count
+        FROM subjects s JOIN students st ON s.student_id = st.id
+        GROUP BY st.id, st.name, st.roll_no, st.dept
+    """, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS chatbot_agg_student_totals_pk ON chatbot_agg_student_totals (student_id)",
+        "CREATE INDEX IF NOT EXISTS chatbot_agg_student_totals_rank_idx ON chatbot_agg_student_totals (total_marks DESC)",
+        "CREATE INDEX IF NOT EXISTS chatbot_agg_student_totals_dept_idx "
+        "ON chatbot_agg_student_totals (dept, total_marks DESC)",
+    ]),
+    # subject_rows counts joined rows and mark_count non-NULL marks, so AVG
+    # (NULL for a department whose marks are all NULL) can be reproduced exactly
+    ("chatbot_agg_dept_stats", """
+        SELECT st.dept, COUNT(*) AS student_count, COALESCE(SUM(t.subject_rows), 0) AS subject_rows,
+               SUM(t.mark_sum) AS mark_sum, COALESCE(SUM(t.mark_count), 0) AS mark_count
+        FROM students st LEFT JOIN (
+            SELECT student_id, COUNT(*) AS subject_rows, SUM(total_mark) AS mark_sum, COUNT(total_mark) AS mark_count
+            FROM subjects GROUP BY student_id
+        ) t ON t.student_id = st.id
+        GROUP BY st.dept
+    """, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS chatbot_agg_dept_stats_pk ON chatbot_agg_dept_stats (dept)",
+    ]),
+    ("chatbot_agg_subject_stats", """
+        SELECT subject_name, MAX(total_mark) AS max_mark, MIN(total_mark) AS min_mark,
+               SUM(total_mark) AS mark_sum, COUNT(total_mark) AS mark_count
+        FROM subjects
+        GROUP BY subject_name
+    """, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS chatbot_agg_subject_stats_pk ON chatbot_agg_subject_stats (subject_name)",
+    ]),
+]
+SOURCE_TABLES = {"students", "subjects"}
+
+# Refreshes are shared by every server process through the database: the state
+# row records when the views were last refreshed and up to which write, and the
+# sequence is bumped for every reported write to the source tables.
+STATE_TABLE = "chatbot_agg_refresh"
+WRITES_SEQUENCE = "chatbot_agg_writes"
+LOCK_KEY = 0x63686167  # advisory lock held while creating or refreshing the views
+
+STATE_SQL = f"""
+    SELECT r.refreshed_at, EXTRACT(EPOCH FROM clock_timestamp() - r.refreshed_at), r.write_seq,
+           (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {WRITES_SEQUENCE})
+    FROM {STATE_TABLE} r
+"""
+
+_COL = r"(?:\w+\.)?"
+_ALIAS = r"(?: as (?P<alias>\w+))?"
+_JOIN = (r"from subjects (?:as )?\w+ join students (?:as )?\w+ "
+         r"on (?:\w+\.student_id = \w+\.id|\w+\.id = \w+\.student_id)")
+_VALUE = r"(?:%s|'(?:[^']|'')*')"
+
+
+def _rule(name, pattern, build):
+    return name, re.compile("^" + pattern + "$", re.I), build
+
+
+# (name, pattern over the normalized SQL, match -> SQL over the views). A rewrite
+# returns the same columns, under the same names and types, and takes the same
+# %s parameters in the same order as the statement it replaces.
+RULES = [
+    _rule("department_wise_count",
+          rf"select {_COL}dept, count\(\*\){_ALIAS} from students(?: (?:as )?\w+)? group by {_COL}dept",
+          lambda m: f"SELECT dept, student_count AS {m['alias'] or 'count'} FROM chatbot_agg_dept_stats"),
+    _rule("average_by_department",
+          rf"select {_COL}dept, avg\({_COL}total_mark\){_ALIAS} {_JOIN} group by {_COL}dept",
+          lambda m: (f"SELECT dept, mark_sum::numeric / NULLIF(mark_count, 0) AS {m['alias'] or 'avg'} "
+                     "FROM chatbot_agg_dept_stats WHERE subject_rows > 0")),
+    _rule("top_n_by_total",
+          rf"select {_COL}name, {_COL}roll_no, sum\({_COL}total_mark\) as (?P<alias>\w+) {_JOIN} "
+          rf"(?:where {_COL}dept = (?P<dept>{_VALUE}) )?group by {_COL}id, {_COL}name, {_COL}roll_no "
+          rf"order by (?P=alias) desc limit (?P<n>%s|\d+)",
+          lambda m: (f"SELECT name, roll_no, total_marks AS {m['alias']} FROM chatbot_agg_student_totals "
+                     + (f"WHERE dept = {m['dept']} " if m['dept'] else "")
+                     + f"ORDER BY total_marks DESC LIMIT {m['n']}")),
+    _rule("highest_mark_for_subject",
+          rf"select max\({_COL}total_mark\){_ALIAS} from subjects(?: (?:as )?\w+)? "
+          rf"where {_COL}subject_name (?P<op>like|ilike|=) (?P<value>{_VALUE})",
+          lambda m: (f"SELECT MAX(max_mark) AS {m['alias'] or 'max'} FROM chatbot_agg_subject_stats "
+                     f"WHERE subject_name {m['op'].upper()} {m['value']}")),
+    _rule("highest_mark_per_subject",
+          rf"select {_COL}subject_name, max\({_COL}total_mark\){_ALIAS} from subjects(?: (?:as )?\w+)? "
+          rf"group by {_COL}subject_name",
+          lambda m: f"SELECT subject_name, max_mark AS {m['alias'] or 'max'} FROM chatbot_agg_subject_stats"),
+    _rule("average_per_subject",
+          rf"select {_COL}subject_name, avg\({_COL}total_mark\){_ALIAS} from subjects(?: (?:as )?\w+)? "
+          rf"group by {_COL}subject_name",
+          lambda m: (f"SELECT subject_name, mark_sum::numeric / NULLIF(mark_count, 0) AS {m['alias'] or 'avg'} "
+                     "FROM chatbot_agg_subject_stats")),
+]
+
+_LITERAL_SPLIT = re.compile(r"('(?:[^']|'')*')")
+
+
+def normalize_sql(sql):
+    # Collapses whitespace outside string literals and drops the trailing semicolon
+    parts = _LITERAL_SPLIT.split(sql.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        part = re.sub(r"\s+", " ", parts[i])
+        part = re.sub(r"\(\s*", "(", re.sub(r"\s*\)", ")", part))
+        part = re.sub(r"\s*,\s*", ", ", part)
+        parts[i] = re.sub(r"\s*=\s*", " = ", part)
+    return "".join(parts).strip()
+
+
+def create_views(conn):
+    # Creates the views, their indexes and the shared refresh state. Safe to
+    # re-run and to run from several processes at once; see setup_aggregates.py.
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {WRITES_SEQUENCE}")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                refreshed_at TIMESTAMPTZ NOT NULL,
+                write_seq BIGINT NOT NULL
+            )
+        """)
+        for name, query, indexes in VIEWS:
+            cursor.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query}")
+            for index in indexes:
+                cursor.execute(index)
+        cursor.execute(f"""
+            INSERT INTO {STATE_TABLE} (refreshed_at, write_seq)
+            SELECT now(), CASE WHEN is_called THEN last_value ELSE 0 END FROM {WRITES_SEQUENCE}
+            ON CONFLICT (id) DO NOTHING
+        """)
+    conn.commit()
+
+
+class AggregateStore:
+    """Answers recognized aggregate query shapes from maintained materialized views.
+
+    The views are created by create_views() (setup_aggregates.py), never by a
+    serving process: until they exist every query runs on the base tables, and
+    a background thread checks again every `sync_interval` seconds. The same
+    thread reports writes noted through note_write() to the database and reads
+    back when the views were last refreshed, by this or any other process.
+
+    rewrite() maps a statement onto the views only while they are fresh enough:
+    within `max_staleness` seconds of the first unrefreshed write to students or
+    subjects reported by any process (seen up to `sync_interval` seconds late
+    when it was made elsewhere), and within `max_age` seconds of the last
+    refresh (writes made outside the app are not reported). With `refresher`
+    set, the thread refreshes the views `debounce` seconds after a reported
+    write, so bursts of writes share one refresh, and every `refresh_interval`
+    seconds regardless. A refresh takes an advisory lock and is skipped when
+    another process holds it or has already refreshed, so each change is
+    refreshed once however many processes run. `on_refresh()` is called when a
+    refresh, from any process, is first seen.
+    """
+
+    def __init__(self, pool, max_staleness=30.0, refresh_interval=300.0, max_age=None, debounce=1.0,
+                 sync_interval=2.0, refresher=True, on_refresh=None):
+        self._pool = pool
+        self.max_staleness = max_staleness
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age if max_age is not None else 2 * refresh_interval
+        self.debounce = debounce
+        self.sync_interval = sync_interval
+        self.refresher = refresher
+        self._on_refresh = on_refresh
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._ready = False
+        self._refreshed_at = None  # monotonic time the last refresh, by any process, started
+        self._refresh_mark = None  # its refreshed_at as stored, to spot refreshes made elsewhere
+        self._dirty_since = None
+        self._write_seq = 0
+        self._reported_seq = 0  # local writes already counted in the shared sequence
+        self._unavailable_logged = False
+
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh_ms = 0.0
+        self.rewrites = {}
+        self.stale_skips = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="aggregate-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # --- Rewriting ---
+    def fresh(self):
+        with self._cond:
+            return self._is_fresh(time.monotonic())
+
+    def _is_fresh(self, now):
+        if not self._ready or self._refreshed_at is None:
+            return False
+        if self.max_age and now - self._refreshed_at > self.max_age:
+            return False
+        return self._dirty_since is None or now - self._dirty_since <= self.max_staleness
+
+    def match(self, sql):
+        # Returns (rule name, rewritten SQL) for a recognized shape, else None
+        normalized = normalize_sql(sql)
+        for name, pattern, build in RULES:
+            match = pattern.match(normalized)
+            if match:
+                return name, build(match)
+        return None
+
+    def rewrite(self, sql):
+        # Returns (rule name, SQL over the views) when the statement can be served from them
+        matched = self.match(sql)
+        if matched is None:
+            return None
+        with self._cond:
+            if not self._is_fresh(time.monotonic()):
+                self.stale_skips += 1
+                return None
+            self.rewrites[matched[0]] = self.rewrites.get(matched[0], 0) + 1
+        return matched
+
+    # --- Maintenance ---
+    def note_write(self, tables):
+        # tables written by a committed statement; an empty set means they are unknown
+        if tables and not (set(tables) & SOURCE_TABLES):
+            return
+        with self._cond:
+            self._write_seq += 1
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                self._unavailable(e)
+            else:
+                if self.refresher and self._refresh_due():
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        logging.warning(f"Error refreshing aggregate views: {e}")
+                        with self._cond:
+                            self.refresh_failures += 1
+            with self._cond:
+                if self._closed:
+                    return
+                # Woken early by note_write(), so writes are reported promptly
+                self._cond.wait(self._next_wait())
+                if self._closed:
+                    return
+
+    def _next_wait(self):
+        # A refresh that is already due was just attempted (skipped or failed),
+        # so it is retried on the next sync rather than straight away
+        now = time.monotonic()
+        due = []
+        if self.refresher and self._ready:
+            if self._dirty_since is not None:
+                due.append(self._dirty_since + self.debounce - now)
+            if self.refresh_interval and self._refreshed_at is not None:
+                due.append(self._refreshed_at + self.refresh_interval - now)
+        return max(0.05, min([self.sync_interval] + [wait for wait in due if wait > 0]))
+
+    def _refresh_due(self):
+        with self._cond:
+            now = time.monotonic()
+            if self._dirty_since is not None and now - self._dirty_since >= self.debounce:
+                return True
+            return bool(self.refresh_interval) and now - self._refreshed_at >= self.refresh_interval
+
+    def _unavailable(self, error):
+        with self._cond:
+            self._ready = False
+            logged, self._unavailable_logged = self._unavailable_logged, True
+        if not logged:
+            logging.warning(f"Aggregate views unavailable, answering from the base tables until they are: {error}")
+
+    def _check_views(self, cursor):
+        names = [STATE_TABLE, WRITES_SEQUENCE] + [name for name, _, _ in VIEWS]
+        cursor.execute("SELECT name FROM unnest(%s::text[]) AS name WHERE to_regclass(name) IS NULL", (names,))
+        missing = [row[0] for row in cursor.fetchall()]
+        if missing:
+            raise LookupError(f"{', '.join(missing)} not found; run setup_aggregates.py")
+
+    def sync(self):
+        # Reports local writes to the shared sequence and reads back the shared refresh state
+        with self._cond:
+            seq, ready = self._write_seq, self._ready
+        with self._pool.connection() as conn:
+            with conn.cursor() as cursor:
+                if not ready:
+                    self._check_views(cursor)
+                if seq != self._reported_seq:
+                    cursor.execute(f"SELECT nextval('{WRITES_SEQUENCE}')")
+                cursor.execute(STATE_SQL)
+                mark, age, refreshed_seq, writes = cursor.fetchone()
+            conn.commit()
+        now = time.monotonic()
+        with self._cond:
+            self._reported_seq = seq
+            self._ready = True
+            self._refreshed_at = now - float(age)
+            if writes > refreshed_seq or self._write_seq != seq:
+                if self._dirty_since is None:
+                    self._dirty_since = now
+            else:
+                self._dirty_since = None
+            seen, self._refresh_mark = self._refresh_mark, mark
+            recovered, self._unavailable_logged = self._unavailable_logged, False
+        if recovered:
+            logging.info("Aggregate views available")
+        if mark != seen:
+            self._after_refresh()
+
+    def refresh(self, force=False):
+        # Refreshes the views unless another process is refreshing them or, without
+        # force, they are already up to date. Returns whether this call refreshed.
+        started = time.monotonic()
+        with self._pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (LOCK_KEY,))
+                if not cursor.fetchone()[0]:
+                    conn.rollback()
+                    return False
+                cursor.execute(STATE_SQL)
+                _, age, refreshed_seq, writes = cursor.fetchone()
+                due = writes > refreshed_seq or (self.refresh_interval and age >= self.refresh_interval)
+                if not (force or due):
+                    conn.rollback()
+                    return False
+                for name, _, _ in VIEWS:
+                    cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}")
+                # now() is when this transaction began, so writes committed while
+                # refreshing count as newer than the refresh
+                cursor.execute(f"UPDATE {STATE_TABLE} SET refreshed_at = now(), write_seq = %s", (writes,))
+            conn.commit()
+        with self._cond:
+            self.refreshes += 1
+            self.last_refresh_ms = round((time.monotonic() - started) * 1000, 1)
+        self.sync()
+        return True
+
+    def _after_refresh(self):
+        if self._on_refresh is not None:
+            try:
+                self._on_refresh()
+            except Exception as e:
+                logging.warning(f"Aggregate refresh callback failed: {e}")
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "ready": self._ready,
+                "fresh": self._is_fresh(now),
+                "refresher": self.refresher,
+                "age_s": round(now - self._refreshed_at, 1) if self._refreshed_at is not None else None,
+                "dirty_for_s": round(now - self._dirty_since, 1) if self._dirty_since is not None else None,
+                "max_staleness_s": self.max_staleness,
+                "refresh_interval_s": self.refresh_interval,
+                "sync_interval_s": self.sync_interval,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "last_refresh_ms": self.last_refresh_ms,
+                "rewrites": dict(self.rewrites),
+                "stale_skips": self.stale_skips,
+            }
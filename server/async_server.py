@@ -0,0 +1,530 @@
+import asyncio
+import functools
+import logging
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+
+from psycopg import AsyncClientCursor
+from psycopg_pool import AsyncConnectionPool, PoolClosed, PoolTimeout, TooManyRequests
+from quart import Quart, Response, g, has_request_context, jsonify, request
+from quart_cors import cors
+
+from aggregates import SOURCE_TABLES as AGGREGATE_SOURCE_TABLES, AggregateStore
+from caches import AsyncSingleFlight
+from chat_sessions import ConversationSessions
+from db_pool import ConnectionPool
+from history_writer import HistoryWriter
+from llm_client import AsyncLLMClient, LLMUnavailable
+from pagination import (
+    CursorError, conversations_page, conversations_page_query, history_page, history_page_query, page_request,
+)
+from password_verifier import PasswordVerifier, VerifierBusy
+from pipeline import (
+    BAD_CONVERSATION_ID_MESSAGE, BAD_SUMMARIZER_MESSAGE, CONVERSATION_TURNS_SQL, LLM_BUSY_MESSAGE, QueryPlan,
+    accept_request_id, build_summary_prompt, configure_logging, cost_guard, counted_llm_call, extract_sql,
+    forget_translation, gemini_model, issue_token, llm_deadline_from_now, local_summary, metrics, metrics_authorized,
+    record_request, record_turns, register_gauges, remember_translation, result_cache, server_timing,
+    sql_translations_total, template_translation, timed, translation_cache, translation_key, valid_conversation_id,
+    valid_summarizer_mode, verify_token,
+)
+from query_result import QueryResult, fetch_bounded_async
+from schema_catalog import SchemaCatalog
+from settings import (
+    AGGREGATE_MAX_STALENESS, AGGREGATE_REFRESH, AGGREGATE_REFRESH_INTERVAL, AGGREGATE_SYNC_INTERVAL,
+    AGGREGATES_ENABLED, ASYNC_BLOCKING_THREADS, ASYNC_DB_POOL_MAX, ASYNC_DB_POOL_MIN, BCRYPT_ACQUIRE_TIMEOUT,
+    BCRYPT_MAX_PENDING, CHAT_SESSION_MAX, CHAT_SESSION_MAX_BYTES, CHAT_SESSION_TTL, CHAT_SESSION_TURNS,
+    CHAT_SESSIONS_ENABLED, CONVERSATIONS_PAGE_SIZE, DB_HOST, DB_NAME, DB_PASSWORD, DB_POOL_HEALTH_CHECK_INTERVAL,
+    DB_POOL_TIMEOUT, DB_PORT, DB_USER, HISTORY_BATCH_SIZE, HISTORY_ENQUEUE_TIMEOUT, HISTORY_FLUSH_INTERVAL,
+    HISTORY_PAGE_SIZE, HISTORY_QUEUE_SIZE, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_BURST, LLM_CALL_TIMEOUT,
+    LLM_MAX_IN_FLIGHT, LLM_MAX_RETRIES, LLM_RATE_LIMIT, MAX_PAGE_SIZE, SCHEMA_CATALOG_EXCLUDE, SCHEMA_CATALOG_TTL,
+    SCHEMA_PROMPT_MAX_TABLES, SECRET_KEY, SQL_PROMPT_EXAMPLES,
+)
+from sql_prompt import COLUMN_NOTES, build_sql_primer, build_sql_prompt, build_sql_turn
+from sql_templates import render_sql
+from summarizer import summarize_locally
+
+# ASGI serving mode for /login, /query, /conversations and /conversation/<id>,
+# with the same request and response bodies as the Flask app in server.py.
+# Database work goes through psycopg_pool's AsyncConnectionPool and Gemini
+# calls through AsyncLLMClient, so a request waiting on either holds no thread
+# and one process can keep thousands of slow chats in flight. Settings come
+# from settings.py and caches, metrics and the pipeline's decisions from
+# pipeline.py, as in server.py. Importing this module connects to nothing and
+# starts no threads: the pools and the history and aggregate threads start
+# when the app starts serving. The few blocking calls left (bcrypt, history
+# flushes, schema catalog reloads) run on a small thread pool.
+#
+#   uvicorn async_server:app --port 3001
+
+# --- Basic Setup ---
+configure_logging(lambda: g.get('request_id', '-') if has_request_context() else '-')
+
+# --- Generative AI Configuration ---
+model = gemini_model()
+
+def llm_deadline():
+    return g.get('llm_deadline') if has_request_context() else None
+
+llm_client = AsyncLLMClient(
+    rate=LLM_RATE_LIMIT,
+    burst=LLM_BURST,
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    call_timeout=LLM_CALL_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE,
+    backoff_max=LLM_BACKOFF_MAX,
+    deadline_fn=llm_deadline,
+)
+
+# --- Database Connection Pool ---
+# Client-side binding keeps the psycopg2-style %s placeholders of the shared
+# SQL (and of SET LOCAL statement_timeout) working unchanged.
+_returned_at = weakref.WeakKeyDictionary()
+
+async def _reset_connection(conn):
+    # fetch_all switches connections to autocommit; execute_query expects them without
+    await conn.set_autocommit(False)
+    _returned_at[conn] = time.monotonic()
+
+async def _check_connection(conn):
+    # Only a connection idle for DB_POOL_HEALTH_CHECK_INTERVAL is pinged before
+    # it is handed out; one that fails is discarded and the pool tries another
+    returned = _returned_at.get(conn)
+    if returned is not None and time.monotonic() - returned >= DB_POOL_HEALTH_CHECK_INTERVAL:
+        await AsyncConnectionPool.check_connection(conn)
+
+db_pool = AsyncConnectionPool(
+    min_size=ASYNC_DB_POOL_MIN,
+    max_size=ASYNC_DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    kwargs={
+        **{key: value for key, value in
+           dict(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT).items()
+           if value is not None},
+        "cursor_factory": AsyncClientCursor,
+    },
+    check=_check_connection,
+    reset=_reset_connection,
+    name="async-db",
+    open=False,
+)
+POOL_ERRORS = (PoolTimeout, PoolClosed, TooManyRequests)
+
+def db_pool_stats():
+    # psycopg_pool's counters under the names db_pool.ConnectionPool.stats() uses
+    stats = db_pool.get_stats()
+    size, idle, checkouts = stats.get("pool_size", 0), stats.get("pool_available", 0), stats.get("requests_num", 0)
+    return {
+        "size": size,
+        "max_size": stats.get("pool_max", ASYNC_DB_POOL_MAX),
+        "min_size": stats.get("pool_min", ASYNC_DB_POOL_MIN),
+        "idle": idle,
+        "in_use": size - idle,
+        "waiting": stats.get("requests_waiting", 0),
+        "checkouts": checkouts,
+        "timeouts": stats.get("requests_errors", 0),
+        "created": stats.get("connections_num", 0),
+        "discarded": stats.get("returns_bad", 0) + stats.get("connections_lost", 0),
+        "avg_wait_ms": round(stats.get("requests_wait_ms", 0) / checkouts, 3) if checkouts else 0.0,
+    }
+
+# --- Blocking Side ---
+# The history writer, the aggregate sync thread and schema catalog reloads
+# are synchronous, so they share a small psycopg2 pool that, like the threads,
+# is only used once the app is serving.
+blocking_db_pool = ConnectionPool(
+    minconn=0,
+    maxconn=3,
+    timeout=DB_POOL_TIMEOUT,
+    health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+    dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
+)
+blocking_executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_THREADS, thread_name_prefix="async-blocking")
+
+def run_blocking(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(blocking_executor, functools.partial(fn, *args))
+
+history_writer = HistoryWriter(
+    blocking_db_pool,
+    batch_size=HISTORY_BATCH_SIZE,
+    flush_interval=HISTORY_FLUSH_INTERVAL,
+    max_queue=HISTORY_QUEUE_SIZE,
+    enqueue_timeout=HISTORY_ENQUEUE_TIMEOUT,
+)
+aggregate_store = AggregateStore(
+    blocking_db_pool,
+    max_staleness=AGGREGATE_MAX_STALENESS,
+    refresh_interval=AGGREGATE_REFRESH_INTERVAL,
+    sync_interval=AGGREGATE_SYNC_INTERVAL,
+    refresher=AGGREGATE_REFRESH,
+    on_refresh=lambda: result_cache.invalidate_tables(AGGREGATE_SOURCE_TABLES),
+)
+schema_catalog = SchemaCatalog(
+    blocking_db_pool,
+    notes=COLUMN_NOTES,
+    exclude=SCHEMA_CATALOG_EXCLUDE,
+    ttl=SCHEMA_CATALOG_TTL,
+    max_tables=SCHEMA_PROMPT_MAX_TABLES,
+)
+# bcrypt runs inline on the blocking threads: no worker processes to fork
+password_verifier = PasswordVerifier(
+    max_workers=0,
+    max_pending=BCRYPT_MAX_PENDING,
+    acquire_timeout=BCRYPT_ACQUIRE_TIMEOUT,
+)
+# Conversations not in memory are rebuilt by conversation_turns(), on the async pool
+conversation_sessions = ConversationSessions(
+    lambda history: model.start_chat(history=history),
+    build_sql_primer(),
+    None,
+    max_sessions=CHAT_SESSION_MAX,
+    max_bytes=CHAT_SESSION_MAX_BYTES,
+    ttl=CHAT_SESSION_TTL,
+    max_turns=CHAT_SESSION_TURNS,
+)
+translation_flight = AsyncSingleFlight()
+register_gauges(db_pool_stats, llm_client, history_writer, password_verifier, aggregate_store, conversation_sessions)
+
+@contextmanager
+def span(stage):
+    with timed(stage, g.get('spans') if has_request_context() else None):
+        yield
+
+@contextmanager
+def llm_call(purpose):
+    with span(f"llm_{purpose}"), counted_llm_call(purpose):
+        yield
+
+# --- Helper Functions ---
+def start_chat_session():
+    try:
+        return model.start_chat(history=[])
+    except Exception as e:
+        logging.error(f"Error starting chat session: {e}")
+        return None
+
+async def fetch_all(query, params):
+    # Single reads run in autocommit: one round trip, and no transaction to
+    # roll back before the connection can serve the next request
+    async with db_pool.connection() as conn:
+        await conn.set_autocommit(True)
+        cursor = await conn.execute(query, params)
+        return await cursor.fetchall()
+
+# --- Query Pipeline ---
+async def execute_query(query, params=None, max_rows=None):
+    # server.execute_query on the async pool; the QueryPlan makes the same decisions
+    plan = QueryPlan(query, params, max_rows, schema_catalog, aggregate_store)
+    if plan.cached is not None:
+        return plan.cached
+    try:
+        with span("db_acquire"):
+            conn = await db_pool.getconn()
+        try:
+            decision = None
+            async with conn.cursor() as cursor:
+                await cost_guard.apply_timeout_async(cursor)
+                if plan.guarded:
+                    decision = await cost_guard.check_async(cursor, plan.run_query, plan.params, plan.max_rows)
+                if not plan.is_select:
+                    await cursor.execute(plan.query, plan.params)
+                    results = QueryResult([], [], rowcount=cursor.rowcount)
+            rejection = plan.rejection(decision)
+            if rejection:
+                await conn.rollback()
+                return rejection
+            if plan.is_select:
+                results = await fetch_bounded_async(conn, *plan.fetch_args(decision))
+            await conn.commit()
+            return plan.finish(results, decision)
+        except Exception:
+            await conn.rollback()
+            raise
+        finally:
+            await db_pool.putconn(conn)
+    except POOL_ERRORS as e:
+        return plan.unavailable(e)
+    except Exception as e:
+        return plan.failed(e)
+
+async def load_conversation_turns(conversation_id, user_id, limit):
+    try:
+        await run_blocking(history_writer.flush)
+        with span("session_rebuild"):
+            rows = await fetch_all(CONVERSATION_TURNS_SQL, (user_id, conversation_id, limit))
+        return list(reversed(rows))
+    except Exception as e:
+        logging.warning(f"Could not rebuild conversation context for {conversation_id}: {e}")
+        return []
+
+async def conversation_turns(conversation_id, user_id):
+    turns = conversation_sessions.cached_turns(conversation_id, user_id)
+    if turns is None:
+        loaded = await load_conversation_turns(conversation_id, user_id, conversation_sessions.max_turns)
+        turns = conversation_sessions.remember(conversation_id, user_id, loaded)
+    return turns
+
+async def schema_section(question):
+    # Catalog reloads are a couple of synchronous queries on the blocking pool
+    if schema_catalog.stale():
+        await run_blocking(schema_catalog.tables)
+    return schema_catalog.render(question)
+
+async def translate_to_sql(user_query, conversation_id=None, user_id=None):
+    # Same sources and caching as server.translate_to_sql
+    compiled = template_translation(user_query)
+    if compiled is not None:
+        return compiled
+
+    if CHAT_SESSIONS_ENABLED and conversation_id:
+        turns = await conversation_turns(conversation_id, user_id)
+        if turns:
+            sql_translations_total.inc(source="session")
+            chat_session = conversation_sessions.start_chat(turns)
+            prompt = build_sql_turn(user_query, SQL_PROMPT_EXAMPLES, await schema_section(user_query))
+            with llm_call("sql"):
+                response = await llm_client.send(chat_session, prompt)
+            return extract_sql(response.text), None
+
+    cache_key = translation_key(user_query)
+    generated_query = translation_cache.get(cache_key)
+    if generated_query is not None:
+        sql_translations_total.inc(source="cache")
+        return generated_query, None
+
+    source = ["coalesced"]
+    async def generate():
+        cached = translation_cache.get(cache_key)
+        if cached is not None:
+            source[0] = "cache"
+            return cached
+        source[0] = "llm"
+        chat_session = start_chat_session()
+        prompt = build_sql_prompt(user_query, SQL_PROMPT_EXAMPLES, await schema_section(user_query))
+        with llm_call("sql"):
+            response = await llm_client.send(chat_session, prompt)
+        return remember_translation(cache_key, response.text)
+
+    try:
+        return await translation_flight.do(cache_key, generate), None
+    finally:
+        sql_translations_total.inc(source=source[0])
+
+async def generate_natural_language_response(user_query, db_results, sql=''):
+    try:
+        chat_session = start_chat_session()
+        if not chat_session: return summarize_locally(user_query, sql, db_results, force=True)
+
+        with llm_call("summary"):
+            response = await llm_client.send(chat_session, build_summary_prompt(user_query, db_results))
+        return response.text.strip()
+    except Exception as e:
+        logging.warning(f"Gemini summary failed, answering with the local summary: {str(e)}")
+        return summarize_locally(user_query, sql, db_results, force=True)
+
+async def summarize_results(user_query, sql, db_results, mode=None):
+    local_response = local_summary(user_query, sql, db_results, mode)
+    if local_response is not None:
+        return local_response
+    return await generate_natural_language_response(user_query, db_results, sql)
+
+async def run_query_pipeline(user_query, conversation_id=None, user_id=None, summarizer_mode=None):
+    # No connection is held across the LLM calls: execute_query borrows one
+    # from the pool only for the statement itself.
+    with span("translate"):
+        generated_query, query_params = await translate_to_sql(user_query, conversation_id, user_id)
+    with span("execute"):
+        results = await execute_query(generated_query, query_params)
+    if isinstance(results, str):
+        forget_translation(user_query, generated_query)
+    with span("summarize"):
+        nl_response = await summarize_results(user_query, generated_query, results, summarizer_mode)
+    return nl_response, render_sql(generated_query, query_params)
+
+def save_chat_history(user_id, conversation_id, user_query, nl_response, generated_sql=None):
+    return record_turns(history_writer, conversation_sessions, user_id, conversation_id,
+                        [(user_query, nl_response, generated_sql)])
+
+# --- Quart App and JWT Decorator ---
+app = Quart(__name__)
+app = cors(app, allow_origin="*", expose_headers=["X-Next-Cursor", "X-Request-ID"])
+app.config['SECRET_KEY'] = SECRET_KEY
+
+@app.before_serving
+async def start_serving():
+    await db_pool.open()
+    history_writer.start()
+    if AGGREGATES_ENABLED:
+        aggregate_store.start()
+
+@app.after_serving
+async def stop_serving():
+    # Queued history is flushed before the blocking pool's connections close
+    await run_blocking(history_writer.close)
+    aggregate_store.close()
+    await db_pool.close()
+    blocking_db_pool.closeall()
+    blocking_executor.shutdown(wait=False)
+
+@app.before_request
+async def start_request():
+    g.request_id = accept_request_id(request.headers.get('X-Request-ID'))
+    g.request_started = time.perf_counter()
+    g.spans = []
+    g.llm_deadline = llm_deadline_from_now()
+
+@app.after_request
+async def finish_request(response):
+    # Bodies here are never streamed, so the request is recorded as soon as it is answered
+    request_id, spans = g.get('request_id', '-'), g.get('spans', [])
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    response.headers['X-Request-ID'] = request_id
+    if spans:
+        response.headers['Server-Timing'] = server_timing(spans)
+    record_request(request_id, request.method, endpoint, response.status_code, g.get('request_started'), spans)
+    return response
+
+def token_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        data, error = verify_token(request.headers.get('Authorization'), app.config['SECRET_KEY'])
+        if error:
+            return jsonify({'error': error}), 401
+        return await f(data, *args, **kwargs)
+    return decorated
+
+# --- API Endpoints ---
+@app.route('/login', methods=['POST'])
+async def login():
+    try:
+        data = await request.get_json()
+        email = data.get('email')
+        password = data.get('password')
+
+        if not email or not password:
+            return jsonify({"error": "Email and password are required"}), 400
+
+        try:
+            with span("db"):
+                rows = await fetch_all("SELECT id, password FROM users WHERE email = %s;", (email,))
+            result = rows[0] if rows else None
+        except POOL_ERRORS as e:
+            logging.error(f"Error connecting to database: {e}")
+            return jsonify({"error": "Failed to connect to the database"}), 500
+
+        if result:
+            user_id, hashed_pw = result
+            try:
+                with span("password_verify"):
+                    matched = await run_blocking(password_verifier.verify, password, hashed_pw)
+            except VerifierBusy:
+                logging.warning("Login rejected: password verification pool is saturated")
+                response = jsonify({"error": "Too many login attempts right now. Please try again in a moment."})
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            if matched:
+                token = issue_token(user_id, email, app.config['SECRET_KEY'])
+                return jsonify({"message": "Login successful", "token": token}), 200
+
+        return jsonify({"error": "Invalid email or password"}), 401
+    except Exception as e:
+        logging.error(f"Login error: {e}")
+        return jsonify({"error": "An internal error occurred"}), 500
+
+@app.route('/query', methods=['POST'])
+@token_required
+async def generate_query(current_user):
+    try:
+        data = await request.get_json()
+        user_query = data.get('query', '')
+        conversation_id = data.get('conversationId')
+        if not valid_conversation_id(conversation_id):
+            return jsonify({"error": BAD_CONVERSATION_ID_MESSAGE}), 400
+        if not valid_summarizer_mode(data.get('summarizer')):
+            return jsonify({"error": BAD_SUMMARIZER_MESSAGE}), 400
+
+        user_id = current_user['user_id']
+        nl_response, generated_sql = await run_query_pipeline(user_query, conversation_id, user_id,
+                                                              data.get('summarizer'))
+
+        with span("history"):
+            new_conversation_details = await run_blocking(
+                save_chat_history, user_id, conversation_id, user_query, nl_response, generated_sql)
+
+        return jsonify({
+            "natural_language_response": nl_response,
+            "newConversation": new_conversation_details
+        })
+    except LLMUnavailable as e:
+        logging.warning(f"Query not answered, LLM unavailable: {e}")
+        response = jsonify({"error": LLM_BUSY_MESSAGE})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except Exception as e:
+        logging.exception(f"Error in query generation: {str(e)}")
+        return jsonify({"error": "An error occurred while processing your query."}), 500
+
+def paginated(items, next_cursor):
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/conversations', methods=['GET'])
+@token_required
+async def get_conversations(current_user):
+    try:
+        user_id = current_user['user_id']
+        limit, after = page_request(request.args, 'cursor', CONVERSATIONS_PAGE_SIZE, MAX_PAGE_SIZE)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        with span("history_flush"):
+            await run_blocking(history_writer.flush)
+        with span("db"):
+            rows = await fetch_all(*conversations_page_query(user_id, limit, after))
+        return paginated(*conversations_page(rows, limit))
+    except Exception as e:
+        logging.error(f"Error fetching conversations: {e}")
+        return jsonify({"error": "Could not fetch conversations."}), 500
+
+@app.route('/conversation/<conversation_id>', methods=['GET'])
+@token_required
+async def get_conversation_history(current_user, conversation_id):
+    try:
+        user_id = current_user['user_id']
+        limit, before = page_request(request.args, 'before', HISTORY_PAGE_SIZE, MAX_PAGE_SIZE, int)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        with span("history_flush"):
+            await run_blocking(history_writer.flush)
+        with span("db"):
+            rows = await fetch_all(*history_page_query(user_id, conversation_id, limit, before))
+        return paginated(*history_page(rows, limit))
+    except Exception as e:
+        logging.error(f"Error fetching conversation history: {e}")
+        return jsonify({"error": "Could not fetch conversation history."}), 500
+
+@app.route('/stats/db-pool', methods=['GET'])
+@token_required
+async def get_db_pool_stats(current_user):
+    return jsonify(db_pool_stats())
+
+@app.route('/stats/llm', methods=['GET'])
+@token_required
+async def get_llm_stats(current_user):
+    return jsonify(llm_client.stats())
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    if not metrics_authorized(request.headers.get('Authorization')):
+        return jsonify({'error': 'Token is invalid!'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=3001)
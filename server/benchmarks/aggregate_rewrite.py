@@ -0,0 +1,150 @@
+# Materialized aggregates: times each recognized aggregate shape against the
+# raw subjects x students join and against its rewrite over the views, checks
+# that both return the same rows, and times a refresh after a write. Seeds
+# --rows subjects rows into its own schema of the database configured by the
+# DB_* variables (kept for later runs; --reseed rebuilds it).
+#
+#   python benchmarks/aggregate_rewrite.py [--rows 1000000] [--repeat 5]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from aggregates import AggregateStore, create_views  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+
+SCHEMA = "aggregate_bench"
+DEPARTMENTS = ["CSE", "ECE", "EIE", "MECH", "CIVIL", "IT", "AGRI", "CSBS"]
+SUBJECTS = ["MATHEMATICS", "PHYSICS", "DATA STRUCTURES-1", "OPERATING SYSTEMS", "OOPS", "DIGITAL ELECTRONICS"]
+EXAMS = ["PERIODICAL TEST-1", "PERIODICAL TEST-2", "CYCLE TEST-1"]
+
+# (label, SQL as generated, params)
+QUERIES = [
+    ("department wise count", "SELECT dept, COUNT(*) as student_count FROM students GROUP BY dept;", None),
+    ("average by department", "SELECT st.dept, AVG(s.total_mark) as avg_marks FROM subjects s "
+                              "JOIN students st ON s.student_id = st.id GROUP BY st.dept;", None),
+    ("top 10 by total", "SELECT st.name, st.roll_no, SUM(s.total_mark) as total_marks FROM subjects s "
+                        "JOIN students st ON s.student_id = st.id GROUP BY st.id, st.name, st.roll_no "
+                        "ORDER BY total_marks DESC LIMIT %s;", [10]),
+    ("top 10 in CSE", "SELECT st.name, st.roll_no, SUM(s.total_mark) as total_marks FROM subjects s "
+                      "JOIN students st ON s.student_id = st.id WHERE st.dept = %s "
+                      "GROUP BY st.id, st.name, st.roll_no ORDER BY total_marks DESC LIMIT %s;", ["CSE", 10]),
+    ("highest in mathematics", "SELECT MAX(s.total_mark) as highest_mark FROM subjects s "
+                               "WHERE s.subject_name LIKE '%MATHEMATICS%';", None),
+    ("highest per subject", "SELECT subject_name, MAX(total_mark) AS highest FROM subjects GROUP BY subject_name;", None),
+    ("average per subject", "SELECT s.subject_name, AVG(s.total_mark) FROM subjects s GROUP BY s.subject_name;", None),
+]
+
+
+def seed(pool, rows, reseed):
+    per_student = len(SUBJECTS) * len(EXAMS)
+    students = max(1, rows // per_student)
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('subjects') IS NOT NULL")
+            if cursor.fetchone()[0] and not reseed:
+                cursor.execute("SELECT COUNT(*) FROM subjects")
+                if cursor.fetchone()[0] == students * per_student:
+                    print(f"reusing {SCHEMA} ({students * per_student} subjects rows)")
+                    return
+            print(f"seeding {SCHEMA}: {students} students, {students * per_student} subjects rows")
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+            cursor.execute(f"SET search_path TO {SCHEMA}")
+            cursor.execute("""
+                CREATE TABLE students (id TEXT PRIMARY KEY, roll_no TEXT, name TEXT, dept TEXT, mailid TEXT,
+                                       sem TEXT, year INTEGER, speciallab TEXT);
+                CREATE TABLE subjects (id SERIAL PRIMARY KEY, exam_name TEXT, course_code TEXT,
+                                       student_id TEXT REFERENCES students(id), subject_name TEXT, total_mark INTEGER);
+            """)
+            cursor.execute("""
+                INSERT INTO students (id, roll_no, name, dept, mailid, sem, year)
+                SELECT 'S' || g, '7376' || g, 'STUDENT ' || g, (%s::text[])[1 + g %% %s],
+                       'student' || g || '@example.com', 'S' || (1 + g %% 8), 1 + g %% 4
+                FROM generate_series(0, %s - 1) g
+            """, (DEPARTMENTS, len(DEPARTMENTS), students))
+            cursor.execute("""
+                INSERT INTO subjects (exam_name, course_code, student_id, subject_name, total_mark)
+                SELECT e.name, 'C' || sub.n, 'S' || g, sub.name, (hashtext(g || sub.name || e.name) & 1023) %% 101
+                FROM generate_series(0, %s - 1) g
+                CROSS JOIN unnest(%s::text[]) WITH ORDINALITY AS sub(name, n)
+                CROSS JOIN unnest(%s::text[]) AS e(name)
+            """, (students, SUBJECTS, EXAMS))
+            cursor.execute("CREATE INDEX ON subjects (student_id)")
+            cursor.execute("ANALYZE")
+        conn.commit()
+
+
+def timed(pool, sql, params, repeat):
+    durations = []
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                durations.append((time.perf_counter() - started) * 1000)
+        conn.rollback()
+    return statistics.median(durations), rows
+
+
+def comparable(label, rows):
+    # Ties in a top-N may come back in any order, so only the ranked totals are compared there
+    if label.startswith("top"):
+        return [row[-1] for row in rows]
+    return sorted(rows, key=repr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the materialized aggregate rewrites")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="subjects rows to seed")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query (median reported)")
+    parser.add_argument("--reseed", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    pool = ConnectionPool(
+        minconn=1, maxconn=2,
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"), options=f"-c search_path={SCHEMA}",
+    )
+    seed(pool, args.rows, args.reseed)
+
+    started = time.perf_counter()
+    with pool.connection() as conn:
+        create_views(conn)
+    store = AggregateStore(pool, refresh_interval=0)
+    store.refresh(force=True)
+    if not store.fresh():
+        sys.exit("aggregate views could not be built")
+    print(f"views ready in {time.perf_counter() - started:.2f}s")
+
+    print(f"{'shape':<24}{'raw ms':>10}{'view ms':>10}{'speedup':>10}  same rows")
+    for label, sql, params in QUERIES:
+        rule, rewritten = store.rewrite(sql)
+        raw_ms, raw_rows = timed(pool, sql, params, args.repeat)
+        view_ms, view_rows = timed(pool, rewritten, params, args.repeat)
+        same = comparable(label, raw_rows) == comparable(label, view_rows)
+        print(f"{label:<24}{raw_ms:>10.1f}{view_ms:>10.2f}{raw_ms / view_ms:>9.0f}x  {'yes' if same else 'NO'}")
+
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("UPDATE subjects SET total_mark = total_mark WHERE id = 1")
+        conn.commit()
+    store.note_write({"subjects"})
+    store.sync()
+    started = time.perf_counter()
+    store.refresh()
+    print(f"refresh after a write: {(time.perf_counter() - started) * 1000:.0f} ms")
+    store.close()
+    pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# Async serving: runs the Flask app (server.py) and then the ASGI app
+# (async_server.py) as a child process with Gemini replaced by
+# benchmarks/stub_llm.py, and opens --clients concurrent chats against each.
+# Every client sends --queries /query requests to one conversation, each
+# waiting on two slow stub LLM calls (SQL templates are disabled, summaries
+# forced through the LLM). It then reads /conversations and that conversation.
+# Flask is served as a WSGI deployment would serve it, by a fixed pool of
+# --flask-threads worker threads (0 for a thread per connection). The ASGI
+# app is served by uvicorn on one event loop. Reports throughput, latency
+# percentiles, errors, and the server's peak resident memory and thread count.
+#
+# Data is seeded by load_test.py into its own schema (--schema) of the database
+# configured by the DB_* variables, as in the load test.
+#
+#   python benchmarks/async_serving.py --clients 100,1000 --sql-latency 1 --summary-latency 1.5
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from dotenv import load_dotenv  # noqa: E402
+
+from load_test import PASSWORD, SCALES, percentile, seed  # noqa: E402
+from stub_llm import StubModel  # noqa: E402
+
+TARGETS = ["flask", "async"]
+LISTEN_BACKLOG = 4096
+
+
+# --- Server side (child process) ---
+def serve(args):
+    # Each mode imports only its own server, so neither starts the other's pools and threads
+    model = StubModel(args.sql_latency, args.summary_latency, args.jitter, args.seed)
+    if args.serve == "async":
+        import uvicorn
+
+        import async_server
+        logging.getLogger().setLevel(logging.WARNING)
+        async_server.model = model
+        uvicorn.run(async_server.app, host="127.0.0.1", port=args.port, log_level="warning", backlog=LISTEN_BACKLOG)
+        return
+
+    import server
+    logging.getLogger().setLevel(logging.WARNING)
+    server.model = model
+    from werkzeug.serving import BaseWSGIServer, ThreadedWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        # Requests are handled by a fixed set of worker threads, like gunicorn's gthread workers
+        request_queue_size = LISTEN_BACKLOG
+
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.workers = ThreadPoolExecutor(max_workers=args.flask_threads, thread_name_prefix="wsgi")
+
+        def process_request(self, request, client_address):
+            self.workers.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    class UnboundedWSGIServer(ThreadedWSGIServer):
+        request_queue_size = LISTEN_BACKLOG
+
+    server_class = PooledWSGIServer if args.flask_threads > 0 else UnboundedWSGIServer
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server_class("127.0.0.1", args.port, server.app).serve_forever()
+
+
+# --- Client side ---
+async def http(port, method, path, body=None, token=None, timeout=120.0):
+    payload = json.dumps(body).encode() if body is not None else b""
+    lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", "Connection: close", f"Content-Length: {len(payload)}"]
+    if body is not None:
+        lines.append("Content-Type: application/json")
+    if token:
+        lines.append(f"Authorization: Bearer {token}")
+    reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+    try:
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, content = raw.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), content
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    async def call(self, name, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            status, content = await http(*args, **kwargs)
+        except Exception as e:
+            status, content = type(e).__name__, b""
+        if status == 200:
+            self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        else:
+            errors = self.errors.setdefault(name, {})
+            errors[status] = errors.get(status, 0) + 1
+        return status, content
+
+
+async def client(number, port, token, args, recorder):
+    conversation = None
+    for turn in range(args.queries):
+        status, content = await recorder.call("query", port, "POST", "/query", {
+            "query": f"Calculate total marks of student {number}-{turn}",
+            "conversationId": conversation,
+            "summarizer": "llm",
+        }, token, timeout=args.timeout)
+        if status == 200:
+            conversation = (json.loads(content).get("newConversation") or {}).get("id", conversation)
+    await recorder.call("conversations", port, "GET", "/conversations?limit=20", token=token, timeout=args.timeout)
+    if conversation:
+        await recorder.call("conversation", port, "GET", f"/conversation/{conversation}", token=token,
+                            timeout=args.timeout)
+
+
+async def wait_until_up(port, child, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if child.poll() is not None:
+            raise RuntimeError(f"server exited with status {child.returncode}")
+        try:
+            status, _ = await http(port, "GET", "/metrics", timeout=2.0)
+            if status == 200:
+                return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def proc_status(pid):
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                values[key] = value.split()[0] if value.split() else ""
+    except OSError:
+        pass
+    return values
+
+
+async def drive(port, child, clients, args):
+    users = min(clients, SCALES[args.scale][1])
+    tokens = []
+    for user_id in range(1, users + 1):
+        status, content = await http(port, "POST", "/login",
+                                     {"email": f"bench{user_id}@example.com", "password": PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"login failed for bench{user_id}: {status} {content[:200]}")
+        tokens.append(json.loads(content)["token"])
+
+    recorder = Recorder()
+    max_threads = 0
+    done = asyncio.Event()
+
+    async def sample():
+        nonlocal max_threads
+        while not done.is_set():
+            max_threads = max(max_threads, int(proc_status(child.pid).get("Threads", 0) or 0))
+            await asyncio.sleep(0.25)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i, port, tokens[i % users], args, recorder) for i in range(clients)))
+    wall = time.perf_counter() - started
+    done.set()
+    await sampler
+    peak_rss = int(proc_status(child.pid).get("VmHWM", 0) or 0) / 1024
+    return recorder, wall, peak_rss, max_threads
+
+
+def ms(values, pct):
+    return percentile(values, pct) * 1000 if values else 0.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run(target, clients, args):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "LLM_RATE_LIMIT": "0",
+        "LLM_MAX_IN_FLIGHT": str(clients * 2),
+        "SQL_TEMPLATES_ENABLED": "false",
+        "DB_POOL_MAX": str(args.db_pool),
+        "ASYNC_DB_POOL_MAX": str(args.db_pool),
+        "METRICS_PUBLIC": "true",  # polled to see when the server is up
+    })
+    command = [sys.executable, os.path.abspath(__file__), "--serve", target, "--port", str(port),
+               "--flask-threads", str(args.flask_threads), "--sql-latency", str(args.sql_latency),
+               "--summary-latency", str(args.summary_latency), "--jitter", str(args.jitter), "--seed", str(args.seed)]
+    child = subprocess.Popen(command, cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_until_up(port, child))
+        return asyncio.run(drive(port, child, clients, args))
+    finally:
+        child.send_signal(signal.SIGINT)
+        try:
+            child.wait(10)
+        except subprocess.TimeoutExpired:
+            child.kill()
+            child.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Flask and async servers under many slow chats")
+    parser.add_argument("--clients", default="100,1000", help="comma-separated counts of concurrent chats")
+    parser.add_argument("--queries", type=int, default=2, help="/query requests per chat")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"comma-separated, from {', '.join(TARGETS)}")
+    parser.add_argument("--flask-threads", type=int, default=32, help="Flask worker threads, 0 = one per connection")
+    parser.add_argument("--db-pool", type=int, default=10, help="maximum database connections of either server")
+    parser.add_argument("--sql-latency", type=float, default=1.0, help="stub LLM seconds per NL->SQL call")
+    parser.add_argument("--summary-latency", type=float, default=1.5, help="stub LLM seconds per summary call")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=120.0, help="client seconds per request")
+    parser.add_argument("--scale", default="small", choices=list(SCALES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schema", default="chatbot_bench")
+    parser.add_argument("--serve", choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    load_dotenv(os.path.join(SERVER_DIR, ".env"))
+    os.environ["PGOPTIONS"] = f"{os.getenv('PGOPTIONS', '')} -c search_path={args.schema}".strip()
+    seed(args.schema, args.scale, args.seed, 10)
+
+    flask_mode = f"{args.flask_threads} threads" if args.flask_threads > 0 else "thread per connection"
+    print(f"LLM {args.sql_latency}s + {args.summary_latency}s +/- {args.jitter}s per query, {args.queries} queries "
+          f"per chat, Flask with {flask_mode}, {args.db_pool} database connections")
+    print(f"{'server':<8}{'chats':>7}{'queries/s':>11}{'wall s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'history p95':>13}{'RSS MB':>8}{'threads':>9}  errors")
+    for clients in sorted({int(n) for n in args.clients.split(",")}):
+        for target in [t.strip() for t in args.targets.split(",") if t.strip()]:
+            recorder, wall, peak_rss, max_threads = run(target, clients, args)
+            queries = recorder.latencies.get("query", [])
+            history = recorder.latencies.get("conversations", []) + recorder.latencies.get("conversation", [])
+            errors = ", ".join(f"{name} {status}x{count}" for name, by_status in recorder.errors.items()
+                               for status, count in by_status.items())
+            print(f"{target:<8}{clients:>7}{len(queries) / wall:>11.1f}{wall:>8.1f}"
+                  f"{ms(queries, 50):>9.0f}{ms(queries, 95):>9.0f}{ms(queries, 99):>9.0f}{ms(history, 95):>13.0f}"
+                  f"{peak_rss:>8.0f}{max_threads:>9}  {errors}")
+
+
+if __name__ == "__main__":
+    main()
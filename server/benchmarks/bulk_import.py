@@ -0,0 +1,98 @@
+# Bulk user import: times user_import.import_users on synthetic users against
+# the row-at-a-time approach of user-add.py (hash, INSERT, commit per user),
+# then re-imports the same users to time conflict reporting. Runs in a scratch
+# schema of the database configured by the DB_* variables, dropped afterwards.
+# The row-at-a-time figure is extrapolated from its first --baseline-rows users.
+#
+#   python benchmarks/bulk_import.py [--users 10000] [--rounds 8] [--workers 1,4]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_import import connect, hash_password, import_users, parse_users  # noqa: E402
+
+SCHEMA = "user_import_bench"
+
+
+def reset_schema(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+        cursor.execute(f"""
+            CREATE TABLE {SCHEMA}.users (
+                id SERIAL PRIMARY KEY,
+                name TEXT,
+                email VARCHAR(255) UNIQUE NOT NULL,
+                password VARCHAR(255) NOT NULL,
+                role TEXT
+            )
+        """)
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+    conn.commit()
+
+
+def synthetic_records(count):
+    for i in range(count):
+        yield i + 2, {"name": f"Teacher {i}", "email": f"teacher{i}@example.com",
+                      "password": f"password-{i}", "role": "teacher"}
+
+
+def row_at_a_time(conn, rows, rounds):
+    started = time.perf_counter()
+    with conn.cursor() as cursor:
+        for row in rows:
+            hashed = hash_password(row.password, rounds)
+            cursor.execute("INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)",
+                           (row.name, row.email, hashed, row.role))
+            conn.commit()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bulk user importer")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=8, help="bcrypt cost factor (12 in production)")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated pool sizes")
+    parser.add_argument("--baseline-rows", type=int, default=300, help="users timed row-at-a-time")
+    args = parser.parse_args()
+
+    rows, problems = parse_users(synthetic_records(args.users), "teacher")
+    assert not problems
+    conn = connect()
+    print(f"{args.users} users, bcrypt rounds {args.rounds}, {os.cpu_count()} CPUs")
+    print(f"{'method':<24}{'seconds':>10}{'users/s':>10}  stages")
+    try:
+        reset_schema(conn)
+        sample = rows[:args.baseline_rows]
+        seconds = row_at_a_time(conn, sample, args.rounds) * args.users / max(1, len(sample))
+        print(f"{'row-at-a-time (est.)':<24}{seconds:>10.1f}{args.users / seconds:>10.0f}")
+
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            reset_schema(conn)
+            started = time.perf_counter()
+            imported, problems, timings = import_users(conn, rows, rounds=args.rounds, workers=workers)
+            seconds = time.perf_counter() - started
+            assert imported == args.users and not problems, (imported, problems[:3])
+            stages = ", ".join(f"{stage} {value:.2f}s" for stage, value in timings.items())
+            print(f"{f'import, {workers} workers':<24}{seconds:>10.1f}{args.users / seconds:>10.0f}  {stages}")
+
+        started = time.perf_counter()
+        imported, problems, timings = import_users(conn, rows, rounds=args.rounds, workers=1)
+        seconds = time.perf_counter() - started
+        assert imported == 0 and len(problems) == args.users
+        print(f"{'re-import (conflicts)':<24}{seconds:>10.1f}{args.users / seconds:>10.0f}  "
+              f"{len(problems)} conflicts reported")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
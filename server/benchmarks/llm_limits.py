@@ -0,0 +1,109 @@
+# LLM call limits: concurrent callers hit a stub provider that enforces a
+# requests-per-second quota with 429s and injects random 429s and very slow
+# responses. The same load is run with bare send_message calls (no limit,
+# timeout or retry, as before LLMClient) and through LLMClient, and the share
+# of calls answered, caller latency and what the provider saw are compared.
+#
+#   python benchmarks/llm_limits.py [--callers 32] [--duration 10] [--quota 10]
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import LLMClient, LLMUnavailable  # noqa: E402
+from stub_llm import StubModel  # noqa: E402
+
+PROMPT = "Summarize these rows for the user."
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(label, args, send, stub):
+    outcomes = {"ok": 0, "rate_limited": 0, "unavailable": 0, "error": 0}
+    latencies = []
+    lock = threading.Lock()
+    stop = time.monotonic() + args.duration
+
+    def caller():
+        chat = stub.start_chat()
+        while time.monotonic() < stop:
+            started = time.monotonic()
+            try:
+                send(chat)
+                outcome = "ok"
+            except LLMUnavailable:
+                outcome = "unavailable"
+            except Exception as e:
+                outcome = "rate_limited" if getattr(e, "code", None) == 429 else "error"
+            with lock:
+                outcomes[outcome] += 1
+                latencies.append(time.monotonic() - started)
+            if outcome != "ok":
+                time.sleep(0.05)  # what a user retrying by hand would at least do
+
+    threads = [threading.Thread(target=caller) for _ in range(args.callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = sum(outcomes.values())
+    print(f"{label:<12}{total:>7}{outcomes['ok']:>7}{outcomes['ok'] / total:>6.0%}{outcomes['rate_limited']:>8}"
+          f"{outcomes['unavailable']:>8}{outcomes['error']:>7}"
+          f"{percentile(latencies, 50) * 1000:>9.0f}{percentile(latencies, 95) * 1000:>9.0f}"
+          f"{percentile(latencies, 99) * 1000:>9.0f}{stub.errors[429]:>8}{stub.max_in_flight:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bare LLM calls with LLMClient against a throttling stub")
+    parser.add_argument("--callers", type=int, default=32, help="concurrent callers")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--quota", type=float, default=10.0, help="provider requests per second before 429s")
+    parser.add_argument("--latency", type=float, default=0.4, help="provider seconds per call")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of calls failed with a random 429")
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="share of calls that hang")
+    parser.add_argument("--slow-latency", type=float, default=20.0, help="seconds a hanging call takes")
+    parser.add_argument("--rate", type=float, default=8.0, help="client calls per second")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--call-timeout", type=float, default=2.0)
+    parser.add_argument("--budget", type=float, default=8.0, help="client seconds per caller request")
+    args = parser.parse_args()
+
+    def stub():
+        return StubModel(summary_latency=args.latency, jitter=args.latency / 4, rate_limit=args.quota,
+                         error_rate=args.error_rate, slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+
+    print(f"{args.callers} callers for {args.duration:.0f}s, provider quota {args.quota:.0f}/s, "
+          f"{args.error_rate:.0%} random 429s, {args.slow_rate:.0%} of calls hang for {args.slow_latency:.0f}s")
+    print(f"{'':<12}{'calls':>7}{'answered':>13}{'429':>8}{'busy':>8}{'error':>7}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'prov429':>8}{'prov max':>8}")
+
+    bare = stub()
+    run("bare", args, lambda chat: chat.send_message(PROMPT), bare)
+
+    limited = stub()
+    local = threading.local()
+    client = LLMClient(rate=args.rate, burst=int(args.rate), max_in_flight=args.max_in_flight,
+                       call_timeout=args.call_timeout, deadline_fn=lambda: local.deadline)
+
+    def send(chat):
+        local.deadline = time.monotonic() + args.budget
+        client.send(chat, PROMPT)
+
+    run("LLMClient", args, send, limited)
+    stats = client.stats()
+    print(f"client: {stats['retries']} retries, {stats['throttled']} throttled, {stats['rejected']} rejected, "
+          f"{stats['timeouts']} budget timeouts, final rate {stats['rate']}/s, avg queue wait {stats['avg_wait_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,489 @@
+# End-to-end load test: seeds a local PostgreSQL with synthetic students,
+# subjects, users and chat history at one or more scales, serves the app
+# in-process with Gemini replaced by benchmarks/stub_llm.py, and drives /login,
+# /query, /conversations and /conversation/<id> from concurrent virtual users.
+# Reports throughput and p50/p95/p99 per endpoint and per pipeline stage.
+#
+# Everything lives in its own schema (--schema, default chatbot_bench) of the
+# database configured by the DB_* variables in server/.env; the server's
+# connections are pointed at it through PGOPTIONS, so real tables are never read
+# or written.
+#
+#   python benchmarks/load_test.py --scales small,medium --duration 30
+#   python benchmarks/load_test.py --save baseline.json
+#   python benchmarks/load_test.py --baseline baseline.json --tolerance 0.15   # exits 1 on regression
+
+import argparse
+import datetime
+import http.client
+import io
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import bcrypt  # noqa: E402
+import psycopg2  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from stub_llm import StubModel  # noqa: E402
+
+# students, users, conversations per user, turns per conversation
+SCALES = {
+    "small": (1_000, 50, 20, 5),
+    "medium": (10_000, 200, 50, 8),
+    "large": (100_000, 1_000, 100, 10),
+}
+DEPARTMENTS = ["CSE", "ECE", "EIE", "MECH", "CIVIL", "IT", "AGRI", "CSBS"]
+SUBJECTS = ["MATHEMATICS", "PHYSICS", "DATA STRUCTURES-1", "OPERATING SYSTEMS", "OOPS", "DIGITAL ELECTRONICS"]
+EXAMS = ["PERIODICAL TEST-1", "PERIODICAL TEST-2", "CYCLE TEST-1"]
+SYLLABLES = ["ka", "ri", "lo", "mu", "sa", "thi", "van", "pa", "na", "dhi", "ra", "gu", "ven", "ji", "ar", "nes"]
+PASSWORD = "benchmark-password"
+
+# {name} is replaced with a seeded student's name. Template-shaped questions are
+# compiled locally; the others go through the stub LLM.
+QUESTIONS = [
+    "Show all {dept} students",
+    "How many students are in {dept}",
+    "Department wise student count",
+    "Top 10 students by total marks",
+    "Show DS-1 mark for {name} in PT1",
+    "Show marks of {name} in PT-2",
+    "Average marks by department",
+    "Highest marks in Mathematics",
+    "Students who scored below 40 in Operating Systems",
+    "Calculate total marks of {name}",
+    "Give me details of student {name}",
+]
+
+DDL = """
+CREATE TABLE users (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    role TEXT
+);
+CREATE TABLE chatbot_history (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    conversation_id VARCHAR(255),
+    title VARCHAR(255),
+    user_query TEXT,
+    nl_response TEXT,
+    generated_sql TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX chatbot_history_conversation_idx
+    ON chatbot_history (user_id, conversation_id, created_at DESC, id DESC);
+CREATE TABLE chatbot_conversations (
+    id VARCHAR(255) PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    title VARCHAR(255),
+    created_at TIMESTAMP NOT NULL,
+    last_activity TIMESTAMP NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX chatbot_conversations_recent_idx
+    ON chatbot_conversations (user_id, last_activity DESC, id DESC);
+CREATE TABLE students (
+    id TEXT PRIMARY KEY,
+    roll_no TEXT,
+    name TEXT,
+    dept TEXT,
+    mailid TEXT,
+    sem TEXT,
+    year INTEGER,
+    speciallab TEXT
+);
+CREATE TABLE subjects (
+    id SERIAL PRIMARY KEY,
+    exam_name TEXT,
+    course_code TEXT,
+    student_id TEXT REFERENCES students(id),
+    subject_name TEXT,
+    total_mark INTEGER
+);
+CREATE TABLE bench_meta (scale TEXT, seed INTEGER);
+"""
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def student_name(index):
+    parts = []
+    for _ in range(2):
+        word = ""
+        value = index
+        for _ in range(3):
+            word += SYLLABLES[value % len(SYLLABLES)]
+            value //= len(SYLLABLES)
+        parts.append(word)
+        index = index * 7 + 3
+    return " ".join(parts).upper()
+
+
+def conversation_id(user_id, number):
+    return f"bench-{user_id}-{number}"
+
+
+# --- Seeding ---
+def connect(schema):
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"), options=f"-c search_path={schema}",
+    )
+
+
+def copy_rows(cursor, table, columns, rows, chunk=50_000):
+    buffer, count = io.StringIO(), 0
+
+    def send():
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        buffer.write("\t".join("\\N" if v is None else str(v).replace("\t", " ").replace("\n", " ") for v in row))
+        buffer.write("\n")
+        count += 1
+        if count % chunk == 0:
+            send()
+    if buffer.tell():
+        send()
+    return count
+
+
+def seed(schema, scale, seed_value, bcrypt_rounds, reseed=False):
+    students, users, conversations, turns = SCALES[scale]
+    conn = connect(schema)
+    try:
+        with conn.cursor() as cursor:
+            if not reseed:
+                cursor.execute("SELECT to_regclass(%s)", (f"{schema}.bench_meta",))
+                if cursor.fetchone()[0]:
+                    cursor.execute("SELECT scale, seed FROM bench_meta")
+                    if cursor.fetchone() == (scale, seed_value):
+                        print(f"[{scale}] reusing seeded schema {schema}")
+                        conn.rollback()
+                        return
+            started = time.perf_counter()
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            cursor.execute(f"SET search_path = {schema}")
+            cursor.execute(DDL)
+            rng = random.Random(seed_value)
+
+            copy_rows(cursor, "students", ["id", "roll_no", "name", "dept", "mailid", "sem", "year", "speciallab"], (
+                (f"S{i:07d}", f"73762{i % 4 + 1}1{DEPARTMENTS[i % len(DEPARTMENTS)]}{i % 1000:03d}",
+                 student_name(i), DEPARTMENTS[i % len(DEPARTMENTS)], f"student{i}@example.com",
+                 f"S{i % 8 + 1}", i % 4 + 1, None)
+                for i in range(students)
+            ))
+            copy_rows(cursor, "subjects", ["exam_name", "course_code", "student_id", "subject_name", "total_mark"], (
+                (exam, f"C{j:03d}", f"S{i:07d}", subject, rng.randint(10, 100))
+                for i in range(students) for exam in EXAMS for j, subject in enumerate(SUBJECTS)
+            ))
+
+            hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(bcrypt_rounds)).decode()
+            copy_rows(cursor, "users", ["id", "name", "email", "password", "role"], (
+                (u, f"Bench User {u}", f"bench{u}@example.com", hashed, "teacher") for u in range(1, users + 1)
+            ))
+            cursor.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), %s)", (users,))
+
+            base = datetime.datetime.now() - datetime.timedelta(days=365)
+            history, index = [], []
+            for u in range(1, users + 1):
+                for c in range(conversations):
+                    started_at = base + datetime.timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+                    title = QUESTIONS[rng.randrange(len(QUESTIONS))].format(dept="CSE", name=student_name(c))
+                    for t in range(turns):
+                        history.append((u, conversation_id(u, c), title, title, "Stub answer.",
+                                        started_at + datetime.timedelta(minutes=t)))
+                    index.append((conversation_id(u, c), u, title, started_at,
+                                  started_at + datetime.timedelta(minutes=turns - 1), turns))
+            copy_rows(cursor, "chatbot_history",
+                      ["user_id", "conversation_id", "title", "user_query", "nl_response", "created_at"], history)
+            copy_rows(cursor, "chatbot_conversations",
+                      ["id", "user_id", "title", "created_at", "last_activity", "message_count"], index)
+            cursor.execute("INSERT INTO bench_meta VALUES (%s, %s)", (scale, seed_value))
+            cursor.execute("ANALYZE")
+        conn.commit()
+        print(f"[{scale}] seeded {students:,} students, {students * len(EXAMS) * len(SUBJECTS):,} marks, "
+              f"{users:,} users, {len(history):,} history rows in {time.perf_counter() - started:.1f}s")
+    finally:
+        conn.close()
+
+
+# --- Measurement ---
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.measuring = False
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = defaultdict(list)
+            self.errors = defaultdict(lambda: defaultdict(int))
+            self.stages = defaultdict(list)
+
+    def endpoint(self, name, status, seconds):
+        if not self.measuring:
+            return
+        with self._lock:
+            if 200 <= status < 300:
+                self.endpoints[name].append(seconds)
+            else:
+                self.errors[name][status] += 1
+
+    def stage(self, name, seconds):
+        if not self.measuring:
+            return
+        with self._lock:
+            self.stages[name].append(seconds)
+
+    def timed(self, name, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.stage(name, time.perf_counter() - started)
+        return wrapper
+
+    def summary(self, duration):
+        def describe(samples):
+            return {
+                "count": len(samples),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            }
+
+        with self._lock:
+            endpoints = {}
+            for name in sorted(set(self.endpoints) | set(self.errors)):
+                samples = self.endpoints.get(name, [])
+                endpoints[name] = {
+                    **(describe(samples) if samples else {"count": 0}),
+                    "rps": round(len(samples) / duration, 2),
+                    "errors": dict(self.errors.get(name, {})),
+                }
+            stages = {name: describe(samples) for name, samples in sorted(self.stages.items()) if samples}
+        return {"endpoints": endpoints, "stages": stages}
+
+
+def instrument(server, recorder):
+    # Stage timings come from wrapping the module-level pipeline functions the
+    # endpoints call, so the server itself needs no benchmark hooks.
+    for attr, stage in [
+        ("translate_to_sql", "query.translate"),
+        ("execute_query", "query.execute"),
+        ("summarize_results", "query.summarize"),
+        ("save_chat_history", "query.history"),
+    ]:
+        setattr(server, attr, recorder.timed(stage, getattr(server, attr)))
+    server.db_pool.getconn = recorder.timed("db.acquire", server.db_pool.getconn)
+    server.password_verifier.verify = recorder.timed("login.verify", server.password_verifier.verify)
+
+
+def request(port, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def virtual_user(number, port, scale, args, mix, recorder, deadline):
+    _, users, conversations, _ = SCALES[scale]
+    rng = random.Random(args.seed * 1000 + number)
+    user_id = number % users + 1
+    email = f"bench{user_id}@example.com"
+    token, current_conversation = None, None
+    names, weights = zip(*mix)
+
+    def call(name, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, payload = request(port, method, path, body, token)
+        except Exception:
+            status, payload = 599, b""
+        recorder.endpoint(name, status, time.perf_counter() - started)
+        return status, payload
+
+    while time.monotonic() < deadline:
+        action = "login" if token is None else rng.choices(names, weights)[0]
+        if action == "login":
+            status, payload = call("login", "POST", "/login", {"email": email, "password": PASSWORD})
+            if status == 200:
+                token = json.loads(payload)["token"]
+        elif action == "query":
+            question = rng.choice(QUESTIONS).format(
+                dept=rng.choice(DEPARTMENTS), name=student_name(rng.randrange(SCALES[scale][0]))
+            )
+            if rng.random() < 0.3:
+                current_conversation = None
+            status, payload = call("query", "POST", "/query", {
+                "query": question, "conversationId": current_conversation, "summarizer": args.summarizer,
+            })
+            if status == 200:
+                new_conversation = json.loads(payload).get("newConversation") or {}
+                current_conversation = new_conversation.get("id", current_conversation)
+        elif action == "conversations":
+            call("conversations", "GET", "/conversations")
+        else:
+            conversation = conversation_id(user_id, rng.randrange(conversations))
+            call("conversation", "GET", f"/conversation/{conversation}")
+
+
+def run_scale(server, port, scale, args, mix, recorder, model):
+    server.translation_cache.clear()
+    server.result_cache.clear()
+    server.token_cache.clear()
+    recorder.reset()
+    recorder.measuring = False
+
+    started = time.monotonic()
+    deadline = started + args.warmup + args.duration
+    threads = [
+        threading.Thread(target=virtual_user, args=(i, port, scale, args, mix, recorder, deadline), daemon=True)
+        for i in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    recorder.measuring = True
+    for thread in threads:
+        thread.join()
+    recorder.measuring = False
+    server.history_writer.flush()
+
+    result = recorder.summary(args.duration)
+    result["llm_calls"] = dict(model.calls)
+    print(f"\n[{scale}] {args.concurrency} users, {args.duration:.0f}s "
+          f"(LLM {args.sql_latency}s/{args.summary_latency}s +/- {args.jitter}s)")
+    print(f"{'endpoint':<16} {'count':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  errors")
+    for name, row in result["endpoints"].items():
+        print(f"{name:<16} {row['count']:>7} {row['rps']:>8.2f} {row.get('p50_ms', 0):>9.1f} "
+              f"{row.get('p95_ms', 0):>9.1f} {row.get('p99_ms', 0):>9.1f}  {row['errors'] or ''}")
+    print(f"{'stage':<16} {'count':>7} {'':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in result["stages"].items():
+        print(f"{name:<16} {row['count']:>7} {'':>8} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}")
+    return result
+
+
+def compare(results, baseline, tolerance):
+    # A scale/endpoint regresses when its p95 grows or its throughput drops by
+    # more than `tolerance`, or when it starts returning errors.
+    failures = []
+    for scale, previous in baseline.items():
+        current = results.get(scale)
+        if current is None:
+            continue
+        for name, before in previous["endpoints"].items():
+            after = current["endpoints"].get(name)
+            if after is None or not after.get("count"):
+                failures.append(f"{scale}/{name}: no successful requests")
+                continue
+            if before.get("p95_ms") and after["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                failures.append(f"{scale}/{name}: p95 {before['p95_ms']} -> {after['p95_ms']} ms")
+            if before.get("rps") and after["rps"] < before["rps"] * (1 - tolerance):
+                failures.append(f"{scale}/{name}: throughput {before['rps']} -> {after['rps']} req/s")
+            if after["errors"] and not before.get("errors"):
+                failures.append(f"{scale}/{name}: new errors {after['errors']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test with a stub LLM")
+    parser.add_argument("--scales", default="small", help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds per scale")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before each run")
+    parser.add_argument("--mix", default="login=1,query=6,conversations=2,conversation=2",
+                        help="relative weights of the endpoints after each user's first login")
+    parser.add_argument("--sql-latency", type=float, default=0.8, help="stub LLM seconds per NL->SQL call")
+    parser.add_argument("--summary-latency", type=float, default=1.2, help="stub LLM seconds per summary call")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--summarizer", choices=["auto", "local", "llm"], default=None,
+                        help="per-request summarizer override (default: SUMMARIZER_MODE)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bcrypt-rounds", type=int, default=10, help="cost of the seeded password hashes")
+    parser.add_argument("--schema", default="chatbot_bench")
+    parser.add_argument("--reseed", action="store_true", help="rebuild the schema even if already seeded")
+    parser.add_argument("--save", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier --save to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed regression, as a fraction")
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    mix = [(name, float(weight)) for name, weight in (item.split("=") for item in args.mix.split(","))]
+
+    load_dotenv(os.path.join(SERVER_DIR, ".env"))
+    # Must be set before the server module opens its pool
+    os.environ["PGOPTIONS"] = f"{os.getenv('PGOPTIONS', '')} -c search_path={args.schema}".strip()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    recorder = Recorder()
+    model = StubModel(args.sql_latency, args.summary_latency, args.jitter, args.seed, observe=recorder.stage)
+    seed(args.schema, scales[0], args.seed, args.bcrypt_rounds, args.reseed)
+
+    import server
+    from werkzeug.serving import make_server
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server.model = model
+    instrument(server, recorder)
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    results = {}
+    try:
+        for i, scale in enumerate(scales):
+            if i:
+                seed(args.schema, scale, args.seed, args.bcrypt_rounds, args.reseed)
+            model.calls = {"sql": 0, "summary": 0}
+            results[scale] = run_scale(server, httpd.server_port, scale, args, mix, recorder, model)
+    finally:
+        httpd.shutdown()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.tolerance)
+        if failures:
+            print("\nRegressions:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
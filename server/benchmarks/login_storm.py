@@ -0,0 +1,165 @@
+# Login storm: hammers /login with concurrent bcrypt checks while a probe
+# measures /conversations latency, with bcrypt inline on the request thread
+# and in the bounded worker pool. Runs offline: the database is replaced by an
+# in-memory user row and the app is served by werkzeug in this process.
+#
+#   python benchmarks/login_storm.py [--logins 32] [--rounds 12] [--duration 5]
+
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+import server  # noqa: E402
+from password_verifier import PasswordVerifier  # noqa: E402
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class FakeCursor:
+    def __init__(self, hashed):
+        self.hashed = hashed
+        self.query = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def fetchone(self):
+        return (1, self.hashed) if "FROM users" in self.query else None
+
+    def fetchall(self):
+        return []
+
+
+class FakeConnection:
+    def __init__(self, hashed):
+        self.hashed = hashed
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.hashed)
+
+    def rollback(self):
+        pass
+
+    def commit(self):
+        pass
+
+
+def request(port, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    started = time.perf_counter()
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    payload = response.read()
+    conn.close()
+    return response.status, payload, time.perf_counter() - started
+
+
+def probe(port, token, duration, interval=0.02):
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        status, _, elapsed = request(port, "GET", "/conversations", token=token)
+        if status == 200:
+            latencies.append(elapsed)
+        time.sleep(interval)
+    return latencies
+
+
+def storm(port, logins, duration):
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        while time.monotonic() < deadline:
+            status, _, _ = request(port, "POST", "/login", {"email": EMAIL, "password": PASSWORD})
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(logins)]
+    for thread in threads:
+        thread.start()
+    return threads, statuses
+
+
+def run(label, port, token, args):
+    idle = probe(port, token, min(args.duration, 2.0))
+    threads, statuses = storm(port, args.logins, args.duration)
+    time.sleep(0.2)
+    loaded = probe(port, token, args.duration - 0.2)
+    for thread in threads:
+        thread.join()
+    logins = sum(statuses.values())
+    print(f"{label:<8} probe p50/p95/p99 idle "
+          f"{percentile(idle, 50) * 1000:6.1f}/{percentile(idle, 95) * 1000:6.1f}/{percentile(idle, 99) * 1000:6.1f} ms"
+          f" | storm {percentile(loaded, 50) * 1000:6.1f}/{percentile(loaded, 95) * 1000:6.1f}"
+          f"/{percentile(loaded, 99) * 1000:6.1f} ms"
+          f" | logins {logins / args.duration:6.1f}/s {dict(sorted(statuses.items()))}")
+    print(f"{'':<8} verifier {server.password_verifier.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe latency during a burst of logins")
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor of the stored hash")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of storm per mode")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BCRYPT_WORKERS", "2")))
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.rounds)).decode()
+
+    @contextlib.contextmanager
+    def fake_connection():
+        yield FakeConnection(hashed)
+
+    server.db_connection = fake_connection
+    server.history_writer.flush = lambda timeout=5.0: True
+
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_port
+
+    status, payload, _ = request(port, "POST", "/login", {"email": EMAIL, "password": PASSWORD})
+    token = json.loads(payload)["token"]
+
+    modes = [
+        ("inline", PasswordVerifier(max_workers=0, max_pending=args.logins)),
+        ("pool", PasswordVerifier(max_workers=args.workers, max_pending=server.BCRYPT_MAX_PENDING,
+                                  acquire_timeout=server.BCRYPT_ACQUIRE_TIMEOUT)),
+    ]
+    for label, verifier in modes:
+        server.password_verifier.close()
+        server.password_verifier = verifier.start()
+        run(label, port, token, args)
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Compares the NL->SQL prompt with every few-shot example (the original
+# monolithic prompt) against the retrieval-based prompt with only the top-k
+# examples.
+#
+#   python benchmarks/prompt_size.py                 # offline, estimated tokens
+#   python benchmarks/prompt_size.py --count-tokens  # exact tokens via the Gemini API
+#   python benchmarks/prompt_size.py --live          # also time real generate calls
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sql_prompt import build_sql_prompt  # noqa: E402
+
+QUESTIONS = [
+    "Show DS-1 mark for Parthiban in PT1",
+    "Get OOPS score of 7376231CS229 in test 1",
+    "Show all CSE students",
+    "List students in semester 5",
+    "Department wise student count",
+    "Average marks by department",
+    "Top 10 students by total marks",
+    "Highest marks in Mathematics",
+    "How many students are in ECE",
+    "Students who scored below 40 in OS",
+    "Update marks of Logith in Physics to 75",
+    "Delete student with roll number 7376231CS111",
+    "Add a column for address to students",
+    "Students who haven't taken any exams",
+    "Give me details of student Kumar",
+]
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English prose and SQL
+    return max(1, len(text) // 4)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and retrieval-based NL->SQL prompt sizes")
+    parser.add_argument("-k", type=int, default=int(os.getenv("SQL_PROMPT_EXAMPLES", "6")),
+                        help="examples per retrieved prompt")
+    parser.add_argument("--count-tokens", action="store_true", help="count tokens with the Gemini API")
+    parser.add_argument("--live", action="store_true", help="time real Gemini calls for both prompts")
+    args = parser.parse_args()
+
+    model = None
+    if args.count_tokens or args.live:
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+        load_dotenv()
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        model = genai.GenerativeModel(model_name="gemini-1.5-flash")
+
+    def tokens(text):
+        if args.count_tokens:
+            return model.count_tokens(text).total_tokens
+        return estimate_tokens(text)
+
+    def timed_call(prompt):
+        started = time.perf_counter()
+        model.generate_content(prompt)
+        return time.perf_counter() - started
+
+    full_tokens, retrieved_tokens, full_latency, retrieved_latency = [], [], [], []
+    print(f"{'question':<50} {'full':>7} {'top-' + str(args.k):>7} {'saved':>7}")
+    for question in QUESTIONS:
+        full_prompt = build_sql_prompt(question, k=None)
+        retrieved_prompt = build_sql_prompt(question, k=args.k)
+        full, retrieved = tokens(full_prompt), tokens(retrieved_prompt)
+        full_tokens.append(full)
+        retrieved_tokens.append(retrieved)
+        print(f"{question[:50]:<50} {full:>7} {retrieved:>7} {1 - retrieved / full:>7.1%}")
+        if args.live:
+            full_latency.append(timed_call(full_prompt))
+            retrieved_latency.append(timed_call(retrieved_prompt))
+
+    unit = "tokens" if args.count_tokens else "tokens (estimated)"
+    print(f"\nmean prompt size: full={statistics.mean(full_tokens):.0f} "
+          f"top-{args.k}={statistics.mean(retrieved_tokens):.0f} {unit}")
+    if args.live:
+        for name, values in (("full", full_latency), (f"top-{args.k}", retrieved_latency)):
+            print(f"{name:>8} latency: p50={percentile(values, 50) * 1000:.0f}ms "
+                  f"p95={percentile(values, 95) * 1000:.0f}ms mean={statistics.mean(values) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
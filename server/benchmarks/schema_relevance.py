@@ -0,0 +1,93 @@
+# Schema catalog: builds the students/subjects tables plus --extra unrelated
+# tables in a scratch schema of the database configured by the DB_* variables
+# (dropped afterwards), then compares the schema section of the NL->SQL prompt
+# listing every table with the one listing only the tables relevant to each
+# question, and times catalog loads.
+#
+#   python benchmarks/schema_relevance.py [--extra 0,20,100]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from db_pool import ConnectionPool  # noqa: E402
+from prompt_size import QUESTIONS, estimate_tokens  # noqa: E402
+from schema_catalog import SchemaCatalog  # noqa: E402
+from sql_prompt import COLUMN_NOTES  # noqa: E402
+
+SCHEMA = "schema_catalog_bench"
+AREAS = ["library", "hostel", "transport", "canteen", "placement", "sports", "alumni", "payroll", "inventory",
+         "events", "admissions", "research", "clubs", "counselling", "scholarship", "medical", "parking",
+         "visitors", "workshop", "internship"]
+KINDS = ["records", "requests", "logs", "items", "accounts"]
+COLUMNS = ["title TEXT", "status TEXT", "amount NUMERIC(10, 2)", "created_at TIMESTAMP", "owner TEXT",
+           "notes TEXT", "priority INTEGER"]
+
+
+def build(pool, extra):
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+            cursor.execute(f"SET search_path TO {SCHEMA}")
+            cursor.execute("""
+                CREATE TABLE students (id TEXT PRIMARY KEY, roll_no TEXT, name TEXT, dept TEXT, mailid TEXT,
+                                       sem TEXT, year INTEGER, speciallab TEXT);
+                CREATE TABLE subjects (id SERIAL PRIMARY KEY, exam_name TEXT, course_code TEXT,
+                                       student_id TEXT REFERENCES students(id), subject_name TEXT, total_mark INTEGER);
+            """)
+            for i in range(extra):
+                name = f"{AREAS[i % len(AREAS)]}_{KINDS[i // len(AREAS) % len(KINDS)]}"
+                if i >= len(AREAS) * len(KINDS):
+                    name += f"_{i}"
+                cursor.execute(f"CREATE TABLE {name} (id SERIAL PRIMARY KEY, {', '.join(COLUMNS)})")
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and relevant schema sections of the NL->SQL prompt")
+    parser.add_argument("--extra", default="0,20,100", help="comma-separated counts of unrelated tables")
+    parser.add_argument("--max-tables", type=int, default=8)
+    args = parser.parse_args()
+
+    load_dotenv()
+    pool = ConnectionPool(
+        minconn=1, maxconn=2,
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"), options=f"-c search_path={SCHEMA}",
+    )
+    print(f"{len(QUESTIONS)} questions, schema section size in estimated tokens")
+    print(f"{'tables':>7}{'full':>8}{'relevant avg':>14}{'max':>6}{'reduction':>11}{'load ms':>10}{'render ms':>11}")
+    try:
+        for extra in sorted({int(n) for n in args.extra.split(",")}):
+            build(pool, extra)
+            catalog = SchemaCatalog(pool, notes=COLUMN_NOTES, max_tables=args.max_tables)
+            loads = []
+            for _ in range(5):
+                catalog.invalidate()
+                started = time.perf_counter()
+                tables = catalog.tables()
+                loads.append((time.perf_counter() - started) * 1000)
+            full = estimate_tokens(catalog.render())
+            started = time.perf_counter()
+            relevant = [estimate_tokens(catalog.render(question)) for question in QUESTIONS]
+            render_ms = (time.perf_counter() - started) * 1000 / len(QUESTIONS)
+            average = statistics.mean(relevant)
+            print(f"{len(tables):>7}{full:>8}{average:>14.0f}{max(relevant):>6}{1 - average / full:>10.0%}"
+                  f"{statistics.median(loads):>10.1f}{render_ms:>11.2f}")
+    finally:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.commit()
+        pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
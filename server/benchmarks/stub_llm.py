@@ -0,0 +1,176 @@
+# Deterministic stand-in for genai.GenerativeModel used by the offline
+# benchmarks. SQL prompts are answered from CANNED_SQL (falling back to a
+# cheap count), summary prompts with a fixed sentence, each after a
+# configurable delay (slept on the event loop by send_message_async) so the
+# server's concurrency behaves as it would against the real API. It can also
+# act like a loaded provider: a requests-per-second quota answered with 429s,
+# randomly injected 429s and slow responses, and request_options timeouts
+# answered with 504s.
+
+import asyncio
+import collections
+import random
+import re
+import threading
+import time
+
+# (question pattern, SQL) for the benchmark questions that reach the LLM
+CANNED_SQL = [
+    (re.compile(r"average marks by department", re.I),
+     "SELECT st.dept, AVG(s.total_mark) AS avg_marks FROM subjects s JOIN students st ON s.student_id = st.id "
+     "GROUP BY st.dept;"),
+    (re.compile(r"highest marks? in (?P<subject>.+)", re.I),
+     "SELECT st.name, s.subject_name, s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id "
+     "WHERE s.subject_name LIKE '%{subject}%' ORDER BY s.total_mark DESC LIMIT 1;"),
+    (re.compile(r"students who scored below (?P<mark>\d+) in (?P<subject>.+)", re.I),
+     "SELECT st.name, st.roll_no, s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id "
+     "WHERE s.subject_name LIKE '%{subject}%' AND s.total_mark < {mark};"),
+    (re.compile(r"calculate total marks of (?P<name>.+)", re.I),
+     "SELECT st.name, SUM(s.total_mark) AS total_marks FROM subjects s JOIN students st ON s.student_id = st.id "
+     "WHERE st.name LIKE '%{name}%' GROUP BY st.name;"),
+    (re.compile(r"details of student (?P<name>.+)", re.I),
+     "SELECT * FROM students WHERE name LIKE '%{name}%';"),
+]
+DEFAULT_SQL = "SELECT COUNT(*) AS total_students FROM students;"
+SUMMARY_TEXT = "Here is what the database returned for your question, summarized for the benchmark."
+
+# The question is the last "User:" line; the few-shot examples above it have their own.
+# Matches both the one-shot prompt and a conversation turn.
+_SQL_QUESTION = re.compile(r"(?:^|\n)User: (?P<question>[^\n]*)\nSQL:\s*$")
+
+
+def canned_sql(question):
+    for pattern, sql in CANNED_SQL:
+        match = pattern.search(question)
+        if match:
+            values = {key: value.strip().upper().replace("'", "''") for key, value in match.groupdict().items()}
+            return sql.format(**values)
+    return DEFAULT_SQL
+
+
+class StubAPIError(Exception):
+    # Shaped like google.api_core's errors, which carry the HTTP status in .code
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class StubResponse:
+    def __init__(self, text, chunks=None):
+        self.text = text
+        self._chunks = chunks
+
+    def __iter__(self):
+        return iter(self._chunks if self._chunks is not None else [self])
+
+
+class StubChat:
+    def __init__(self, model):
+        self.model = model
+        self.history = []
+
+    @staticmethod
+    def _answer(prompt):
+        match = _SQL_QUESTION.search(prompt)
+        if match:
+            return "sql", canned_sql(match.group("question"))
+        return "summary", SUMMARY_TEXT
+
+    def send_message(self, prompt, stream=False, request_options=None):
+        kind, text = self._answer(prompt)
+        self.model.wait(kind, (request_options or {}).get("timeout"))
+        if stream:
+            words = text.split(" ")
+            chunks = [StubResponse(word + (" " if i + 1 < len(words) else "")) for i, word in enumerate(words)]
+            return StubResponse(text, chunks)
+        return StubResponse(text)
+
+    async def send_message_async(self, prompt, request_options=None):
+        kind, text = self._answer(prompt)
+        await self.model.wait_async(kind, (request_options or {}).get("timeout"))
+        return StubResponse(text)
+
+
+class StubModel:
+    """Fake GenerativeModel with a per-call latency of `latency` seconds +/- `jitter`.
+
+    Calls beyond `rate_limit` accepted in the last second (None for no quota)
+    and a random `error_rate` fraction of the rest fail at once with a 429. A
+    `slow_rate` fraction take `slow_latency` seconds instead, and a call that
+    outlives its request_options timeout fails with a 504 when the timeout
+    expires. `observe(kind, seconds)` is called after every simulated
+    call, if set.
+    """
+
+    def __init__(self, sql_latency=0.8, summary_latency=1.2, jitter=0.2, seed=0, observe=None,
+                 rate_limit=None, error_rate=0.0, slow_rate=0.0, slow_latency=10.0):
+        self.latency = {"sql": sql_latency, "summary": summary_latency}
+        self.jitter = jitter
+        self.observe = observe
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = collections.deque()
+        self.calls = {"sql": 0, "summary": 0}
+        self.errors = {429: 0, 504: 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _begin(self, kind):
+        # Admits one call (or fails it with a 429) and returns how long it takes
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if (self.rate_limit is not None and len(self._recent) >= self.rate_limit) \
+                    or self._random.random() < self.error_rate:
+                self.errors[429] += 1
+                raise StubAPIError(429, "Resource has been exhausted (e.g. check quota).")
+            self._recent.append(now)
+            self.calls[kind] += 1
+            if self._random.random() < self.slow_rate:
+                delay = self.slow_latency
+            else:
+                delay = max(0.0, self.latency[kind] + self._random.uniform(-self.jitter, self.jitter))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return delay
+
+    def _end(self, timed_out):
+        with self._lock:
+            self.in_flight -= 1
+            if timed_out:
+                self.errors[504] += 1
+
+    def _outcome(self, kind, delay, timed_out):
+        if timed_out:
+            raise StubAPIError(504, "Deadline Exceeded")
+        if self.observe:
+            self.observe(f"llm.{kind}", delay)
+
+    def wait(self, kind, timeout=None):
+        delay = self._begin(kind)
+        timed_out = timeout is not None and delay > timeout
+        try:
+            time.sleep(timeout if timed_out else delay)
+        finally:
+            self._end(timed_out)
+        self._outcome(kind, delay, timed_out)
+
+    async def wait_async(self, kind, timeout=None):
+        delay = self._begin(kind)
+        timed_out = timeout is not None and delay > timeout
+        try:
+            await asyncio.sleep(timeout if timed_out else delay)
+        finally:
+            self._end(timed_out)
+        self._outcome(kind, delay, timed_out)
+
+    def start_chat(self, history=None):
+        return StubChat(self)
+
+    def generate_content(self, prompt, stream=False):
+        return self.start_chat().send_message(prompt, stream=stream)
@@ -0,0 +1,87 @@
+# Summary prompt size: encodes typical result shapes the way the summary
+# prompt used to (', '.join of one dict repr per row) and with
+# result_encoder.encode_results, and compares their size in estimated tokens.
+# Results over the token budget are reduced to column statistics and the
+# leading rows; the "rows" column shows how many rows were listed.
+#
+#   python benchmarks/summary_encoding.py [--max-tokens 2000] [--show NAME]
+
+import argparse
+import datetime
+import decimal
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_result import QueryResult  # noqa: E402
+from result_encoder import encode_results, estimate_tokens  # noqa: E402
+
+DEPARTMENTS = ["CSE", "ECE", "EIE", "MECH", "CIVIL", "IT", "AGRI", "CSBS"]
+SUBJECTS = ["MATHEMATICS", "PHYSICS", "DATA STRUCTURES-1", "OPERATING SYSTEMS", "OOPS", "DIGITAL ELECTRONICS"]
+EXAMS = ["PERIODICAL TEST-1", "PERIODICAL TEST-2", "CYCLE TEST-1"]
+
+
+def student(i):
+    dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+    return (f"S{i}", f"7376231{dept}{i:03d}", f"STUDENT {i}", dept, f"student{i}.{dept.lower()}23@example.com",
+            f"S{1 + i % 8}", 1 + i % 4, None)
+
+
+STUDENT_COLUMNS = ["id", "roll_no", "name", "dept", "mailid", "sem", "year", "speciallab"]
+
+
+def shapes():
+    yield "single value", QueryResult(["highest_mark"], [(98,)])
+    yield "one student", QueryResult(STUDENT_COLUMNS, [student(7)])
+    yield "dept counts", QueryResult(["dept", "student_count"], [(d, 120 + i) for i, d in enumerate(DEPARTMENTS)])
+    yield "dept averages", QueryResult(["dept", "avg_marks"], [
+        (d, decimal.Decimal("55.3812345678901234") + i) for i, d in enumerate(DEPARTMENTS)])
+    yield "top 10", QueryResult(["name", "roll_no", "total_marks"], [
+        (f"STUDENT {i}", f"7376231CS{i:03d}", 1700 - 7 * i) for i in range(10)])
+    yield "marks of a student", QueryResult(
+        ["name", "roll_no", "exam_name", "subject_name", "total_mark"],
+        [("STUDENT 7", "7376231CSE007", exam, subject, (i * 37) % 101)
+         for i, (exam, subject) in enumerate((e, s) for e in EXAMS for s in SUBJECTS)])
+    yield "CSE students (125)", QueryResult(STUDENT_COLUMNS, [student(i * 8) for i in range(125)])
+    yield "marks in one exam (400)", QueryResult(
+        ["exam_name", "name", "subject_name", "total_mark", "updated_on"],
+        [("PERIODICAL TEST-1", f"STUDENT {i // 6}", SUBJECTS[i % 6], (i * 37) % 101,
+          datetime.date(2024, 3, 1) + datetime.timedelta(days=i % 5)) for i in range(400)])
+    yield "all students (1000, truncated)", QueryResult(
+        STUDENT_COLUMNS, [student(i) for i in range(1000)], truncated=True, total_rows=4321)
+
+
+def old_encoding(results):
+    text = ', '.join([str(row) for row in results.as_dicts()])
+    if results.truncated or results.notice:
+        text += f"\n            ({results.truncation_note()})"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare summary prompt encodings of query results")
+    parser.add_argument("--max-tokens", type=int, default=2000, help="encoder token budget")
+    parser.add_argument("--show", help="print the new encoding of the shape whose name starts with this")
+    args = parser.parse_args()
+
+    print(f"token budget {args.max_tokens}, tokens estimated at four characters each")
+    print(f"{'shape':<32}{'rows':>6}{'old tokens':>12}{'new tokens':>12}{'reduction':>11}{'listed':>8}")
+    old_total = new_total = 0
+    for name, results in shapes():
+        old = estimate_tokens(old_encoding(results))
+        encoded = encode_results(results, args.max_tokens)
+        new = estimate_tokens(encoded)
+        old_total += old
+        new_total += new
+        listed = len(results.rows)
+        if "not listed" in encoded:
+            listed -= int(encoded.rsplit("\n", 1)[-1].split()[0])
+        print(f"{name:<32}{len(results.rows):>6}{old:>12}{new:>12}{1 - new / old:>10.0%}{listed:>8}")
+        if args.show and name.startswith(args.show):
+            print(encoded)
+    print(f"{'total':<32}{'':>6}{old_total:>12}{new_total:>12}{1 - new_total / old_total:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
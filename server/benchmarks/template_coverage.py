@@ -0,0 +1,89 @@
+# Measures how much of a question corpus the rule-based NL->SQL compiler
+# answers without the LLM, and checks that it picks the expected template.
+#
+#   python benchmarks/template_coverage.py [-v]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sql_templates import compile_question  # noqa: E402
+
+# (question, expected template or None when the question should go to the LLM)
+CORPUS = [
+    ("Show DS-1 mark for Parthiban in PT1", "subject_marks"),
+    ("Get OOPS score of 7376231CS229 in test 1", "subject_marks"),
+    ("Get physics marks of Parthiban", "subject_marks"),
+    ("marks of logith in OS in CT1", "subject_marks"),
+    ("What is the maths mark of Kumar in periodical test 2?", "subject_marks"),
+    ("Show marks of Parthiban in PT-1", "marks_in_exam"),
+    ("Show all CSE students", "department_students"),
+    ("List ECE students", "department_students"),
+    ("Show students from mechanical department", "department_students"),
+    ("students in IT department", "department_students"),
+    ("Show CSE students in semester 5", "department_students"),
+    ("List students in semester 3", "semester_students"),
+    ("semester 6 students", "semester_students"),
+    ("Department wise student count", "department_wise_count"),
+    ("number of students in each department", "department_wise_count"),
+    ("How many students per department?", "department_wise_count"),
+    ("Count total students in CSE", "department_count"),
+    ("How many students are in ECE", "department_count"),
+    ("how many mech students are there", "department_count"),
+    ("Top 5 students by total marks", "top_n_by_total"),
+    ("top 10 students", "top_n_by_total"),
+    ("Show the top 3 CSE students based on total marks", "top_n_by_total"),
+    # Not template-shaped: must fall through to the LLM
+    ("Calculate total marks of Parthiban", None),
+    ("Find average marks of Parthiban", None),
+    ("Show all marks above 80", None),
+    ("Students who scored below 50 in any subject", None),
+    ("Highest marks in Mathematics", None),
+    ("Average marks by department", None),
+    ("Update Parthiban's department to IT", None),
+    ("Delete student with roll number 7376231CS230", None),
+    ("Add GPA column to students table", None),
+    ("Students who haven't taken any exams", None),
+    ("What are the marks of all students in physics", None),
+    ("Show marks of Parthiban in the final exam", None),
+    ("Show marks of Parthiban or Logith in physics", None),
+    ("marks of Parthiban in physics above 50", None),
+    ("marks of Parthiban in physics and chemistry", None),
+    ("marks of Parthiban in PT1 and CT1", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule-based NL->SQL template coverage")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print the compiled SQL")
+    args = parser.parse_args()
+
+    compiled, wrong = 0, []
+    started = time.perf_counter()
+    for question, expected in CORPUS:
+        result = compile_question(question)
+        template = result.template if result else None
+        if result:
+            compiled += 1
+        if template != expected:
+            wrong.append((question, expected, template))
+        if args.verbose:
+            print(f"{question!r:<60} -> {template}")
+            if result:
+                print(f"    {result.sql}  {result.params}")
+    elapsed = time.perf_counter() - started
+
+    expected_compiled = sum(1 for _, expected in CORPUS if expected)
+    print(f"compiled {compiled}/{len(CORPUS)} questions ({compiled / len(CORPUS):.0%} of corpus, "
+          f"{expected_compiled} template-shaped) in {elapsed * 1000:.2f}ms "
+          f"({elapsed / len(CORPUS) * 1e6:.0f}us per question)")
+    for question, expected, template in wrong:
+        print(f"MISMATCH {question!r}: expected {expected}, got {template}")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
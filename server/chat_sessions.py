@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Session:
+    __slots__ = ("user_id", "turns", "nbytes", "last_used")
+
+    def __init__(self, user_id, turns):
+        self.user_id = user_id
+        self.turns = turns  # [(question, sql)], oldest first
+        self.nbytes = sum(len(q) + len(s) for q, s in turns)
+        self.last_used = time.monotonic()
+
+
+class ConversationSessions:
+    """Per-conversation NL->SQL chat context for active conversations.
+
+    Each entry keeps a conversation's last `max_turns` (question, SQL) turns.
+    A chat is started from the shared, already-built `primer` plus those turns,
+    so a request only contributes its own question. Entries idle for `ttl`
+    seconds expire, and the least recently used are evicted beyond
+    `max_sessions` entries or `max_bytes` of turn text. A conversation that is
+    not in memory is rebuilt on first use with
+    `loader(conversation_id, user_id, max_turns)`, which returns its turns
+    oldest first.
+    """
+
+    def __init__(self, start_chat, primer, loader, max_sessions=1000, max_bytes=16 * 1024 * 1024,
+                 ttl=1800.0, max_turns=10):
+        self._start_chat = start_chat
+        self._primer = list(primer)
+        self._loader = loader
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.rebuilds = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, conversation_id):
+        session = self._sessions.pop(conversation_id, None)
+        if session is not None:
+            self._bytes -= session.nbytes
+        return session
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            conversation_id, oldest = next(iter(self._sessions.items()))
+            if self.ttl and now - oldest.last_used > self.ttl:
+                self.expirations += 1
+            elif len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+                self.evictions += 1
+            else:
+                break
+            self._remove(conversation_id)
+
+    def _lookup(self, conversation_id):
+        session = self._sessions.get(conversation_id)
+        if session is None:
+            return None
+        if self.ttl and time.monotonic() - session.last_used > self.ttl:
+            self._remove(conversation_id)
+            self.expirations += 1
+            return None
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(conversation_id)
+        return session
+
+    def cached_turns(self, conversation_id, user_id):
+        # The turns held in memory, or None when the conversation has to be loaded.
+        # A conversation owned by another user reads as empty rather than leaking its context.
+        with self._lock:
+            session = self._lookup(conversation_id)
+            if session is None:
+                return None
+            self.hits += 1
+            return list(session.turns) if session.user_id == user_id else []
+
+    def remember(self, conversation_id, user_id, turns):
+        # Caches turns loaded from history (oldest first); returns the last max_turns of them
+        turns = list(turns)[-self.max_turns:]
+        if not turns:
+            # Nothing to cache, and an empty entry would let anyone who guesses
+            # the id claim the conversation's slot for their own user_id
+            return turns
+        with self._lock:
+            if self._lookup(conversation_id) is None:
+                self.rebuilds += 1
+                session = _Session(user_id, turns)
+                self._sessions[conversation_id] = session
+                self._bytes += session.nbytes
+                self._evict()
+        return turns
+
+    def turns(self, conversation_id, user_id):
+        turns = self.cached_turns(conversation_id, user_id)
+        if turns is None:
+            turns = self.remember(conversation_id, user_id, self._loader(conversation_id, user_id, self.max_turns))
+        return turns
+
+    def start_chat(self, turns):
+        history = list(self._primer)
+        for question, sql in turns:
+            history.append({"role": "user", "parts": [question]})
+            history.append({"role": "model", "parts": [sql]})
+        return self._start_chat(history)
+
+    def record(self, conversation_id, user_id, question, sql, new=False):
+        # Appends a finished turn, however its SQL was produced. Conversations
+        # that are not in memory are left to be rebuilt from history later,
+        # except new ones, which start here with no earlier turns to load.
+        if not sql:
+            return
+        with self._lock:
+            session = self._lookup(conversation_id)
+            if session is None:
+                if not new:
+                    return
+                session = self._sessions[conversation_id] = _Session(user_id, [])
+            elif session.user_id != user_id:
+                return
+            session.turns.append((question, sql))
+            added = len(question) + len(sql)
+            while len(session.turns) > self.max_turns:
+                old_question, old_sql = session.turns.pop(0)
+                added -= len(old_question) + len(old_sql)
+            session.nbytes += added
+            self._bytes += added
+            self._evict()
+
+    def forget(self, conversation_id):
+        with self._lock:
+            self._remove(conversation_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "rebuilds": self.rebuilds,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
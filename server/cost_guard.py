@@ -0,0 +1,123 @@
+import json
+import logging
+import re
+import threading
+from collections import namedtuple
+
+from sql_analysis import strip_literals
+
+# Outcome of admission control for one statement. action is "allow", "limit"
+# (query was rewritten with a LIMIT) or "reject"; reason is user-presentable.
+GuardDecision = namedtuple("GuardDecision", ["action", "query", "params", "reason", "cost", "rows"])
+
+_HAS_LIMIT = re.compile(r"\blimit\s+\d+\s*(?:offset\s+\d+\s*)?;?\s*$", re.I)
+
+
+class CostGuard:
+    """EXPLAIN-based admission control for generated SELECT statements.
+
+    Statements whose estimated total cost exceeds `max_cost` are rejected.
+    Statements expected to return more than `max_rows` rows and that have no
+    LIMIT of their own are wrapped in one sized to what the caller will read.
+    Every statement run under the guard also gets a transaction-local
+    `statement_timeout`.
+    """
+
+    def __init__(self, max_cost=1_000_000.0, max_rows=10_000, statement_timeout_ms=5000, auto_limit=True):
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.statement_timeout_ms = statement_timeout_ms
+        self.auto_limit = auto_limit
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+        self.rejected = 0
+        self.explain_failures = 0
+
+    def apply_timeout(self, cursor):
+        if self.statement_timeout_ms:
+            cursor.execute("SET LOCAL statement_timeout = %s", (int(self.statement_timeout_ms),))
+
+    async def apply_timeout_async(self, cursor):
+        if self.statement_timeout_ms:
+            await cursor.execute("SET LOCAL statement_timeout = %s", (int(self.statement_timeout_ms),))
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _explain_sql(query):
+        return f"EXPLAIN (FORMAT JSON) {query.strip().rstrip(';')}"
+
+    @staticmethod
+    def _estimates(plan):
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        top = plan[0]["Plan"]
+        return float(top.get("Total Cost", 0.0)), int(top.get("Plan Rows", 0))
+
+    def _explain_failed(self, query, params, error):
+        # Let the real execution surface the error (syntax, missing column, ...)
+        logging.warning(f"Cost guard could not EXPLAIN query: {error}")
+        self._count("explain_failures")
+        return GuardDecision("allow", query, params, None, None, None)
+
+    def check(self, cursor, query, params=None, row_cap=None, limit=True):
+        # row_cap is how many rows the caller will actually read; an auto-LIMIT
+        # keeps one extra row so the caller can still tell the result was cut off.
+        # limit=False only applies the cost limit, for callers that stream every row.
+        try:
+            cursor.execute(self._explain_sql(query), params)
+            cost, rows = self._estimates(cursor.fetchone()[0])
+        except Exception as e:
+            cursor.connection.rollback()
+            self.apply_timeout(cursor)
+            return self._explain_failed(query, params, e)
+        return self._decide(query, params, cost, rows, row_cap, limit)
+
+    async def check_async(self, cursor, query, params=None, row_cap=None, limit=True):
+        # check() for a psycopg 3 async cursor
+        try:
+            await cursor.execute(self._explain_sql(query), params)
+            cost, rows = self._estimates((await cursor.fetchone())[0])
+        except Exception as e:
+            await cursor.connection.rollback()
+            await self.apply_timeout_async(cursor)
+            return self._explain_failed(query, params, e)
+        return self._decide(query, params, cost, rows, row_cap, limit)
+
+    def _decide(self, query, params, cost, rows, row_cap, limit):
+        if self.max_cost and cost > self.max_cost:
+            self._count("rejected")
+            reason = (
+                f"This question would need an unusually expensive database query "
+                f"(estimated cost {cost:,.0f}, limit {self.max_cost:,.0f}), so it was not run. "
+                "Try narrowing it down, for example to one department, semester, subject or exam."
+            )
+            return GuardDecision("reject", query, params, reason, cost, rows)
+
+        if limit and self.auto_limit and self.max_rows and rows > self.max_rows and not _HAS_LIMIT.search(strip_literals(query)):
+            self._count("limited")
+            limit = min(self.max_rows, row_cap) if row_cap else self.max_rows
+            limited_query = f"SELECT * FROM ({query.strip().rstrip(';')}) AS guarded LIMIT {int(limit) + 1}"
+            reason = (
+                f"The query was expected to match about {rows:,} rows, so only the first {limit:,} were read. "
+                "Ask a more specific question to see the rest."
+            )
+            return GuardDecision("limit", limited_query, params, reason, cost, rows)
+
+        self._count("allowed")
+        return GuardDecision("allow", query, params, None, cost, rows)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_cost": self.max_cost,
+                "max_rows": self.max_rows,
+                "statement_timeout_ms": self.statement_timeout_ms,
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "rejected": self.rejected,
+                "explain_failures": self.explain_failures,
+            }
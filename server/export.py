@@ -0,0 +1,159 @@
+import logging
+import queue
+import threading
+
+# format -> (content type, file extension, COPY options)
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv", "FORMAT csv, HEADER"),
+    "tsv": ("text/tab-separated-values; charset=utf-8", "tsv", "FORMAT csv, HEADER, DELIMITER E'\\t'"),
+}
+
+_DONE = object()
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class _ChunkWriter:
+    # File-like target for copy_expert. COPY hands over one row per write;
+    # rows are coalesced into chunks of about chunk_size bytes, except the
+    # first write, which is passed on at once so the caller knows COPY started.
+    def __init__(self, export):
+        self._export = export
+        self._parts = []
+        self._size = 0
+        self._started = False
+
+    def write(self, data):
+        self._parts.append(data)
+        self._size += len(data)
+        if not self._started or self._size >= self._export.chunk_size:
+            self._started = True
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            chunk = b"".join(part if isinstance(part, bytes) else part.encode() for part in self._parts)
+            self._parts, self._size = [], 0
+            self._export._put(chunk)
+
+
+class CopyExport:
+    """Streams the rows of a SELECT as `COPY (query) TO STDOUT` output.
+
+    COPY runs in a read-only transaction on a pooled connection owned by a
+    background thread, which hands chunks of about `chunk_size` bytes through a
+    queue of `max_chunks`. At most that much of the result is in memory at
+    once, and a slow reader slows COPY down instead of being buffered for.
+    start() waits until COPY has produced its first bytes and raises if the
+    statement failed before that. Iterating yields the chunks; close() (also
+    called when iteration stops early) cancels the statement on the server.
+    """
+
+    def __init__(self, pool, query, params=None, format="csv", chunk_size=64 * 1024, max_chunks=8,
+                 statement_timeout_ms=0):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+        self._pool = pool
+        self.query = query.strip().rstrip(";")
+        self.params = params
+        self.format = format
+        self.chunk_size = chunk_size
+        self.statement_timeout_ms = statement_timeout_ms
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._cancelled = threading.Event()
+        self._conn = None
+        self._first = None
+        self._thread = None
+        self.bytes_sent = 0
+
+    @property
+    def content_type(self):
+        return FORMATS[self.format][0]
+
+    @property
+    def extension(self):
+        return FORMATS[self.format][1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="copy-export", daemon=True)
+        self._thread.start()
+        first = self._chunks.get()
+        if isinstance(first, BaseException):
+            raise first
+        self._first = first
+        return self
+
+    def _put(self, item):
+        while not self._cancelled.is_set():
+            try:
+                self._chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise ExportCancelled()
+
+    def _run(self):
+        failed = False
+        try:
+            self._conn = conn = self._pool.getconn()
+        except Exception as e:
+            self._chunks.put(e)
+            return
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION READ ONLY")
+                if self.statement_timeout_ms:
+                    cursor.execute("SET LOCAL statement_timeout = %s", (int(self.statement_timeout_ms),))
+                query = cursor.mogrify(self.query, self.params).decode() if self.params else self.query
+                writer = _ChunkWriter(self)
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH ({FORMATS[self.format][2]})", writer)
+                writer.flush()
+            conn.rollback()
+            self._put(_DONE)
+        except ExportCancelled:
+            failed = True
+        except Exception as e:
+            failed = True
+            if not self._cancelled.is_set():
+                logging.warning(f"Export failed: {e}")
+                try:
+                    self._put(e)
+                except ExportCancelled:
+                    pass
+        finally:
+            # A COPY that was cut off can leave the connection mid-protocol, so it is not reused
+            self._conn = None
+            self._pool.putconn(conn, close=failed)
+
+    def __iter__(self):
+        try:
+            if self._first is not None:
+                chunk, self._first = self._first, None
+                if chunk is _DONE:
+                    return
+                self.bytes_sent += len(chunk)
+                yield chunk
+            while True:
+                chunk = self._chunks.get()
+                if chunk is _DONE:
+                    return
+                if isinstance(chunk, BaseException):
+                    # Headers are already sent; all that is left is to cut the response short
+                    raise chunk
+                self.bytes_sent += len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        conn = self._conn
+        if conn is not None and self._thread is not None and self._thread.is_alive():
+            try:
+                conn.cancel()
+            except Exception:
+                pass
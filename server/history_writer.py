@@ -0,0 +1,242 @@
+import datetime
+import logging
+import queue
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+from caches import TTLCache
+
+INSERT_HISTORY_SQL = """
+    INSERT INTO chatbot_history (user_id, conversation_id, title, user_query, nl_response, generated_sql, created_at)
+    VALUES %s
+    RETURNING conversation_id, title
+"""
+# A title we do not have cached is resolved inside the INSERT itself, so the
+# request path never needs a round trip to look it up.
+INSERT_HISTORY_TEMPLATE = """(
+    %s, %s,
+    COALESCE(%s, (SELECT c.title FROM chatbot_conversations c WHERE c.id = %s), 'Untitled Chat'),
+    %s, %s, %s, %s
+)"""
+# chatbot_conversations is the per-conversation index behind the sidebar. It is
+# updated in the same transaction as the history rows, one row per conversation
+# per batch, so it never disagrees with chatbot_history.
+UPSERT_CONVERSATIONS_SQL = """
+    INSERT INTO chatbot_conversations (id, user_id, title, created_at, last_activity, message_count)
+    VALUES %s
+    ON CONFLICT (id) DO UPDATE SET
+        last_activity = GREATEST(chatbot_conversations.last_activity, EXCLUDED.last_activity),
+        message_count = chatbot_conversations.message_count + EXCLUDED.message_count
+"""
+
+_STOP = object()
+_FLUSH = object()
+
+
+def _conversation_updates(values, titles):
+    # Collapses a batch to one row per conversation (an upsert may touch each
+    # row only once), sorted by id so concurrent writers lock rows in one order.
+    # RETURNING yields rows in VALUES order, so titles line up with values.
+    updates = {}
+    for (user_id, conversation_id, _, _, _, _, _, created_at), (_, title) in zip(values, titles):
+        update = updates.get(conversation_id)
+        if update is None:
+            updates[conversation_id] = [conversation_id, user_id, title, created_at, created_at, 1]
+        else:
+            update[3] = min(update[3], created_at)
+            update[4] = max(update[4], created_at)
+            update[5] += 1
+    return [tuple(updates[key]) for key in sorted(updates)]
+
+
+class HistoryWriter:
+    """Write-behind queue for chatbot_history rows and the chatbot_conversations index.
+
+    Records are queued in memory and inserted by a background thread in
+    multi-row batches once `batch_size` records are waiting or `flush_interval`
+    seconds have passed since the first one arrived. When the queue is full,
+    callers block for up to `enqueue_timeout` seconds and then write their row
+    synchronously, so history is never dropped because of back-pressure.
+    """
+
+    def __init__(self, pool, batch_size=100, flush_interval=0.5, max_queue=10000,
+                 enqueue_timeout=2.0, title_cache_size=10000, max_retries=3):
+        self._pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._titles = TTLCache(maxsize=title_cache_size, ttl=24 * 3600)
+
+        self._cond = threading.Condition()
+        self._enqueued_seq = 0
+        self._outstanding = set()  # sequence numbers queued but not yet written
+        self._closed = False
+        self._thread = None
+
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.sync_writes = 0
+        self.largest_batch = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    # --- Conversation titles ---
+    def cached_title(self, conversation_id):
+        return self._titles.get(conversation_id)
+
+    def remember_title(self, conversation_id, title):
+        self._titles.set(conversation_id, title)
+
+    # --- Producer side ---
+    def record(self, user_id, conversation_id, title, user_query, nl_response, generated_sql=None):
+        self.record_many([(user_id, conversation_id, title, user_query, nl_response, generated_sql)])
+
+    def record_many(self, records):
+        # Records passed together are queued as one item and land in the same
+        # INSERT. created_at is taken now: rows flushed in one batch share a
+        # transaction timestamp, which would otherwise lose the order of turns.
+        # It is timezone-aware, so PostgreSQL stores it in the session time zone
+        # exactly like the column's CURRENT_TIMESTAMP default, whatever the app
+        # server's local time zone is.
+        rows = []
+        with self._cond:
+            for user_id, conversation_id, title, user_query, nl_response, generated_sql in records:
+                self._enqueued_seq += 1
+                self._outstanding.add(self._enqueued_seq)
+                rows.append((self._enqueued_seq, (user_id, conversation_id, title, conversation_id, user_query,
+                                                  nl_response, generated_sql, datetime.datetime.now(datetime.timezone.utc))))
+        if not rows:
+            return
+
+        if not self._closed:
+            try:
+                self._queue.put(rows, timeout=self.enqueue_timeout)
+                return
+            except queue.Full:
+                logging.warning("Chat history queue is full; writing records synchronously")
+        with self._cond:
+            self.sync_writes += len(rows)
+        self._write(rows)
+
+    def pending(self):
+        with self._cond:
+            return len(self._outstanding)
+
+    def flush(self, timeout=5.0):
+        # Blocks until every record queued before this call has been written
+        with self._cond:
+            target = self._enqueued_seq
+            if not self._outstanding:
+                return True
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass  # The writer is busy draining a full queue anyway
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._outstanding and min(self._outstanding) <= target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    # --- Consumer side ---
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = self.flush_interval if deadline is None else deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                if item is _FLUSH:
+                    break
+                batch.extend(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        # A batch mixes rows from many users. If it cannot be written, its rows
+        # are retried one at a time so a bad row only loses itself.
+        dropped = 0
+        written = self._insert([row for _, row in batch], self.max_retries)
+        if not written and len(batch) > 1:
+            logging.warning(f"Writing the {len(batch)} chat history records of the failed batch one by one")
+            dropped = sum(not self._insert([row], 1) for _, row in batch)
+        elif not written:
+            dropped = 1
+
+        with self._cond:
+            if written:
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(batch))
+            self.rows_written += len(batch) - dropped
+            self.rows_dropped += dropped
+            self._outstanding.difference_update(seq for seq, _ in batch)
+            self._cond.notify_all()
+        if dropped:
+            logging.error(f"Dropped {dropped} of {len(batch)} chat history records that could not be written")
+
+    def _insert(self, values, attempts):
+        for attempt in range(attempts):
+            try:
+                with self._pool.connection() as conn:
+                    with conn.cursor() as cursor:
+                        titles = execute_values(
+                            cursor, INSERT_HISTORY_SQL, values,
+                            template=INSERT_HISTORY_TEMPLATE, page_size=len(values), fetch=True
+                        )
+                        conversations = _conversation_updates(values, titles)
+                        execute_values(cursor, UPSERT_CONVERSATIONS_SQL, conversations, page_size=len(conversations))
+                    conn.commit()
+            except Exception as e:
+                logging.warning(f"Error writing {len(values)} chat history records (attempt {attempt + 1}): {e}")
+                if attempt + 1 < attempts:
+                    time.sleep(0.2 * 2 ** attempt)
+                continue
+            for conversation_id, title in titles:
+                self._titles.set(conversation_id, title)
+            return True
+        return False
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": self._queue.qsize(),
+                "pending": len(self._outstanding),
+                "batches": self.batches,
+                "rows_written": self.rows_written,
+                "rows_dropped": self.rows_dropped,
+                "sync_writes": self.sync_writes,
+                "largest_batch": self.largest_batch,
+                "avg_batch": round(self.rows_written / self.batches, 2) if self.batches else 0.0,
+                "title_cache": self._titles.stats(),
+            }
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(Exception):
+    """The model could not answer within the limits: rate, concurrency, retries or time."""
+
+
+class LLMBusy(LLMUnavailable):
+    pass
+
+
+class LLMTimeout(LLMUnavailable):
+    pass
+
+
+def error_code(error):
+    # HTTP status of a google.api_core error (or anything shaped like one)
+    code = getattr(error, "code", None)
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    return error_code(error) in RETRYABLE_CODES or isinstance(error, (TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """Admits `rate` calls per second on average and bursts of up to `capacity`.
+
+    throttle() cuts the rate by a quarter (down to `min_rate`) when the
+    provider pushes back; each recover() adds back a tenth of the configured
+    rate. A rate of 0 admits everything.
+    """
+
+    def __init__(self, rate, capacity, min_rate=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self):
+        # Takes a token and returns 0, or returns the seconds until one is due
+        self._refill(time.monotonic())
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self, deadline):
+        if not self.max_rate:
+            return True
+        with self._cond:
+            while True:
+                wait = self._take()
+                if not wait:
+                    return True
+                if time.monotonic() + wait > deadline:
+                    return False
+                self._cond.wait(wait)
+
+    async def acquire_async(self, deadline):
+        if not self.max_rate:
+            return True
+        while True:
+            with self._cond:
+                wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    def throttle(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * 0.75)
+
+    def recover(self):
+        with self._cond:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class _Stream:
+    # Holds the in-flight slot until the streamed response has been read
+    def __init__(self, response, release):
+        self._response = response
+        self._release = release
+
+    def __iter__(self):
+        try:
+            yield from self._response
+        finally:
+            self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __del__(self):
+        self.close()
+
+
+class LLMClient:
+    """Sends chat messages to the model under a shared rate and concurrency limit.
+
+    A call first takes a token from a `rate`/`burst` token bucket, then one of
+    `max_in_flight` slots. Each attempt gets a timeout of `call_timeout`
+    seconds, cut short by the caller's deadline (`deadline_fn()` returns a
+    time.monotonic() value or None). Retryable errors (429, 5xx, timeouts) are
+    retried up to `max_retries` times after a full-jitter exponential backoff
+    that starts at `backoff_base` seconds and is capped at `backoff_max`.
+    Each 429 also lowers the bucket's rate, which then recovers gradually.
+    LLMBusy/LLMTimeout are raised when a call cannot be admitted or finished
+    before the deadline, and LLMUnavailable when retries run out.
+    """
+
+    def __init__(self, rate=10.0, burst=20, max_in_flight=8, call_timeout=30.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, deadline_fn=None, retryable=is_retryable):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_in_flight = max_in_flight
+        self.call_timeout = call_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._deadline_fn = deadline_fn
+        self._retryable = retryable
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _deadline(self):
+        deadline = self._deadline_fn() if self._deadline_fn else None
+        return deadline if deadline is not None else time.monotonic() + self.call_timeout * (self.max_retries + 1)
+
+    def _admit(self, deadline):
+        # Waits for a token and then a slot; counts as queued meanwhile
+        started = time.monotonic()
+        self._count("waiting")
+        try:
+            if not self.bucket.acquire(deadline):
+                raise LLMBusy("LLM rate limit: no call could be admitted before the deadline")
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise LLMBusy("LLM concurrency limit: no call slot freed up before the deadline")
+        except LLMBusy:
+            self._count("rejected")
+            raise
+        finally:
+            waited = time.monotonic() - started
+            with self._lock:
+                self.waiting -= 1
+                self.wait_time_total += waited
+                self.wait_time_max = max(self.wait_time_max, waited)
+        self._count("in_flight")
+
+    def _release(self):
+        self._count("in_flight", -1)
+        self._slots.release()
+
+    def _retry_delay(self, error, attempt, deadline):
+        # Backoff before retrying after a retryable error; raises once out of attempts or time
+        if error_code(error) == 429:
+            self._count("throttled")
+            self.bucket.throttle()
+        if attempt >= self.max_retries:
+            raise LLMUnavailable(f"LLM call failed after {attempt + 1} attempts: {error}") from error
+        backoff = self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + backoff >= deadline:
+            self._count("timeouts")
+            raise LLMTimeout(f"LLM latency budget exhausted after {attempt + 1} attempts: {error}") from error
+        logging.warning(f"Retrying LLM call in {backoff:.2f}s after: {error}")
+        self._count("retries")
+        return backoff
+
+    def send(self, chat, prompt, stream=False):
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            if time.monotonic() >= deadline:
+                self._count("timeouts")
+                raise LLMTimeout("LLM latency budget exhausted")
+            self._admit(deadline)
+            timeout = max(0.1, min(self.call_timeout, deadline - time.monotonic()))
+            self._count("calls")
+            try:
+                response = chat.send_message(prompt, stream=stream, request_options={"timeout": timeout})
+            except Exception as e:
+                self._release()
+                self._count("failures")
+                if not self._retryable(e):
+                    raise
+                time.sleep(self._retry_delay(e, attempt, deadline))
+                attempt += 1
+                continue
+            self.bucket.recover()
+            if stream:
+                return _Stream(response, self._release)
+            self._release()
+            return response
+
+    def stats(self):
+        with self._lock:
+            admitted = self.calls + self.rejected
+            return {
+                "rate": round(self.bucket.rate, 3),
+                "max_rate": self.bucket.max_rate,
+                "max_in_flight": self.max_in_flight,
+                "waiting": self.waiting,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.wait_time_total / admitted * 1000, 3) if admitted else 0.0,
+                "max_wait_ms": round(self.wait_time_max * 1000, 3),
+            }
+
+
+class AsyncLLMClient(LLMClient):
+    """LLMClient for coroutines: the same limits, retries and statistics, but
+    every wait (for a token, a slot, a backoff or the model itself) yields to
+    the event loop, and calls go through the chat's send_message_async.
+    Streaming is not supported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_slots = asyncio.Semaphore(max(1, self.max_in_flight))
+
+    async def _admit_async(self, deadline):
+        started = time.monotonic()
+        self._count("waiting")
+        try:
+            if not await self.bucket.acquire_async(deadline):
+                raise LLMBusy("LLM rate limit: no call could be admitted before the deadline")
+            try:
+                await asyncio.wait_for(self._async_slots.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise LLMBusy("LLM concurrency limit: no call slot freed up before the deadline") from None
+        except LLMBusy:
+            self._count("rejected")
+            raise
+        finally:
+            waited = time.monotonic() - started
+            with self._lock:
+                self.waiting -= 1
+                self.wait_time_total += waited
+                self.wait_time_max = max(self.wait_time_max, waited)
+        self._count("in_flight")
+
+    def _release(self):
+        self._count("in_flight", -1)
+        self._async_slots.release()
+
+    async def send(self, chat, prompt):
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            if time.monotonic() >= deadline:
+                self._count("timeouts")
+                raise LLMTimeout("LLM latency budget exhausted")
+            await self._admit_async(deadline)
+            timeout = max(0.1, min(self.call_timeout, deadline - time.monotonic()))
+            self._count("calls")
+            try:
+                # The client library enforces the timeout too; this also covers a stalled connection
+                response = await asyncio.wait_for(
+                    chat.send_message_async(prompt, request_options={"timeout": timeout}), timeout + 1.0)
+            except Exception as e:
+                self._release()
+                self._count("failures")
+                if not self._retryable(e):
+                    raise
+                await asyncio.sleep(self._retry_delay(e, attempt, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled along with its request
+                self._release()
+                raise
+            self._release()
+            self.bucket.recover()
+            return response
@@ -0,0 +1,61 @@
+import re
+
+# Mirrors the NATURAL LANGUAGE UNDERSTANDING RULES given to the model, so that
+# questions the model would treat identically also normalize identically.
+SUBJECT_ALIASES = {
+    "ds-1": "data structures-1",
+    "ds1": "data structures-1",
+    "ds": "data structures",
+    "maths": "mathematics",
+    "math": "mathematics",
+    "oops": "object oriented programming",
+    "oop": "object oriented programming",
+    "os": "operating systems",
+}
+
+EXAM_ALIASES = {
+    # Canonical forms map to themselves so the shorter "test-1" alias cannot match inside them
+    "cycle test-1": "cycle test-1",
+    "periodical test-1": "periodical test-1",
+    "ct1": "cycle test-1",
+    "ct-1": "cycle test-1",
+    "cycle test 1": "cycle test-1",
+    "pt1": "periodical test-1",
+    "pt-1": "periodical test-1",
+    "periodic test 1": "periodical test-1",
+    "periodic test-1": "periodical test-1",
+    "periodical test 1": "periodical test-1",
+    "test 1": "periodical test-1",
+    "test-1": "periodical test-1",
+}
+
+DEPARTMENT_NAMES = {
+    "computer science and engineering": "cse",
+    "electronics and communication engineering": "ece",
+    "electronics and instrumentation engineering": "eie",
+    "mechanical engineering": "mech",
+    "mechanical": "mech",
+    "civil engineering": "civil",
+    "mechatronics engineering": "mrts",
+    "mechatronics": "mrts",
+    "computer science and business systems": "csbs",
+    "information technology": "it",
+    "agricultural engineering": "agri",
+    "information science and engineering": "ise",
+}
+
+ALIASES = {**SUBJECT_ALIASES, **EXAM_ALIASES, **DEPARTMENT_NAMES}
+
+# Longest alias first so "periodic test 1" wins over "test 1" and "ds-1" over "ds";
+# a single pass means replacements are never themselves rewritten.
+_ALIAS_PATTERN = re.compile(
+    r"(?<![\w-])(" + "|".join(re.escape(a) for a in sorted(ALIASES, key=len, reverse=True)) + r")(?![\w-])"
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(text):
+    text = _WHITESPACE.sub(" ", (text or "").lower()).strip()
+    text = text.rstrip("?.! ")
+    text = text.replace("’", "'")
+    return _ALIAS_PATTERN.sub(lambda m: ALIASES[m.group(1)], text)
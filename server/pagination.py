@@ -0,0 +1,102 @@
+import base64
+import datetime
+import json
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, key):
+    # Opaque keyset cursor: the (timestamp, key) of the last row on a page
+    raw = json.dumps([timestamp.isoformat(), key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, key_type=str):
+    # key_type is the type of the key column, so a crafted cursor never reaches the keyset SQL
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        timestamp, key = json.loads(raw)
+        if not isinstance(timestamp, str) or type(key) is not key_type:
+            raise TypeError("cursor holds the wrong types")
+        return datetime.datetime.fromisoformat(timestamp), key
+    except (ValueError, TypeError) as e:
+        raise CursorError(f"Invalid cursor: {token!r}") from e
+
+
+def page_size(value, default, maximum):
+    if value in (None, ""):
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise CursorError(f"Invalid page size: {value!r}")
+    if size < 1:
+        raise CursorError(f"Invalid page size: {value!r}")
+    return min(size, maximum)
+
+
+def page_request(args, cursor_param, default_size, max_size, key_type=str):
+    # (page size, keyset position or None) from a request's query string
+    limit = page_size(args.get("limit"), default_size, max_size)
+    token = args.get(cursor_param)
+    return limit, decode_cursor(token, key_type) if token else None
+
+
+# Each page query asks for one row more than the page holds, to tell whether another page follows
+_CONVERSATIONS_PAGE_SQL = """
+    SELECT id, title, last_activity, message_count
+    FROM chatbot_conversations
+    WHERE user_id = %s {after}
+    ORDER BY last_activity DESC, id DESC
+    LIMIT %s;
+"""
+
+_HISTORY_PAGE_SQL = """
+    SELECT id, user_query, nl_response, created_at
+    FROM chatbot_history
+    WHERE user_id = %s AND conversation_id = %s {before}
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s;
+"""
+
+
+def conversations_page_query(user_id, limit, after=None):
+    # Most recently active first, starting after the `after` cursor position
+    params = [user_id]
+    if after:
+        params.extend(after)
+    params.append(limit + 1)
+    return _CONVERSATIONS_PAGE_SQL.format(after="AND (last_activity, id) < (%s, %s)" if after else ""), params
+
+
+def conversations_page(rows, limit):
+    # (response body, cursor for the next page or None)
+    next_cursor = encode_cursor(rows[limit - 1][2], rows[limit - 1][0]) if len(rows) > limit else None
+    conversations = [
+        {"id": str(row[0]), "title": row[1], "last_activity": row[2].isoformat(), "message_count": row[3]}
+        for row in rows[:limit]
+    ]
+    return conversations, next_cursor
+
+
+def history_page_query(user_id, conversation_id, limit, before=None):
+    # The latest turns before the `before` cursor position, newest first
+    params = [user_id, conversation_id]
+    if before:
+        params.extend(before)
+    params.append(limit + 1)
+    return _HISTORY_PAGE_SQL.format(before="AND (created_at, id) < (%s, %s)" if before else ""), params
+
+
+def history_page(rows, limit):
+    # (response body with the page's turns oldest first, cursor for the page before or None)
+    next_cursor = encode_cursor(rows[limit - 1][3], rows[limit - 1][0]) if len(rows) > limit else None
+    messages = []
+    for row in reversed(rows[:limit]):
+        if row[1]:
+            messages.append({"type": "user", "content": row[1]})
+        if row[2]:
+            messages.append({"type": "bot", "content": row[2]})
+    return messages, next_cursor
@@ -0,0 +1,144 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+
+class VerifierBusy(Exception):
+    pass
+
+
+def _checkpw(password, hashed, submitted_at):
+    started = time.time()
+    matched = bcrypt.checkpw(password, hashed)
+    return matched, started - submitted_at, time.time() - started
+
+
+def _warm_up():
+    return None
+
+
+class PasswordVerifier:
+    """Runs bcrypt checks off the request thread in a bounded worker pool.
+
+    At most `max_workers` hashes run at once and at most `max_pending` may be
+    queued or running; a caller that cannot get a slot within `acquire_timeout`
+    seconds gets VerifierBusy instead of waiting behind an unbounded queue.
+    Workers are forked processes where the platform has fork, and threads
+    elsewhere (spawned processes would re-import the server module). With
+    `max_workers=0` the check runs inline on the caller, still under the limit.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, acquire_timeout=2.0, verify_timeout=10.0):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers, 1)
+        self.acquire_timeout = acquire_timeout
+        self.verify_timeout = verify_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failures = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.run_time_total = 0.0
+        self.run_time_max = 0.0
+
+    def _make_executor(self):
+        if self.max_workers <= 0:
+            return None
+        if "fork" in multiprocessing.get_all_start_methods():
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("fork")
+            )
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+
+    def start(self):
+        # Fork the workers now, while the process is still single-threaded
+        # (a fork-context pool starts all of its workers on the first submit)
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._make_executor()
+            executor = self._executor
+        if executor is not None:
+            executor.submit(_warm_up).result()
+        return self
+
+    def _run(self, password, hashed):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._make_executor()
+            executor = self._executor
+        if executor is None:
+            return _checkpw(password, hashed, time.time())
+        try:
+            return executor.submit(_checkpw, password, hashed, time.time()).result(timeout=self.verify_timeout)
+        except BrokenProcessPool:
+            logging.error("Password verification pool broke; restarting it")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._make_executor()
+            raise
+
+    def verify(self, password, hashed):
+        if isinstance(password, str):
+            password = password.encode("utf-8")
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+
+        waited = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise VerifierBusy("Too many password checks in progress")
+        waited = time.monotonic() - waited
+        with self._lock:
+            self.in_flight += 1
+        try:
+            matched, queued, ran = self._run(password, hashed)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+        queued = max(queued, 0.0) + waited
+        with self._lock:
+            self.completed += 1
+            self.queue_time_total += queued
+            self.queue_time_max = max(self.queue_time_max, queued)
+            self.run_time_total += ran
+            self.run_time_max = max(self.run_time_max, ran)
+        return matched
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            done = self.completed
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.in_flight,
+                "completed": done,
+                "rejected": self.rejected,
+                "failures": self.failures,
+                "avg_queue_ms": round(self.queue_time_total / done * 1000, 2) if done else 0.0,
+                "max_queue_ms": round(self.queue_time_max * 1000, 2),
+                "avg_run_ms": round(self.run_time_total / done * 1000, 2) if done else 0.0,
+                "max_run_ms": round(self.run_time_max * 1000, 2),
+            }
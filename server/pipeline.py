@@ -0,0 +1,441 @@
+import datetime
+import hmac
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+import google.generativeai as genai
+import jwt
+import psycopg.errors
+import psycopg2.errors
+
+from caches import ResultCache, TTLCache
+from cost_guard import CostGuard
+from llm_client import LLMUnavailable
+from metrics import Registry
+from nl_normalize import normalize_question
+from result_encoder import encode_results
+from settings import (
+    AGGREGATES_ENABLED, CHAT_SESSIONS_ENABLED, COST_GUARD_ENABLED, COST_GUARD_MAX_COST, COST_GUARD_MAX_ROWS,
+    GEMINI_API_KEY, LLM_REQUEST_BUDGET, LOG_LEVEL, METRICS_PUBLIC, METRICS_TOKEN, QUERY_COUNT_TRUNCATED,
+    QUERY_FETCH_SIZE, QUERY_MAX_ROWS, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ROWS, RESULT_CACHE_TTL, SQL_CACHE_SIZE,
+    SQL_CACHE_TTL, SQL_TEMPLATES_ENABLED, STATEMENT_TIMEOUT_MS, SUMMARIZER_MODE, SUMMARY_PROMPT_MAX_TOKENS,
+    TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL,
+)
+from sql_analysis import is_cacheable_read, is_ddl, is_sql_statement, is_write, referenced_tables, written_tables
+from sql_templates import compile_question
+from summarizer import summarize_locally
+
+# What server.py (Flask) and async_server.py (ASGI) have in common: metrics,
+# caches, and every decision the two make the same way, leaving each server
+# only its own I/O. Importing this module opens no connections and starts no
+# threads or processes; each server creates and starts its own pools and
+# workers.
+
+# --- Logging ---
+class RequestIdFilter(logging.Filter):
+    # Tags every record with the ID of the request being served ("-" outside one)
+    def __init__(self, current_request_id):
+        super().__init__()
+        self.current_request_id = current_request_id
+
+    def filter(self, record):
+        record.request_id = self.current_request_id()
+        return True
+
+def configure_logging(current_request_id):
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        format="%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s",
+    )
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(RequestIdFilter(current_request_id))
+
+# --- Generative AI Configuration ---
+generation_config = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_mime_type": "text/plain",
+}
+
+def gemini_model():
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel(
+        model_name="gemini-1.5-flash",
+        generation_config=generation_config,
+    )
+
+# --- Metrics ---
+metrics = Registry()
+request_seconds = metrics.histogram(
+    "chatbot_request_seconds", "Request latency, until the last byte is sent", ["endpoint", "method", "status"])
+stage_seconds = metrics.histogram("chatbot_stage_seconds", "Time spent in each stage of a request", ["stage"])
+errors_total = metrics.counter("chatbot_errors_total", "Errors by stage", ["stage"])
+llm_calls_total = metrics.counter("chatbot_llm_calls_total", "Gemini calls by purpose and outcome", ["purpose", "outcome"])
+sql_translations_total = metrics.counter(
+    "chatbot_sql_translations_total", "NL->SQL translations by source (template, cache, llm)", ["source"])
+rows_returned_total = metrics.counter("chatbot_rows_returned_total", "Rows returned by executed queries")
+query_rows = metrics.histogram("chatbot_query_rows", "Rows returned per executed query",
+                               buckets=(0, 1, 10, 100, 1000, 10000))
+aggregate_rewrites_total = metrics.counter(
+    "chatbot_aggregate_rewrites_total", "Queries answered from the materialized aggregates by rule", ["rule"])
+
+def register_gauges(db_pool_stats, llm_client, history_writer, password_verifier, aggregate_store,
+                    conversation_sessions):
+    # Gauges of the pools, queues and clients of the server calling this.
+    # db_pool_stats returns a dict with at least db_pool.ConnectionPool.stats()'s
+    # idle, in_use, waiting, size, checkouts and timeouts.
+    metrics.gauge("chatbot_db_pool_connections", "Database pool connections by state",
+                  lambda: {(state,): db_pool_stats()[state] for state in ("idle", "in_use", "waiting", "size")},
+                  ["state"])
+    metrics.gauge("chatbot_db_pool_checkouts_total", "Connections handed out by the pool",
+                  lambda: db_pool_stats()["checkouts"], type="counter")
+    metrics.gauge("chatbot_db_pool_timeouts_total", "Checkouts that timed out waiting for a connection",
+                  lambda: db_pool_stats()["timeouts"], type="counter")
+    metrics.gauge("chatbot_history_pending", "Chat history rows queued but not yet written", history_writer.pending)
+    metrics.gauge("chatbot_password_checks_in_flight", "bcrypt checks queued or running",
+                  lambda: password_verifier.stats()["in_flight"])
+    metrics.gauge("chatbot_llm_queue_depth", "Gemini calls waiting for the rate limiter or a call slot",
+                  lambda: llm_client.stats()["waiting"])
+    metrics.gauge("chatbot_llm_in_flight", "Gemini calls in progress", lambda: llm_client.stats()["in_flight"])
+    metrics.gauge("chatbot_llm_rate_limit", "Current Gemini calls-per-second limit (lowered after 429s)",
+                  lambda: llm_client.stats()["rate"])
+    metrics.gauge("chatbot_llm_attempts_total", "Gemini call attempts by outcome",
+                  lambda: {(outcome,): llm_client.stats()[outcome]
+                           for outcome in ("calls", "failures", "retries", "throttled", "rejected", "timeouts")},
+                  ["outcome"], type="counter")
+    metrics.gauge("chatbot_aggregates_fresh", "1 while the materialized aggregates may be used",
+                  lambda: int(aggregate_store.fresh()))
+    metrics.gauge("chatbot_chat_sessions", "Conversations with NL->SQL context held in memory",
+                  lambda: len(conversation_sessions))
+    if not METRICS_TOKEN and not METRICS_PUBLIC:
+        logging.warning("/metrics is disabled: set METRICS_TOKEN, or METRICS_PUBLIC=true on a trusted network")
+
+def metrics_authorized(authorization):
+    # /metrics exposes pool, LLM and traffic internals, so it is closed unless
+    # a token is configured and presented, or it is explicitly made public
+    if METRICS_PUBLIC:
+        return True
+    return bool(METRICS_TOKEN) and hmac.compare_digest(authorization or '', f'Bearer {METRICS_TOKEN}')
+
+# --- Caches ---
+translation_cache = TTLCache(maxsize=SQL_CACHE_SIZE, ttl=SQL_CACHE_TTL)
+result_cache = ResultCache(max_rows=RESULT_CACHE_MAX_ROWS, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL)
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# --- Generated SQL Cost Guard ---
+cost_guard = CostGuard(
+    max_cost=COST_GUARD_MAX_COST,
+    max_rows=COST_GUARD_MAX_ROWS,
+    statement_timeout_ms=STATEMENT_TIMEOUT_MS,
+)
+
+# --- Requests ---
+LLM_BUSY_MESSAGE = "The AI service is busy right now. Please try again in a moment."
+MAX_CONVERSATION_ID_LENGTH = 255  # chatbot_history.conversation_id is VARCHAR(255)
+BAD_CONVERSATION_ID_MESSAGE = f"conversationId must be a string of at most {MAX_CONVERSATION_ID_LENGTH} characters"
+
+def accept_request_id(incoming):
+    # A well-formed X-Request-ID from a proxy or client is kept so logs can be correlated end to end
+    incoming = incoming or ''
+    return incoming if 0 < len(incoming) <= 64 and incoming.replace('-', '').isalnum() else uuid.uuid4().hex[:16]
+
+def llm_deadline_from_now():
+    # Each request (or batch question) gets LLM_REQUEST_BUDGET seconds of Gemini time
+    return time.monotonic() + LLM_REQUEST_BUDGET if LLM_REQUEST_BUDGET > 0 else None
+
+def server_timing(spans):
+    return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans)
+
+def record_request(request_id, method, endpoint, status, started, spans):
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    request_seconds.observe(elapsed, endpoint=endpoint, method=method, status=status)
+    stages = ' '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in spans)
+    logging.info(f"request_id={request_id} {method} {endpoint} {status} {elapsed * 1000:.1f}ms {stages}".rstrip())
+
+@contextmanager
+def timed(stage, spans=None):
+    # Times one stage of a request for chatbot_stage_seconds and, given the
+    # request's span list, for its Server-Timing header and completion log line
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors_total.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=stage)
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+@contextmanager
+def counted_llm_call(purpose):
+    try:
+        yield
+    except LLMUnavailable:
+        llm_calls_total.inc(purpose=purpose, outcome="unavailable")
+        raise
+    except Exception:
+        llm_calls_total.inc(purpose=purpose, outcome="error")
+        raise
+    llm_calls_total.inc(purpose=purpose, outcome="ok")
+
+SUMMARIZER_MODES = ("auto", "local", "llm")
+BAD_SUMMARIZER_MESSAGE = f"summarizer must be one of: {', '.join(SUMMARIZER_MODES)}"
+
+def valid_summarizer_mode(mode):
+    # The optional per-request override of SUMMARIZER_MODE
+    return mode is None or (isinstance(mode, str) and mode.lower() in SUMMARIZER_MODES)
+
+def valid_conversation_id(conversation_id):
+    # Checked before anything is queued for history: a row the column would
+    # reject makes its whole write-behind batch fall back to row-by-row inserts
+    return conversation_id is None or (isinstance(conversation_id, str)
+                                       and len(conversation_id) <= MAX_CONVERSATION_ID_LENGTH)
+
+# --- Authentication ---
+def verify_token(authorization, secret_key):
+    # Returns (payload, None) for a valid bearer token, else (None, the 401 message).
+    # A token verified in the last TOKEN_CACHE_TTL seconds is trusted until its own exp.
+    token = (authorization or '').replace('Bearer ', '').strip()
+    if not token:
+        return None, 'Token is missing!'
+
+    data = token_cache.get(token)
+    if data is not None and data.get('exp', 0) <= time.time():
+        token_cache.pop(token)
+        data = None
+    if data is None:
+        try:
+            data = jwt.decode(token, secret_key, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return None, 'Token has expired!'
+        except jwt.InvalidTokenError:
+            return None, 'Token is invalid!'
+        token_cache.set(token, data)
+    return data, None
+
+def issue_token(user_id, email, secret_key):
+    payload = {
+        'user_id': user_id,
+        'email': email,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
+    }
+    return jwt.encode(payload, secret_key, algorithm='HS256')
+
+# --- NL to SQL Translation ---
+def extract_sql(text):
+    return text.strip("```sql\n").strip().replace('`', '')
+
+def template_translation(user_query):
+    # (sql, params) for a question a template compiles locally, else None
+    if not SQL_TEMPLATES_ENABLED:
+        return None
+    compiled = compile_question(user_query)
+    if compiled is None:
+        return None
+    sql_translations_total.inc(source="template")
+    return compiled.sql, compiled.params
+
+def translation_key(user_query):
+    # Questions that normalize identically (case, whitespace, subject/exam/department
+    # aliases) share one cached translation and one in-flight Gemini call
+    return normalize_question(user_query)
+
+def remember_translation(cache_key, reply):
+    # The SQL in a model reply. Only a statement is shared through the cache: a
+    # clarifying question or refusal is returned to this caller alone.
+    generated = extract_sql(reply)
+    if is_sql_statement(generated):
+        translation_cache.set(cache_key, generated)
+    return generated
+
+def forget_translation(user_query, generated_query):
+    # Called when the SQL failed to run, so the shared cache stops handing it out
+    if translation_cache.discard(translation_key(user_query), generated_query):
+        logging.info(f"Dropped cached translation that failed to run: {generated_query}")
+
+# --- Query Execution ---
+QUERY_CANCELED = (psycopg2.errors.QueryCanceled, psycopg.errors.QueryCanceled)
+
+def invalidate_cached_results(query, schema_catalog, aggregate_store=None):
+    tables = written_tables(query)
+    if is_ddl(query):
+        # Prompts and cached translations were built against the old schema
+        schema_catalog.invalidate()
+        translation_cache.clear()
+    if aggregate_store is not None:
+        aggregate_store.note_write(tables)
+    if tables:
+        result_cache.invalidate_tables(tables)
+    else:
+        # A write whose target we cannot name could have touched anything
+        result_cache.clear()
+
+class QueryPlan:
+    """One statement on its way through execute_query, in either server.
+
+    Built before a connection is taken. It holds the statement as asked, which
+    caching and invalidation go by, and the statement that runs: a recognized
+    aggregate shape reads from the materialized views instead. `cached` is a
+    cached result that already answers it, if any. The server runs the rest on
+    its own connection and hands the outcome to finish(), or the exception to
+    failed() or unavailable().
+    """
+
+    def __init__(self, query, params, max_rows, schema_catalog, aggregate_store=None):
+        self.max_rows = QUERY_MAX_ROWS if max_rows is None else max_rows
+        self.query = query.replace('"', "'")
+        self.params = list(params) if params else None
+        self.schema_catalog = schema_catalog
+        self.aggregate_store = aggregate_store if AGGREGATES_ENABLED else None
+        logging.debug(f"Executing query: {self.query}")
+        self.run_query = self.query
+        if self.aggregate_store is not None:
+            rewritten = self.aggregate_store.rewrite(self.query)
+            if rewritten is not None:
+                rule, self.run_query = rewritten
+                aggregate_rewrites_total.inc(rule=rule)
+                logging.debug(f"Answering from aggregates ({rule}): {self.run_query}")
+        self.is_select = self.query.strip().upper().startswith('SELECT')
+        self.guarded = self.is_select and COST_GUARD_ENABLED
+        self.cacheable = is_cacheable_read(self.query)
+        self.cache_key = (self.query, tuple(self.params)) if self.params else self.query
+        self.cached = None
+        if self.cacheable:
+            cached = result_cache.get(self.cache_key)
+            if cached is not None and cached.covers(self.max_rows):
+                self.cached = cached
+            self.cache_generation = result_cache.generation
+
+    def rejection(self, decision):
+        # The error string for a statement the cost guard refused, else None
+        if decision is None or decision.action != 'reject':
+            return None
+        logging.warning(f"Cost guard rejected query (cost {decision.cost}): {self.query}")
+        errors_total.inc(stage="cost_guard")
+        return f"Query not run: {decision.reason}"
+
+    def fetch_args(self, decision):
+        # Arguments after the connection for fetch_bounded / fetch_bounded_async
+        limited = decision is not None and decision.action == 'limit'
+        return (decision.query if limited else self.run_query, self.params, self.max_rows,
+                QUERY_FETCH_SIZE, QUERY_COUNT_TRUNCATED and not limited)
+
+    def finish(self, results, decision=None):
+        # Called once the statement has committed: caches a read, or drops what a write may have changed
+        if self.is_select:
+            if decision is not None and decision.action == 'limit':
+                results.notice = decision.reason
+            rows_returned_total.inc(len(results))
+            query_rows.observe(len(results))
+        if self.cacheable:
+            result_cache.set(self.cache_key, results, referenced_tables(self.query), len(results),
+                             results.approx_bytes(), self.cache_generation)
+        elif is_write(self.query):
+            invalidate_cached_results(self.query, self.schema_catalog, self.aggregate_store)
+        return results
+
+    def unavailable(self, error):
+        # For the pool's own error when no connection could be had
+        logging.error(f"Error connecting to database: {error}")
+        errors_total.inc(stage="db_connect")
+        return "Failed to connect to the database"
+
+    def failed(self, error):
+        if isinstance(error, QUERY_CANCELED):
+            logging.warning(f"Query cancelled by statement timeout: {error}")
+            errors_total.inc(stage="statement_timeout")
+            return (f"Query not run: it took longer than the {STATEMENT_TIMEOUT_MS} ms limit and was cancelled. "
+                    "Try narrowing it down, for example to one department, semester, subject or exam.")
+        logging.error(f"Error executing query: {str(error)}")
+        errors_total.inc(stage="execute")
+        return f"Error executing query: {str(error)}"
+
+# --- Summaries ---
+def build_summary_prompt(user_query, db_results):
+    if isinstance(db_results, str):
+        result_string = db_results
+    else:
+        result_string = encode_results(db_results, SUMMARY_PROMPT_MAX_TOKENS)
+    
+    return f"""
+
+            You are a chatbot that interprets SQL query results and provides natural language responses.
+            The user has asked a question, and the database has returned some results.
+            Your task is to generate a natural language summary of the results based on the user's query.
+
+            Format the SQL query results as follows:
+            - If there is more than two result, present the result on multiple lines.
+            - For example:
+            the students who scored above fifty marks are
+                1.parthiban
+                2.logith
+                3.kumar
+            - If there is only one result,like details about one particular student, present the result as usual
+            but if there is results about multiple students, present the details about one student and in a new line 
+            give the details about the next student.
+            -if the user's expects one result in the query and the result is not available or more than result are given than 
+            the user expected,then understand thee users query and find out what he wants ,instead of  dumping him all the results
+            tell him the reason for not finding the results or getting more result shortly and then in the next line 
+            tell the user how to give the query to get the result he wants.
+            
+            
+
+            User Query: "{user_query}"
+            SQL Query Results:
+            {result_string}
+
+            Now summarize the results for the user in natural language:
+"""
+
+def local_summary(user_query, sql, db_results, mode=None):
+    # "auto" answers simple result shapes locally and sends the rest to Gemini;
+    # "local" and "llm" force one path. A request may override SUMMARIZER_MODE.
+    # None means the summary is Gemini's to write.
+    mode = (mode or SUMMARIZER_MODE).lower()
+    if mode == 'llm':
+        return None
+    return summarize_locally(user_query, sql, db_results, force=(mode == 'local'))
+
+# --- Chat History ---
+# A conversation's NL->SQL context, newest turn first
+CONVERSATION_TURNS_SQL = """
+    SELECT user_query, generated_sql FROM chatbot_history
+    WHERE user_id = %s AND conversation_id = %s AND generated_sql IS NOT NULL
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s;
+"""
+
+def record_turns(history_writer, conversation_sessions, user_id, conversation_id, turns):
+    # turns is a list of (user_query, nl_response, generated_sql), oldest first.
+    # Returns the {"id", "title"} of a newly started conversation (titled after
+    # the first turn), or {} for an existing one. The rows are queued for the
+    # background writer together, so they are inserted in one statement; an
+    # uncached title is resolved by the INSERT. Each turn is also added to the
+    # conversation's NL->SQL context for follow-up questions.
+    if not turns:
+        return {}
+    new_conversation_details = {}
+    if not conversation_id:
+        conversation_id = str(uuid.uuid4())
+        first_query = turns[0][0]
+        title = (first_query[:75] + '...') if len(first_query) > 75 else first_query
+        new_conversation_details = {"id": conversation_id, "title": title}
+        history_writer.remember_title(conversation_id, title)
+    else:
+        title = history_writer.cached_title(conversation_id)
+
+    history_writer.record_many([
+        (user_id, conversation_id, title, user_query, nl_response, generated_sql)
+        for user_query, nl_response, generated_sql in turns
+    ])
+    if CHAT_SESSIONS_ENABLED:
+        for user_query, _, generated_sql in turns:
+            conversation_sessions.record(conversation_id, user_id, user_query, generated_sql,
+                                         new=bool(new_conversation_details))
+    return new_conversation_details
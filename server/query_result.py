@@ -0,0 +1,104 @@
+import uuid
+
+
+class QueryResult:
+    """Rows returned by execute_query, stored as tuples alongside one column list.
+
+    `truncated` is set when the statement matched more than the row cap; in that
+    case `total_rows` holds the full match count when it was measured (else None).
+    For statements that return no rows, `rowcount` is the number of rows affected.
+    `notice` explains any throttling applied before the query ran.
+    """
+
+    __slots__ = ("columns", "rows", "truncated", "total_rows", "rowcount", "notice")
+
+    def __init__(self, columns, rows, truncated=False, total_rows=None, rowcount=-1, notice=None):
+        self.columns = list(columns)
+        self.rows = rows
+        self.truncated = truncated
+        self.total_rows = len(rows) if total_rows is None and not truncated else total_rows
+        self.rowcount = rowcount
+        self.notice = notice
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def as_dicts(self):
+        columns = self.columns
+        return (dict(zip(columns, row)) for row in self.rows)
+
+    def column(self, index=0):
+        return [row[index] for row in self.rows]
+
+    def covers(self, max_rows):
+        # True if this is exactly what a fetch capped at max_rows would return
+        if self.truncated:
+            return len(self.rows) == max_rows
+        return len(self.rows) <= max_rows
+
+    def approx_bytes(self):
+        return sum(len(repr(row)) for row in self.rows) + sum(len(c) for c in self.columns)
+
+    def truncation_note(self):
+        if self.notice:
+            return self.notice
+        if not self.truncated:
+            return ""
+        if self.total_rows is not None:
+            return f"truncated, showing the first {len(self.rows)} of {self.total_rows} total rows"
+        return f"truncated, showing the first {len(self.rows)} rows"
+
+    def __repr__(self):
+        return f"QueryResult(columns={self.columns!r}, rows={len(self.rows)}, truncated={self.truncated})"
+
+
+def fetch_bounded(conn, query, params, max_rows, fetch_size=500, count_truncated=True):
+    # A named (server-side) cursor keeps unread rows in PostgreSQL, so at most
+    # max_rows tuples ever reach this process however many rows the query matches.
+    max_rows = max(1, max_rows)
+    name = f"chatbot_{uuid.uuid4().hex}"
+    with conn.cursor(name=name) as cursor:
+        cursor.execute(query, params)
+        rows = []
+        while len(rows) < max_rows:
+            batch = cursor.fetchmany(min(fetch_size, max_rows - len(rows)))
+            if not batch:
+                break
+            rows.extend(batch)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+
+        truncated, total_rows = False, None
+        if len(rows) == max_rows and cursor.fetchone() is not None:
+            truncated = True
+            if count_truncated:
+                # MOVE skips the remainder server-side and reports how many rows it passed
+                with conn.cursor() as mover:
+                    mover.execute(f'MOVE FORWARD ALL FROM "{name}"')
+                    total_rows = max_rows + 1 + max(mover.rowcount, 0)
+    return QueryResult(columns, rows, truncated=truncated, total_rows=total_rows)
+
+
+async def fetch_bounded_async(conn, query, params, max_rows, fetch_size=500, count_truncated=True):
+    # fetch_bounded() for a psycopg 3 async connection
+    max_rows = max(1, max_rows)
+    name = f"chatbot_{uuid.uuid4().hex}"
+    async with conn.cursor(name=name) as cursor:
+        await cursor.execute(query, params)
+        rows = []
+        while len(rows) < max_rows:
+            batch = await cursor.fetchmany(min(fetch_size, max_rows - len(rows)))
+            if not batch:
+                break
+            rows.extend(batch)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+
+        truncated, total_rows = False, None
+        if len(rows) == max_rows and await cursor.fetchone() is not None:
+            truncated = True
+            if count_truncated:
+                mover = await conn.execute(f'MOVE FORWARD ALL FROM "{name}"')
+                total_rows = max_rows + 1 + max(mover.rowcount, 0)
+    return QueryResult(columns, rows, truncated=truncated, total_rows=total_rows)
@@ -0,0 +1,186 @@
+import collections
+import datetime
+import decimal
+
+# Compact text form of a QueryResult for the summary prompt: the column names
+# once, then one delimited line per row. Columns holding one value in every
+# row are stated once above the rows, and a text value equal to the one in the
+# row above is written as a ditto mark. Results whose encoding would exceed the
+# token budget are described by per-column statistics (for as many columns as
+# fit) plus as many leading rows as still fit, followed by the number of rows
+# left out.
+DELIMITER = " | "
+DITTO = '"'
+MAX_CELL_CHARS = 120
+TOP_VALUES = 3
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English prose and tabular text
+    return max(1, len(text) // 4)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool)
+
+
+def format_cell(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, (decimal.Decimal, float)):
+        rounded = round(float(value), 2)
+        return str(int(rounded)) if rounded == int(rounded) else f"{rounded:.2f}".rstrip("0")
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    text = " ".join(str(value).replace("|", "/").split())
+    if len(text) > MAX_CELL_CHARS:
+        text = text[:MAX_CELL_CHARS - 3] + "..."
+    return text
+
+
+class _Columns:
+    # Which columns are constant (hoisted out of the rows) and which are numeric
+    def __init__(self, results):
+        self.names = results.columns
+        rows = results.rows
+        self.numeric = [
+            any(row[i] is not None for row in rows) and all(row[i] is None or _is_number(row[i]) for row in rows)
+            for i in range(len(self.names))
+        ]
+        constant = [len(rows) > 1 and all(row[i] == rows[0][i] for row in rows) for i in range(len(self.names))]
+        if all(constant):
+            constant = [False] * len(self.names)
+        self.constant = [(self.names[i], rows[0][i]) for i in range(len(self.names)) if constant[i]]
+        self.shown = [i for i in range(len(self.names)) if not constant[i]]
+
+    def header(self):
+        return DELIMITER.join(str(self.names[i]) for i in self.shown)
+
+    def constant_line(self):
+        if not self.constant:
+            return None
+        return "Same in every row: " + "; ".join(f"{name} = {format_cell(value)}" for name, value in self.constant)
+
+    def lines(self, rows):
+        previous = None
+        for row in rows:
+            cells = []
+            for i in self.shown:
+                cell = format_cell(row[i])
+                if previous is not None and not self.numeric[i] and len(cell) > len(DITTO) and row[i] == previous[i]:
+                    cell = DITTO
+                cells.append(cell)
+            previous = row
+            yield DELIMITER.join(cells)
+
+    def uses_ditto(self, lines):
+        return any(cell == DITTO for line in lines for cell in line.split(DELIMITER))
+
+
+def _describe_column(name, values, numeric):
+    present = [v for v in values if v is not None]
+    missing = len(values) - len(present)
+    if not present:
+        return f"{name}: no values"
+    if numeric:
+        average = sum(float(v) for v in present) / len(present)
+        text = (f"{name}: min {format_cell(min(present))}, max {format_cell(max(present))}, "
+                f"average {format_cell(average)}")
+    elif all(isinstance(v, (datetime.date, datetime.datetime)) for v in present):
+        text = f"{name}: from {format_cell(min(present))} to {format_cell(max(present))}"
+    else:
+        counts = collections.Counter(format_cell(v) for v in present)
+        text = f"{name}: {len(counts)} distinct value{'s' if len(counts) != 1 else ''}"
+        if len(counts) < len(present):
+            common = ", ".join(f"{value} ({count})" for value, count in counts.most_common(TOP_VALUES))
+            text += f"; most common {common}"
+    if missing:
+        text += f"; {missing} NULL"
+    return text
+
+
+_MORE_NOTE_TOKENS = 10  # "(N more columns not summarized)"
+
+
+def _cost(line):
+    # estimate_tokens of a line, plus its newline, rounded up
+    return len(line) // 4 + 1
+
+
+def _fit(lines, budget):
+    # The leading lines whose costs add up to at most `budget`, and that total
+    kept, used = [], 0
+    for line in lines:
+        if used + _cost(line) > budget:
+            break
+        kept.append(line)
+        used += _cost(line)
+    return kept, used
+
+
+def _row_count_line(results):
+    count = len(results.rows)
+    line = f"{count} row{'s' if count != 1 else ''}"
+    note = results.truncation_note()
+    return f"{line} ({note})" if note else line
+
+
+def encode_results(results, max_tokens=2000):
+    """Returns `results` (a QueryResult) as prompt text of about `max_tokens` tokens at most."""
+    if not results.columns:
+        if results.rowcount is not None and results.rowcount >= 0:
+            return f"The statement affected {results.rowcount} row{'s' if results.rowcount != 1 else ''}."
+        return "The statement returned no rows."
+    if not results.rows:
+        note = results.truncation_note()
+        return f"No rows (columns: {', '.join(results.columns)})" + (f"\n({note})" if note else "")
+    if len(results.rows) == 1 and not results.truncation_note():
+        row = results.rows[0]
+        return "; ".join(f"{name} = {format_cell(value)}" for name, value in zip(results.columns, row))
+
+    columns = _Columns(results)
+    preamble = [_row_count_line(results)]
+    constant = columns.constant_line()
+    if constant:
+        preamble.append(constant)
+    lines = list(columns.lines(results.rows))
+    legend = [f'({DITTO} means the same value as the row above)'] if columns.uses_ditto(lines) else []
+    full = "\n".join(preamble + legend + [f"Columns: {columns.header()}"] + lines)
+    if estimate_tokens(full) <= max_tokens:
+        return full
+
+    # Over budget: the row count, then as much of the constant line, the column
+    # summary and the leading rows as fits, then the count of rows left out.
+    # Wide results may not even fit a summary of every column.
+    head = [_row_count_line(results)]
+    used = _cost(head[0]) + _cost(f"{len(results.rows)} more rows not listed to keep this short.")
+    if columns.constant:
+        # At most half of what is left, so the summary of the other columns still fits
+        prefix = "Same in every row: "
+        parts = [f"{name} = {format_cell(value)}; " for name, value in columns.constant]
+        kept, cost = _fit(parts, (max_tokens - used) // 2 - _cost(prefix) - _MORE_NOTE_TOKENS)
+        if kept:
+            more = len(parts) - len(kept)
+            head.append(prefix + "".join(kept)[:-2] + (f"; and {more} more columns" if more else ""))
+            used += _cost(prefix) + cost + (_MORE_NOTE_TOKENS if more else 0)
+    summary = [f"  {_describe_column(results.columns[i], results.column(i), columns.numeric[i])}"
+               for i in columns.shown]
+    kept, cost = _fit(summary, max_tokens - used - _cost("Column summary:") - _MORE_NOTE_TOKENS)
+    if kept:
+        head += ["Column summary:"] + kept
+        used += _cost("Column summary:") + cost
+        if len(kept) < len(summary):
+            head.append(f"  ({len(summary) - len(kept)} more columns not summarized)")
+            used += _MORE_NOTE_TOKENS
+    rows_header = f"First {len(results.rows)} rows (columns: {columns.header()}):"
+    legend = f'({DITTO} means the same value as the row above)'
+    shown, _ = _fit(columns.lines(results.rows), max_tokens - used - _cost(rows_header) - _cost(legend))
+    omitted = len(results.rows) - len(shown)
+    if shown:
+        head.append(f"First {len(shown)} rows (columns: {columns.header()}):")
+        if columns.uses_ditto(shown):
+            head.append(legend)
+    tail = [f"{omitted} more row{'s' if omitted != 1 else ''} not listed to keep this short."]
+    return "\n".join(head + shown + tail)
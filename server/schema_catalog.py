@@ -0,0 +1,254 @@
+import fnmatch
+import logging
+import re
+import threading
+import time
+
+# Tables and columns of the schemas on the search path, read from
+# information_schema and pg_catalog, for the NL->SQL prompt.
+_COLUMNS_SQL = """
+    SELECT c.table_schema, c.table_name, c.column_name, c.data_type, c.udt_name,
+           c.is_identity = 'YES' OR COALESCE(c.column_default, '') LIKE 'nextval(%',
+           col_description(format('%I.%I', c.table_schema, c.table_name)::regclass, c.ordinal_position),
+           obj_description(format('%I.%I', c.table_schema, c.table_name)::regclass, 'pg_class')
+    FROM information_schema.columns c
+    JOIN information_schema.tables t ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+    WHERE t.table_type = 'BASE TABLE' AND c.table_schema = ANY(current_schemas(false))
+    ORDER BY array_position(current_schemas(false), c.table_schema::name), c.table_name, c.ordinal_position
+"""
+_KEYS_SQL = """
+    SELECT n.nspname, rel.relname, con.contype, att.attname, frel.relname, fatt.attname
+    FROM pg_constraint con
+    JOIN pg_class rel ON rel.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = rel.relnamespace
+    CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum)
+    JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = k.attnum
+    LEFT JOIN pg_class frel ON frel.oid = con.confrelid
+    LEFT JOIN pg_attribute fatt ON fatt.attrelid = con.confrelid AND fatt.attnum = k.fattnum
+    WHERE con.contype IN ('p', 'f') AND n.nspname = ANY(current_schemas(false))
+    ORDER BY array_position(current_schemas(false), n.nspname)
+"""
+_TYPE_NAMES = {
+    "character varying": "VARCHAR",
+    "character": "CHAR",
+    "timestamp without time zone": "TIMESTAMP",
+    "timestamp with time zone": "TIMESTAMPTZ",
+    "time without time zone": "TIME",
+    "double precision": "DOUBLE PRECISION",
+}
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = {
+    "a", "an", "the", "of", "in", "on", "by", "for", "to", "and", "or", "with", "from", "at", "as", "is", "are",
+    "who", "what", "which", "how", "many", "much", "me", "my", "all", "each", "per", "show", "list", "get", "give",
+    "find", "tell", "details", "id", "code", "name", "type", "number", "value", "than", "above", "below",
+}
+_LOAD_RETRY = 5.0
+
+
+def _stems(word):
+    # Crude plural and past-tense folding: "marks" -> "mark", "scored" -> "score"/"scor"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return (word[:-1],)
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-1], word[:-2]
+    return (word,)
+
+
+def keywords(text):
+    words = _WORD.findall((text or "").lower().replace("_", " "))
+    return {stem for w in words if w not in _STOP_WORDS for stem in _stems(w)}
+
+
+class _Column:
+    __slots__ = ("name", "type", "auto", "note", "primary_key", "references")
+
+    def __init__(self, name, type, auto, note):
+        self.name = name
+        self.type = type
+        self.auto = auto
+        self.note = note
+        self.primary_key = False
+        self.references = None  # "table.column"
+
+    def render(self):
+        parts = [f"{self.name} {self.type}"]
+        if self.primary_key:
+            parts.append("primary key")
+        if self.auto:
+            parts.append("auto-increment")
+        if self.references:
+            parts.append(f"references {self.references}")
+        text = ", ".join(parts)
+        return f"{text} ({self.note})" if self.note else text
+
+
+class _Table:
+    __slots__ = ("name", "note", "columns", "keywords", "name_keywords")
+
+    def __init__(self, name, note):
+        self.name = name
+        self.note = note
+        self.columns = []
+        self.keywords = set()
+        self.name_keywords = keywords(name)
+
+    def render(self):
+        heading = f"{self.name} table ({self.note})" if self.note else f"{self.name} table"
+        return f"{heading}: " + "; ".join(column.render() for column in self.columns)
+
+    def referenced(self):
+        return {column.references.split(".")[0] for column in self.columns if column.references}
+
+
+class SchemaCatalog:
+    """In-process copy of the database schema, rendered into the NL->SQL prompt.
+
+    The catalog is read on first use and again once `ttl` seconds have passed
+    or after invalidate(), which execute_query calls when DDL runs. Tables
+    whose names match an `exclude` pattern (fnmatch, e.g. "chatbot_*") are
+    never shown. Column and table comments (COMMENT ON) describe the columns;
+    `notes` ({(table, column): text}) fills in columns without one.
+
+    render(question) lists only the tables whose name, column names or notes
+    share a word with the question, plus the tables they reference, at most
+    `max_tables` of them. If nothing matches, every table is listed.
+    """
+
+    def __init__(self, pool, notes=None, exclude=(), ttl=300.0, max_tables=8):
+        self._pool = pool
+        self._notes = dict(notes or {})
+        self._exclude = [pattern.lower() for pattern in exclude]
+        self.ttl = ttl
+        self.max_tables = max_tables
+        self._lock = threading.Lock()
+        self._tables = None
+        self._loaded_at = 0.0
+        self._stale = True
+        self._retry_at = 0.0
+        self.loads = 0
+        self.load_failures = 0
+        self.invalidations = 0
+        self.last_load_ms = 0.0
+
+    def _excluded(self, name):
+        return any(fnmatch.fnmatchcase(name.lower(), pattern) for pattern in self._exclude)
+
+    def _read(self, conn=None):
+        if conn is None:
+            with self._pool.connection() as conn:
+                return self._read(conn)
+        tables = {}
+        schemas = {}
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(_COLUMNS_SQL)
+                for row in cursor.fetchall():
+                    schema, table_name, column_name, data_type, udt_name, auto, comment, table_comment = row
+                    # A table name seen earlier on the search path hides the later ones
+                    if self._excluded(table_name) or schemas.setdefault(table_name, schema) != schema:
+                        continue
+                    table = tables.get(table_name)
+                    if table is None:
+                        table = tables[table_name] = _Table(table_name, table_comment)
+                    if data_type == "ARRAY":
+                        type_name = f"{udt_name.lstrip('_').upper()}[]"
+                    elif data_type == "USER-DEFINED":
+                        type_name = udt_name.upper()
+                    else:
+                        type_name = _TYPE_NAMES.get(data_type, data_type.upper())
+                    note = comment or self._notes.get((table_name, column_name))
+                    table.columns.append(_Column(column_name, type_name, bool(auto), note))
+                cursor.execute(_KEYS_SQL)
+                keys = cursor.fetchall()
+        finally:
+            conn.rollback()
+        for schema, table_name, kind, column_name, foreign_table, foreign_column in keys:
+            table = tables.get(table_name) if schemas.get(table_name) == schema else None
+            column = next((c for c in table.columns if c.name == column_name), None) if table else None
+            if column is None:
+                continue
+            if kind == "p":
+                column.primary_key = True
+            elif not self._excluded(foreign_table):
+                column.references = f"{foreign_table}.{foreign_column}"
+        for table in tables.values():
+            words = set(table.name_keywords)
+            if table.note:
+                words |= keywords(table.note)
+            for column in table.columns:
+                if not column.references:
+                    words |= keywords(column.name)
+                if column.note:
+                    words |= keywords(column.note)
+            table.keywords = words
+        return tables
+
+    def _due(self, now):
+        expired = self.ttl and now - self._loaded_at > self.ttl
+        return bool((self._stale or expired) and now >= self._retry_at)
+
+    def stale(self):
+        # True if the next tables() call will read the database
+        with self._lock:
+            return self._due(time.monotonic())
+
+    def tables(self, conn=None):
+        # {name: table} as of the last load, reloading first when stale. A
+        # reload reads on `conn` if given (and rolls it back), else on a
+        # connection of its own from the pool.
+        with self._lock:
+            now = time.monotonic()
+            if self._due(now):
+                try:
+                    self._tables = self._read(conn)
+                    self._stale = False
+                    self._loaded_at = now
+                    self.loads += 1
+                    self.last_load_ms = (time.monotonic() - now) * 1000
+                except Exception as e:
+                    # Keep serving the last good copy and try again shortly
+                    self.load_failures += 1
+                    self._retry_at = now + _LOAD_RETRY
+                    logging.error(f"Could not load the schema catalog: {e}")
+            return self._tables or {}
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+            self.invalidations += 1
+
+    def relevant(self, question, conn=None):
+        tables = self.tables(conn)
+        words = keywords(question)
+        scores = {}
+        for name, table in tables.items():
+            score = 3 * len(words & table.name_keywords) + len(words & table.keywords)
+            if score:
+                scores[name] = score
+        if not scores:
+            return list(tables)
+        chosen = sorted(scores, key=lambda name: -scores[name])[:self.max_tables]
+        for name in list(chosen):
+            for referenced in sorted(tables[name].referenced()):
+                if referenced in tables and referenced not in chosen and len(chosen) < self.max_tables:
+                    chosen.append(referenced)
+        return [name for name in tables if name in chosen]
+
+    def render(self, question=None, conn=None):
+        tables = self.tables(conn)
+        names = self.relevant(question) if question is not None else list(tables)
+        lines = [f"{i}. {tables[name].render()}" for i, name in enumerate(names, 1)]
+        if not lines:
+            lines = ["(the schema could not be read; ask the user to try again later)"]
+        return "DATABASE SCHEMA:\n==================\n" + "\n".join(lines) + "\n\n"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tables": len(self._tables or {}),
+                "loads": self.loads,
+                "load_failures": self.load_failures,
+                "invalidations": self.invalidations,
+                "last_load_ms": round(self.last_load_ms, 3),
+                "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._tables is not None else None,
+            }
@@ -1,44 +1,144 @@
 # File: backend/app.py
 
-import os
-import sys
 import logging
-import bcrypt
-import google.generativeai as genai
-import psycopg2
-from flask import Flask, request, jsonify, current_app
+from flask import Flask, Response, request, jsonify, current_app, g, has_request_context, stream_with_context
 from flask_cors import CORS
-from dotenv import load_dotenv
-import jwt
 import datetime
-import uuid
+import time
+import json
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import wraps
+from db_pool import ConnectionPool, PoolError
+from aggregates import SOURCE_TABLES as AGGREGATE_SOURCE_TABLES, AggregateStore
+from history_writer import HistoryWriter
+from password_verifier import PasswordVerifier, VerifierBusy
+from llm_client import LLMClient, LLMUnavailable
+from caches import SingleFlight
+from chat_sessions import ConversationSessions
+from sql_prompt import COLUMN_NOTES, build_sql_primer, build_sql_prompt, build_sql_turn
+from schema_catalog import SchemaCatalog
+from sql_templates import render_sql, stats as sql_template_stats
+from summarizer import summarize_locally
+from query_result import QueryResult, fetch_bounded
+from pagination import (
+    CursorError, conversations_page, conversations_page_query, history_page, history_page_query, page_request,
+)
+from sql_analysis import is_single_statement, is_write
+from export import FORMATS as EXPORT_FORMATS, CopyExport
+from settings import (
+    AGGREGATES_ENABLED, AGGREGATE_MAX_STALENESS, AGGREGATE_REFRESH, AGGREGATE_REFRESH_INTERVAL,
+    AGGREGATE_SYNC_INTERVAL, BATCH_MAX_QUESTIONS, BATCH_WORKERS, BCRYPT_ACQUIRE_TIMEOUT, BCRYPT_MAX_PENDING,
+    BCRYPT_WORKERS, CHAT_SESSIONS_ENABLED, CHAT_SESSION_MAX, CHAT_SESSION_MAX_BYTES, CHAT_SESSION_TTL,
+    CHAT_SESSION_TURNS, CONVERSATIONS_PAGE_SIZE, COST_GUARD_ENABLED, DB_HOST, DB_NAME, DB_PASSWORD,
+    DB_POOL_HEALTH_CHECK_INTERVAL, DB_POOL_MAX, DB_POOL_MIN, DB_POOL_TIMEOUT, DB_PORT, DB_USER, EXPORT_CHUNK_SIZE,
+    EXPORT_MAX_CONCURRENT, EXPORT_STATEMENT_TIMEOUT_MS, HISTORY_BATCH_SIZE, HISTORY_ENQUEUE_TIMEOUT,
+    HISTORY_FLUSH_INTERVAL, HISTORY_PAGE_SIZE, HISTORY_QUEUE_SIZE, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_BURST,
+    LLM_CALL_TIMEOUT, LLM_MAX_IN_FLIGHT, LLM_MAX_RETRIES, LLM_RATE_LIMIT, MAX_PAGE_SIZE, SCHEMA_CATALOG_EXCLUDE,
+    SCHEMA_CATALOG_TTL, SCHEMA_PROMPT_MAX_TABLES, SECRET_KEY, SQL_PROMPT_EXAMPLES,
+)
+from pipeline import (
+    BAD_CONVERSATION_ID_MESSAGE, BAD_SUMMARIZER_MESSAGE, CONVERSATION_TURNS_SQL, LLM_BUSY_MESSAGE, QueryPlan,
+    accept_request_id, build_summary_prompt, configure_logging, cost_guard, counted_llm_call, errors_total,
+    extract_sql, forget_translation, gemini_model, issue_token, llm_deadline_from_now, local_summary, metrics,
+    metrics_authorized, record_request, record_turns, register_gauges, remember_translation, result_cache,
+    server_timing, sql_translations_total, template_translation, timed, token_cache, translation_cache,
+    translation_key, valid_conversation_id, valid_summarizer_mode, verify_token,
+)
 
 # --- Basic Setup ---
-load_dotenv()
-logging.basicConfig(level=logging.DEBUG)
-
-# --- Environment Variables ---
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
+# Everything that is the same in async_server.py (metrics, caches, the query
+# pipeline's decisions) lives in pipeline.py; this module adds the Flask app
+# and starts the pool, workers and background threads it serves from.
+configure_logging(lambda: g.get('request_id', '-') if has_request_context() else '-')
 
 # --- Generative AI Configuration ---
-genai.configure(api_key=GEMINI_API_KEY)
-generation_config = {
-    "temperature": 1,
-    "top_p": 0.95,
-    "top_k": 40,
-    "max_output_tokens": 8192,
-    "response_mime_type": "text/plain",
-}
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config=generation_config,
+model = gemini_model()
+
+_worker_state = threading.local()
+
+def llm_deadline():
+    # Deadline of the request, or batch question, whose LLM calls are being made
+    if has_request_context():
+        return g.get('llm_deadline')
+    return getattr(_worker_state, 'llm_deadline', None)
+
+# Every Gemini call goes through this client, which bounds the call rate and
+# concurrency, times calls out against the request's budget and retries
+# rate-limit and server errors with backoff.
+llm_client = LLMClient(
+    rate=LLM_RATE_LIMIT,
+    burst=LLM_BURST,
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    call_timeout=LLM_CALL_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE,
+    backoff_max=LLM_BACKOFF_MAX,
+    deadline_fn=llm_deadline,
+)
+
+# --- Password Verification ---
+# Started before the database pool and background threads so the workers fork from a quiet process
+password_verifier = PasswordVerifier(
+    max_workers=BCRYPT_WORKERS,
+    max_pending=BCRYPT_MAX_PENDING,
+    acquire_timeout=BCRYPT_ACQUIRE_TIMEOUT,
+).start()
+atexit.register(password_verifier.close)
+
+# --- Database Connection Pool ---
+db_pool = ConnectionPool(
+    minconn=DB_POOL_MIN,
+    maxconn=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+    dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
 )
+atexit.register(db_pool.closeall)
+
+# --- Chat History Writer ---
+history_writer = HistoryWriter(
+    db_pool,
+    batch_size=HISTORY_BATCH_SIZE,
+    flush_interval=HISTORY_FLUSH_INTERVAL,
+    max_queue=HISTORY_QUEUE_SIZE,
+    enqueue_timeout=HISTORY_ENQUEUE_TIMEOUT,
+).start()
+# Registered after the pool so it runs first: queued history is flushed before connections close
+atexit.register(history_writer.close)
+
+# --- Materialized Aggregates ---
+# The views are created by setup_aggregates.py. A refresh, by this or any other
+# process, changes what the aggregate rewrites return, so results cached from
+# the base tables are dropped along with it.
+aggregate_store = AggregateStore(
+    db_pool,
+    max_staleness=AGGREGATE_MAX_STALENESS,
+    refresh_interval=AGGREGATE_REFRESH_INTERVAL,
+    sync_interval=AGGREGATE_SYNC_INTERVAL,
+    refresher=AGGREGATE_REFRESH,
+    on_refresh=lambda: result_cache.invalidate_tables(AGGREGATE_SOURCE_TABLES),
+)
+if AGGREGATES_ENABLED:
+    aggregate_store.start()
+    atexit.register(aggregate_store.close)
+
+@contextmanager
+def span(stage):
+    # Times one stage of the current request: feeds chatbot_stage_seconds, the
+    # request's Server-Timing header and its completion log line.
+    with timed(stage, g.get('spans') if has_request_context() else None):
+        yield
+
+@contextmanager
+def llm_call(purpose):
+    # A request never holds its pooled connection while waiting on Gemini
+    if has_request_context():
+        release_db_connection()
+    with span(f"llm_{purpose}"), counted_llm_call(purpose):
+        yield
 
 # --- Helper Functions ---
 def start_chat_session():
@@ -48,109 +148,275 @@ def start_chat_session():
         logging.error(f"Error starting chat session: {e}")
         return None
 
-def connect_to_db():
+@contextmanager
+def db_connection():
+    # Inside a request, every caller shares one pooled connection that is
+    # returned by release_db_connection() when the request ends.
+    if has_request_context():
+        if 'db_conn' not in g:
+            with span("db_acquire"):
+                g.db_conn = db_pool.getconn()
+        yield g.db_conn
+        return
+    with db_pool.connection() as conn:
+        yield conn
+
+def execute_query(query, params=None, max_rows=None):
+    # SELECTs return a QueryResult capped at max_rows (QUERY_MAX_ROWS by default),
+    # other statements an empty QueryResult with the affected row count, and
+    # failures (including cost guard rejections) an error string. params are
+    # only passed for template-compiled SQL.
+    plan = QueryPlan(query, params, max_rows, schema_catalog, aggregate_store)
+    if plan.cached is not None:
+        return plan.cached
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
-        )
-        return conn
+        with db_connection() as conn:
+            try:
+                decision = None
+                with conn.cursor() as cursor:
+                    cost_guard.apply_timeout(cursor)
+                    if plan.guarded:
+                        decision = cost_guard.check(cursor, plan.run_query, plan.params, plan.max_rows)
+                    if not plan.is_select:
+                        cursor.execute(plan.query, plan.params)
+                        results = QueryResult([], [], rowcount=cursor.rowcount)
+                rejection = plan.rejection(decision)
+                if rejection:
+                    conn.rollback()
+                    return rejection
+                if plan.is_select:
+                    results = fetch_bounded(conn, *plan.fetch_args(decision))
+                conn.commit()
+                return plan.finish(results, decision)
+            except Exception:
+                # Rollback in case of error so the connection stays usable
+                conn.rollback()
+                raise
+    except PoolError as e:
+        return plan.unavailable(e)
     except Exception as e:
-        logging.error(f"Error connecting to database: {e}")
-        return None
+        return plan.failed(e)
 
-def execute_query(query):
-    query = query.replace('"', "'")
-    logging.debug(f"Executing query: {query}")
+def generate_natural_language_response(user_query, db_results, sql=''):
+    # Falls back to the local summary when Gemini cannot answer, so an error
+    # message is never what gets shown and saved as the answer
     try:
-        conn = connect_to_db()
-        if not conn: return "Failed to connect to the database"
-        
-        cursor = conn.cursor()
-        cursor.execute(query)
-        
-        if query.strip().upper().startswith('SELECT'):
-            column_names = [desc[0] for desc in cursor.description]
-            results = [dict(zip(column_names, row)) for row in cursor.fetchall()]
-            conn.close()
-            return results
+        chat_session = start_chat_session()
+        if not chat_session: return summarize_locally(user_query, sql, db_results, force=True)
         
-        conn.commit()
-        conn.close()
-        return []
+        with llm_call("summary"):
+            response = llm_client.send(chat_session, build_summary_prompt(user_query, db_results))
+        return response.text.strip()
     except Exception as e:
-        logging.error(f"Error executing query: {str(e)}")
-        # Rollback in case of error
-        if conn:
-            conn.rollback()
-        return f"Error executing query: {str(e)}"
-    finally:
-        if conn:
-            conn.close()
-
-def generate_natural_language_response(user_query, db_results):
+        logging.warning(f"Gemini summary failed, answering with the local summary: {str(e)}")
+        return summarize_locally(user_query, sql, db_results, force=True)
+
+def summarize_results(user_query, sql, db_results, mode=None):
+    local_response = local_summary(user_query, sql, db_results, mode)
+    if local_response is not None:
+        return local_response
+    return generate_natural_language_response(user_query, db_results, sql)
+
+def stream_natural_language_response(user_query, db_results, sql=''):
+    # Yields the summary as Gemini produces it. If Gemini fails before the first
+    # chunk, the local summary is yielded instead, as in the blocking path.
+    started = False
     try:
         chat_session = start_chat_session()
-        if not chat_session: return "Error: Unable to start chat session."
-        
-        result_string = ', '.join([str(row) for row in db_results])
+        if not chat_session:
+            yield summarize_locally(user_query, sql, db_results, force=True)
+            return
         
-        prompt = f"""
-
-            You are a chatbot that interprets SQL query results and provides natural language responses.
-            The user has asked a question, and the database has returned some results.
-            Your task is to generate a natural language summary of the results based on the user's query.
-
-            Format the SQL query results as follows:
-            - If there is more than two result, present the result on multiple lines.
-            - For example:
-            the students who scored above fifty marks are
-                1.parthiban
-                2.logith
-                3.kumar
-            - If there is only one result,like details about one particular student, present the result as usual
-            but if there is results about multiple students, present the details about one student and in a new line 
-            give the details about the next student.
-            -if the user's expects one result in the query and the result is not available or more than result are given than 
-            the user expected,then understand thee users query and find out what he wants ,instead of  dumping him all the results
-            tell him the reason for not finding the results or getting more result shortly and then in the next line 
-            tell the user how to give the query to get the result he wants.
-            
-            
-
-            User Query: "{user_query}"
-            SQL Query Results:
-            {result_string}
-
-            Now summarize the results for the user in natural language:
-"""
-        response = chat_session.send_message(prompt)
-        return response.text.strip()
+        with llm_call("summary"):
+            response = llm_client.send(chat_session, build_summary_prompt(user_query, db_results), stream=True)
+            for chunk in response:
+                if chunk.text:
+                    started = True
+                    yield chunk.text
+    except Exception as e:
+        logging.warning(f"Gemini summary stream failed: {str(e)}")
+        if started:
+            yield "\n\n(The rest of this answer could not be generated.)"
+        else:
+            yield summarize_locally(user_query, sql, db_results, force=True)
+
+def save_chat_history(user_id, conversation_id, user_query, nl_response, generated_sql=None):
+    return save_chat_history_batch(user_id, conversation_id, [(user_query, nl_response, generated_sql)])
+
+def save_chat_history_batch(user_id, conversation_id, turns):
+    return record_turns(history_writer, conversation_sessions, user_id, conversation_id, turns)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# --- NL to SQL Translation ---
+schema_catalog = SchemaCatalog(
+    db_pool,
+    notes=COLUMN_NOTES,
+    exclude=SCHEMA_CATALOG_EXCLUDE,
+    ttl=SCHEMA_CATALOG_TTL,
+    max_tables=SCHEMA_PROMPT_MAX_TABLES,
+)
+translation_flight = SingleFlight()
+
+def schema_section(question):
+    # A catalog reload reads on the connection the request may already hold
+    # (g.db_conn) rather than taking a second one from the pool
+    if not schema_catalog.stale():
+        return schema_catalog.render(question)
+    with db_connection() as conn:
+        return schema_catalog.render(question, conn)
+
+def load_conversation_turns(conversation_id, user_id, limit):
+    # Rebuilds a conversation's NL->SQL context from chatbot_history, oldest turn first
+    try:
+        history_writer.flush()
+        with span("session_rebuild"), db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(CONVERSATION_TURNS_SQL, (user_id, conversation_id, limit))
+                rows = cursor.fetchall()
+            conn.rollback()
+        return list(reversed(rows))
     except Exception as e:
-        logging.error(f"Error generating natural language response: {str(e)}")
-        return f"Error generating natural language response: {str(e)}"
+        logging.warning(f"Could not rebuild conversation context for {conversation_id}: {e}")
+        return []
+
+conversation_sessions = ConversationSessions(
+    lambda history: model.start_chat(history=history),
+    build_sql_primer(),
+    load_conversation_turns,
+    max_sessions=CHAT_SESSION_MAX,
+    max_bytes=CHAT_SESSION_MAX_BYTES,
+    ttl=CHAT_SESSION_TTL,
+    max_turns=CHAT_SESSION_TURNS,
+)
+register_gauges(db_pool.stats, llm_client, history_writer, password_verifier, aggregate_store, conversation_sessions)
+
+def translate_to_sql(user_query, conversation_id=None, user_id=None):
+    # Returns (sql, params). Template-shaped questions compile locally to
+    # parameterized SQL; the rest go to Gemini (params is None). A question in
+    # a conversation with earlier turns is sent to that conversation's primed
+    # chat, so follow-ups can refer back to them. Other questions that
+    # normalize identically (case, whitespace, subject/exam/department aliases)
+    # share one cached translation, and concurrent identical questions share a
+    # single in-flight Gemini call.
+    compiled = template_translation(user_query)
+    if compiled is not None:
+        return compiled
+
+    if CHAT_SESSIONS_ENABLED and conversation_id:
+        turns = conversation_sessions.turns(conversation_id, user_id)
+        if turns:
+            # Depends on the conversation, so it neither reads nor fills the shared cache
+            sql_translations_total.inc(source="session")
+            chat_session = conversation_sessions.start_chat(turns)
+            prompt = build_sql_turn(user_query, SQL_PROMPT_EXAMPLES, schema_section(user_query))
+            with llm_call("sql"):
+                response = llm_client.send(chat_session, prompt)
+            return extract_sql(response.text), None
+
+    cache_key = translation_key(user_query)
+    generated_query = translation_cache.get(cache_key)
+    if generated_query is not None:
+        sql_translations_total.inc(source="cache")
+        return generated_query, None
+
+    source = ["coalesced"]  # overwritten if this call ends up doing the work itself
+    def generate():
+        cached = translation_cache.get(cache_key)
+        if cached is not None:
+            source[0] = "cache"
+            return cached
+        source[0] = "llm"
+        chat_session = start_chat_session()
+        prompt = build_sql_prompt(user_query, SQL_PROMPT_EXAMPLES, schema_section(user_query))
+        with llm_call("sql"):
+            response = llm_client.send(chat_session, prompt)
+        return remember_translation(cache_key, response.text)
+
+    try:
+        return translation_flight.do(cache_key, generate), None
+    finally:
+        sql_translations_total.inc(source=source[0])
+
+def run_query_pipeline(user_query, conversation_id=None, user_id=None, summarizer_mode=None):
+    # Translate, execute and summarize one question. Returns (nl_response, sql
+    # with its parameters inlined for history). Inside a request the pooled
+    # connection is given back before summarizing; on a batch worker each
+    # query borrows its own connection from the pool.
+    with span("translate"):
+        generated_query, query_params = translate_to_sql(user_query, conversation_id, user_id)
+    with span("execute"):
+        results = execute_query(generated_query, query_params)
+    if isinstance(results, str):
+        forget_translation(user_query, generated_query)
+    if has_request_context():
+        release_db_connection()
+    with span("summarize"):
+        nl_response = summarize_results(user_query, generated_query, results, summarizer_mode)
+    return nl_response, render_sql(generated_query, query_params)
+
+# --- Batch Queries ---
+# One bounded pool for every /query/batch request, so a burst of batches queues
+# here instead of multiplying LLM calls and database connections.
+batch_executor = ThreadPoolExecutor(max_workers=max(1, BATCH_WORKERS), thread_name_prefix="query-batch")
+atexit.register(batch_executor.shutdown, wait=False)
+batch_questions_total = metrics.counter(
+    "chatbot_batch_questions_total", "Questions answered through /query/batch by outcome", ["outcome"])
+
+def run_batch_question(user_query, conversation_id, user_id, summarizer_mode):
+    # Each question gets its own LLM budget, counted from when a worker picks it up
+    _worker_state.llm_deadline = llm_deadline_from_now()
+    try:
+        return run_query_pipeline(user_query, conversation_id, user_id, summarizer_mode)
+    finally:
+        _worker_state.llm_deadline = None
+
+# --- Result Export ---
+# Each running export holds a pooled connection for as long as the client reads
+export_slots = threading.BoundedSemaphore(max(1, EXPORT_MAX_CONCURRENT))
+exports_total = metrics.counter("chatbot_exports_total", "Result exports by format and outcome", ["format", "outcome"])
+export_bytes_total = metrics.counter("chatbot_export_bytes_total", "Bytes streamed by result exports")
 
 # --- Flask App and JWT Decorator ---
 app = Flask(__name__)
-CORS(app)
-app.config['SECRET_KEY'] = 'your-super-secret-key-that-is-long-and-secure' # Replace with a secure key
+CORS(app, expose_headers=["X-Next-Cursor", "X-Request-ID"])
+app.config['SECRET_KEY'] = SECRET_KEY
+
+@app.before_request
+def start_request():
+    g.request_id = accept_request_id(request.headers.get('X-Request-ID'))
+    g.request_started = time.perf_counter()
+    g.spans = []
+    g.llm_deadline = llm_deadline_from_now()
+
+@app.after_request
+def finish_request(response):
+    request_id, spans, started = g.get('request_id', '-'), g.get('spans', []), g.get('request_started')
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    method, status = request.method, response.status_code
+    response.headers['X-Request-ID'] = request_id
+    if spans:
+        response.headers['Server-Timing'] = server_timing(spans)
+    # Recorded once the body is fully sent, so streamed responses include their LLM time;
+    # spans is the same list the generator keeps appending to.
+    response.call_on_close(lambda: record_request(request_id, method, endpoint, status, started, spans))
+    return response
+
+@app.teardown_appcontext
+def release_db_connection(exc=None):
+    # Also called mid-request to give the connection back before slow LLM work
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.putconn(conn)
 
 # THIS IS THE CORRECTED DECORATOR
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].replace('Bearer ', '').strip()
-        
-        if not token:
-            return jsonify({'error': 'Token is missing!'}), 401
-            
-        try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired!'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Token is invalid!'}), 401
+        data, error = verify_token(request.headers.get('Authorization'), current_app.config['SECRET_KEY'])
+        if error:
+            return jsonify({'error': error}), 401
         
         # Pass the decoded payload as the first argument to the decorated function
         return f(data, *args, **kwargs)
@@ -167,25 +433,29 @@ def login():
         if not email or not password:
             return jsonify({"error": "Email and password are required"}), 400
 
-        conn = connect_to_db()
-        if not conn:
+        try:
+            with span("db"), db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id, password FROM users WHERE email = %s;", (email,))
+                    result = cursor.fetchone()
+                conn.rollback()
+        except PoolError as e:
+            logging.error(f"Error connecting to database: {e}")
             return jsonify({"error": "Failed to connect to the database"}), 500
-
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, password FROM users WHERE email = %s;", (email,))
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        release_db_connection()
 
         if result:
             user_id, hashed_pw = result
-            if bcrypt.checkpw(password.encode('utf-8'), hashed_pw.encode('utf-8')):
-                payload = {
-                    'user_id': user_id,
-                    'email': email,
-                    'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-                }
-                token = jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+            try:
+                with span("password_verify"):
+                    matched = password_verifier.verify(password, hashed_pw)
+            except VerifierBusy:
+                logging.warning("Login rejected: password verification pool is saturated")
+                response = jsonify({"error": "Too many login attempts right now. Please try again in a moment."})
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            if matched:
+                token = issue_token(user_id, email, app.config['SECRET_KEY'])
                 return jsonify({"message": "Login successful", "token": token}), 200
 
         return jsonify({"error": "Invalid email or password"}), 401
@@ -200,316 +470,276 @@ def generate_query(current_user): # 'current_user' is now correctly passed from
         data = request.json
         user_query = data.get('query', '')
         conversation_id = data.get('conversationId')
+        if not valid_conversation_id(conversation_id):
+            return jsonify({"error": BAD_CONVERSATION_ID_MESSAGE}), 400
+        if not valid_summarizer_mode(data.get('summarizer')):
+            return jsonify({"error": BAD_SUMMARIZER_MESSAGE}), 400
         
-        prompt = """
-You are an intelligent SQL chatbot connected to a student database management system. Your primary role is to understand natural language queries and generate accurate SQL commands while providing helpful guidance to users.
-
-DATABASE SCHEMA:
-==================
-1. students table:
-   - id (TEXT) - Primary Key
-   - roll_no (TEXT) - Student roll number
-   - name (TEXT) - Student full name
-   - dept (TEXT) - Department code
-   - mailid (TEXT) - Student email address
-   - sem (TEXT) - Current semester
-   - year (INTEGER) - Academic year
-   - speciallab (TEXT) - Special lab assignment
-
-2. subjects table:
-   - id (INTEGER) - Primary Key, Auto-increment
-   - exam_name (TEXT) - Type of examination
-   - course_code (TEXT) - Subject course code
-   - student_id (TEXT) - Foreign Key referencing students.id
-   - subject_name (TEXT) - Name of the subject
-   - total_mark (INTEGER) - Marks obtained
-
-DEPARTMENT CODES:
-================
-- CSE: Computer Science and Engineering
-- ECE: Electronics and Communication Engineering
-- EIE: Electronics and Instrumentation Engineering
-- MECH: Mechanical Engineering
-- CIVIL: Civil Engineering
-- MRTS: Mechatronics Engineering
-- CSBS: Computer Science and Business Systems
-- IT: Information Technology
-- AGRI: Agricultural Engineering
-- ISE: Information Science and Engineering
-NATURAL LANGUAGE UNDERSTANDING RULES:
-======================================
-You must normalize user input by handling:
-1. **Abbreviations & Subject Aliases**:
-   - DS-1 → Data Structures-1
-   - DS → Data Structures
-   - MATHS / MATH → Mathematics
-   - OOPS → Object Oriented Programming
-   - OS → Operating Systems
-   - CT1 → Cycle Test-1
-   - PT1 / PT-1 / Periodic Test 1 / Test 1 → Periodical Test-1
-
-2. **Synonyms & Field Mapping**:
-   - "mark" / "marks" → "total_mark"
-   - "test" → "exam_name"
-   - "subject" → "subject_name"
-
-3. **Variations**:
-   - Accept case-insensitive and partial matches
-   - Convert all user-provided keywords to canonical SQL-friendly values using fuzzy matching or mapping
-
-EXAMPLES:
-=========
-
-User: "Show DS-1 mark for Parthiban in PT1"
-→ Normalize to:
-- subject_name LIKE '%DATA STRUCTURES-1%'
-- exam_name LIKE '%PERIODICAL TEST-1%'
-- total_mark
-
-SQL:
-SELECT s.total_mark FROM subjects s 
-JOIN students st ON s.student_id = st.id 
-WHERE st.name LIKE '%PARTHIBAN%' 
-AND s.subject_name LIKE '%DATA STRUCTURES-1%' 
-AND s.exam_name LIKE '%PERIODICAL TEST-1%';
-
-User: "Get OOPS score of 7376231CS229 in test 1"
-→ Normalize to:
-- subject_name LIKE '%OBJECT ORIENTED PROGRAMMING%'
-- exam_name LIKE '%PERIODICAL TEST-1%'
-- roll_no = '7376231CS229'
-
-SQL:
-SELECT s.total_mark FROM subjects s 
-JOIN students st ON s.student_id = st.id 
-WHERE st.roll_no = '7376231CS229' 
-AND s.subject_name LIKE '%OBJECT ORIENTED PROGRAMMING%' 
-AND s.exam_name LIKE '%PERIODICAL TEST-1%';
-
-QUERY INTERPRETATION GUIDELINES:
-===============================
-1. Use LIKE with wildcards (%) for partial name matches
-2. Use exact matches for specific values (roll numbers, departments)
-3. Always use single quotes for string values
-4. Handle case-insensitive searches appropriately
-5. Join tables when accessing related information
-6. Use appropriate aggregate functions for calculations
-
-COMPREHENSIVE SQL EXAMPLES:
-==========================
-
-BASIC SELECT QUERIES:
---------------------
-User: "Show me all students"
-SQL: SELECT * FROM students;
-
-User: "Give me details of student Parthiban"
-SQL: SELECT * FROM students WHERE name LIKE '%PARTHIBAN%';
-
-User: "Find student with roll number 7376231CS229"
-SQL: SELECT * FROM students WHERE roll_no = '7376231CS229';
-
-User: "Show all CSE students"
-SQL: SELECT * FROM students WHERE dept = 'CSE';
-
-User: "List students in semester 3"
-SQL: SELECT * FROM students WHERE sem = 'S3';
-
-User: "Show students from mechanical department"
-SQL: SELECT * FROM students WHERE dept = 'MECH';
-
-FILTERED AND CONDITIONAL QUERIES:
----------------------------------
-User: "Show CSE students in semester 5"
-SQL: SELECT * FROM students WHERE dept = 'CSE' AND sem = 'S5';
-
-User: "Find all students whose name starts with 'A'"
-SQL: SELECT * FROM students WHERE name LIKE 'A%';
-
-User: "Show students from either CSE or IT department"
-SQL: SELECT * FROM students WHERE dept IN ('CSE', 'IT');
-
-User: "List students not in ECE department"
-SQL: SELECT * FROM students WHERE dept != 'ECE';
-
-SUBJECT AND MARKS QUERIES:
--------------------------
-User: "Show all subjects for student Parthiban"
-SQL: SELECT s.subject_name, s.total_mark, s.exam_name FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%';
-
-User: "Get physics marks of Parthiban"
-SQL: SELECT s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%' AND s.subject_name LIKE '%PHYSICS%';
-
-User: "Show all marks above 80"
-SQL: SELECT st.name, s.subject_name, s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id WHERE s.total_mark > 80;
-
-User: "Students who scored below 50 in any subject"
-SQL: SELECT DISTINCT st.name, st.roll_no FROM subjects s JOIN students st ON s.student_id = st.id WHERE s.total_mark < 50;
-
-AGGREGATE FUNCTIONS AND CALCULATIONS:
-------------------------------------
-User: "Calculate total marks of Parthiban"
-SQL: SELECT SUM(s.total_mark) as total_marks FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%';
-
-User: "Find average marks of Parthiban"
-SQL: SELECT AVG(s.total_mark) as average_marks FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%';
-
-User: "Count total students in CSE"
-SQL: SELECT COUNT(*) as total_students FROM students WHERE dept = 'CSE';
-
-User: "Highest marks in Mathematics"
-SQL: SELECT MAX(s.total_mark) as highest_mark FROM subjects s WHERE s.subject_name LIKE '%MATHEMATICS%';
-
-User: "Department wise student count"
-SQL: SELECT dept, COUNT(*) as student_count FROM students GROUP BY dept;
-
-User: "Average marks by department"
-SQL: SELECT st.dept, AVG(s.total_mark) as avg_marks FROM subjects s JOIN students st ON s.student_id = st.id GROUP BY st.dept;
-
-RANKING AND TOP PERFORMERS:
---------------------------
-User: "Top 5 students by total marks"
-SQL: SELECT st.name, st.roll_no, SUM(s.total_mark) as total_marks FROM subjects s JOIN students st ON s.student_id = st.id GROUP BY st.id, st.name, st.roll_no ORDER BY total_marks DESC LIMIT 5;
-
-User: "Students with marks above average"
-SQL: SELECT st.name, s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id WHERE s.total_mark > (SELECT AVG(total_mark) FROM subjects);
-
-User: "Rank students by average marks"
-SQL: SELECT st.name, AVG(s.total_mark) as avg_marks FROM subjects s JOIN students st ON s.student_id = st.id GROUP BY st.id, st.name ORDER BY avg_marks DESC;
-
-INSERT OPERATIONS:
------------------
-User: "Add student Rahul with roll number 7376231CS230 in CSE department"
-SQL: INSERT INTO students (id, roll_no, name, dept, mailid, sem) VALUES ('7376231CS230', '7376231CS230', 'RAHUL', 'CSE', 'rahul.cs23@bitsathy.ac.in', 'S1');
-
-User: "Add marks for Parthiban in Physics - 85 marks for mid-term"
-SQL: INSERT INTO subjects (student_id, subject_name, total_mark, exam_name, course_code) VALUES ((SELECT id FROM students WHERE name LIKE '%PARTHIBAN%'), 'PHYSICS', 85, 'Mid-term', 'PHY101');
-
-UPDATE OPERATIONS:
------------------
-User: "Update Parthiban's department to IT"
-SQL: UPDATE students SET dept = 'IT' WHERE name LIKE '%PARTHIBAN%';
-
-User: "Update marks of Parthiban in Physics to 90"
-SQL: UPDATE subjects SET total_mark = 90 WHERE student_id = (SELECT id FROM students WHERE name LIKE '%PARTHIBAN%') AND subject_name LIKE '%PHYSICS%';
-
-User: "Change email of student with roll number 7376231CS229"
-SQL: UPDATE students SET mailid = 'newemail@bitsathy.ac.in' WHERE roll_no = '7376231CS229';
-
-DELETE OPERATIONS:
------------------
-User: "Delete student with roll number 7376231CS230"
-SQL: DELETE FROM students WHERE roll_no = '7376231CS230';
-
-User: "Remove all marks records for Parthiban"
-SQL: DELETE FROM subjects WHERE student_id = (SELECT id FROM students WHERE name LIKE '%PARTHIBAN%');
-
-User: "Delete students from CIVIL department"
-SQL: DELETE FROM students WHERE dept = 'CIVIL';
-
-TABLE MODIFICATION (DDL):
-------------------------
-User: "Add GPA column to students table"
-SQL: ALTER TABLE students ADD COLUMN gpa REAL;
-
-User: "Add phone number column"
-SQL: ALTER TABLE students ADD COLUMN phone_number VARCHAR(15);
-
-COMPLEX QUERIES:
----------------
-User: "Students who haven't taken any exams"
-SQL: SELECT st.* FROM students st LEFT JOIN subjects s ON st.id = s.student_id WHERE s.student_id IS NULL;
-
-User: "Subjects where no one scored above 90"
-SQL: SELECT DISTINCT subject_name FROM subjects WHERE subject_name NOT IN (SELECT subject_name FROM subjects WHERE total_mark > 90);
-
-User: "Students with perfect attendance in all subjects"
-SQL: SELECT st.name FROM students st JOIN subjects s ON st.id = s.student_id GROUP BY st.id, st.name HAVING COUNT(DISTINCT s.subject_name) >= 5;
-
-IMPORTANT RULES:
-===============
-1. Always use single quotes for string literals
-2. Use LIKE with % wildcards for partial matches
-3. Join tables appropriately when accessing related data
-4. Handle case variations in user input gracefully
-5. Use appropriate aggregate functions for calculations
-6. Provide meaningful column aliases for better readability
-7. Consider NULL values and empty results
-8. Use DISTINCT when avoiding duplicates is important
-9. Always validate foreign key relationships in JOINs
-10. Use appropriate ORDER BY for sorted results
-
-ERROR HANDLING:
-==============
-- If query is ambiguous, ask for clarification
-- For unsupported operations, suggest alternatives
-- Validate data types and constraints
-- Handle edge cases gracefully
-- Provide helpful error messages
-
-Remember: Generate only the SQL query without additional formatting or explanations unless specifically requested."""
-        chat_session = start_chat_session()
-        response = chat_session.send_message(f"{prompt}\nUser: {user_query}\nSQL:")
-        generated_query = response.text.strip("```sql\n").strip().replace('`', '')
-        
-        results = execute_query(generated_query)
-        nl_response = generate_natural_language_response(user_query, results)
-        
-        conn = connect_to_db()
-        cursor = conn.cursor()
-        
-        # 'current_user' is now defined and contains the token payload
         user_id = current_user['user_id']
+        nl_response, generated_sql = run_query_pipeline(user_query, conversation_id, user_id, data.get('summarizer'))
 
-        new_conversation_details = {}
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
-            title = (user_query[:75] + '...') if len(user_query) > 75 else user_query
-            new_conversation_details = {"id": conversation_id, "title": title}
-        else:
-            cursor.execute("SELECT title FROM chatbot_history WHERE conversation_id = %s LIMIT 1", (conversation_id,))
-            title_row = cursor.fetchone()
-            title = title_row[0] if title_row else "Untitled Chat"
-
-        cursor.execute(
-            "INSERT INTO chatbot_history (user_id, conversation_id, title, user_query, nl_response) VALUES (%s, %s, %s, %s, %s)",
-            (user_id, conversation_id, title, user_query, nl_response)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with span("history"):
+            new_conversation_details = save_chat_history(user_id, conversation_id, user_query, nl_response, generated_sql)
 
         return jsonify({
             "natural_language_response": nl_response,
             "newConversation": new_conversation_details
         })
+    except LLMUnavailable as e:
+        logging.warning(f"Query not answered, LLM unavailable: {e}")
+        response = jsonify({"error": LLM_BUSY_MESSAGE})
+        response.headers['Retry-After'] = '5'
+        return response, 503
     except Exception as e:
         logging.error(f"Error in query generation: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": "An error occurred while processing your query."}), 500
 
+@app.route('/query/batch', methods=['POST'])
+@token_required
+def batch_query(current_user):
+    # Answers up to BATCH_MAX_QUESTIONS questions for one conversation on the
+    # shared batch pool. Results come back in question order; a question that
+    # fails gets an "error" entry instead of failing the batch. Answered turns
+    # are saved to history together.
+    data = request.json or {}
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "questions must be a non-empty list"}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"}), 400
+    if not all(isinstance(question, str) and question.strip() for question in questions):
+        return jsonify({"error": "Every question must be a non-empty string"}), 400
+    conversation_id = data.get('conversationId')
+    if not valid_conversation_id(conversation_id):
+        return jsonify({"error": BAD_CONVERSATION_ID_MESSAGE}), 400
+    summarizer_mode = data.get('summarizer')
+    if not valid_summarizer_mode(summarizer_mode):
+        return jsonify({"error": BAD_SUMMARIZER_MESSAGE}), 400
+    user_id = current_user['user_id']
+
+    if CHAT_SESSIONS_ENABLED and conversation_id:
+        # Load the conversation's context once here rather than once per worker
+        conversation_sessions.turns(conversation_id, user_id)
+    release_db_connection()
+
+    with span("batch"):
+        futures = [
+            batch_executor.submit(run_batch_question, question, conversation_id, user_id, summarizer_mode)
+            for question in questions
+        ]
+        results = []
+        turns = []
+        for index, (question, future) in enumerate(zip(questions, futures)):
+            try:
+                nl_response, generated_sql = future.result()
+            except LLMUnavailable as e:
+                logging.warning(f"Batch question {index} not answered, LLM unavailable: {e}")
+                batch_questions_total.inc(outcome="llm_unavailable")
+                results.append({"query": question, "error": LLM_BUSY_MESSAGE})
+                continue
+            except Exception as e:
+                logging.error(f"Error in batch question {index}: {e}")
+                batch_questions_total.inc(outcome="error")
+                results.append({"query": question, "error": "An error occurred while processing this question."})
+                continue
+            batch_questions_total.inc(outcome="ok")
+            results.append({"query": question, "natural_language_response": nl_response})
+            turns.append((question, nl_response, generated_sql))
+
+    with span("history"):
+        new_conversation_details = save_chat_history_batch(user_id, conversation_id, turns)
+
+    return jsonify({
+        "results": results,
+        "newConversation": new_conversation_details
+    })
+
+@app.route('/query/stream', methods=['POST'])
+@token_required
+def stream_query(current_user):
+    data = request.json or {}
+    user_query = data.get('query', '')
+    conversation_id = data.get('conversationId')
+    if not valid_conversation_id(conversation_id):
+        return jsonify({"error": BAD_CONVERSATION_ID_MESSAGE}), 400
+    summarizer_mode = data.get('summarizer')
+    if not valid_summarizer_mode(summarizer_mode):
+        return jsonify({"error": BAD_SUMMARIZER_MESSAGE}), 400
+    user_id = current_user['user_id']
+
+    def events():
+        try:
+            with span("translate"):
+                generated_query, query_params = translate_to_sql(user_query, conversation_id, user_id)
+            yield sse_event('progress', {"stage": "sql_generated"})
+
+            with span("execute"):
+                results = execute_query(generated_query, query_params)
+            release_db_connection()
+            failed = isinstance(results, str)
+            if failed:
+                forget_translation(user_query, generated_query)
+            yield sse_event('progress', {
+                "stage": "rows_fetched",
+                "rows": 0 if failed else len(results),
+                "truncated": False if failed else results.truncated,
+                "total_rows": None if failed else results.total_rows,
+                "notice": None if failed else results.notice,
+                "error": failed
+            })
+
+            with span("summarize"):
+                local_response = local_summary(user_query, generated_query, results, summarizer_mode)
+            if local_response is not None:
+                nl_response = local_response
+                yield sse_event('token', {"text": nl_response})
+            else:
+                chunks = []
+                for text in stream_natural_language_response(user_query, results, generated_query):
+                    chunks.append(text)
+                    yield sse_event('token', {"text": text})
+                nl_response = ''.join(chunks).strip()
+
+            with span("history"):
+                new_conversation_details = save_chat_history(
+                    user_id, conversation_id, user_query, nl_response, render_sql(generated_query, query_params))
+            yield sse_event('done', {
+                "natural_language_response": nl_response,
+                "newConversation": new_conversation_details
+            })
+        except LLMUnavailable as e:
+            logging.warning(f"Streaming query not answered, LLM unavailable: {e}")
+            yield sse_event('error', {"error": LLM_BUSY_MESSAGE})
+        except Exception as e:
+            logging.error(f"Error in streaming query generation: {str(e)}")
+            yield sse_event('error', {"error": "An error occurred while processing your query."})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/query/export', methods=['POST'])
+@token_required
+def export_query(current_user):
+    # The rows behind a question, streamed straight from PostgreSQL as CSV or
+    # TSV. Nothing is summarized, no row cap applies beyond the cost guard and
+    # EXPORT_STATEMENT_TIMEOUT_MS, and the export is not saved to history.
+    data = request.json or {}
+    user_query = data.get('query', '')
+    export_format = (data.get('format') or 'csv').lower()
+    if not user_query.strip():
+        return jsonify({"error": "query is required"}), 400
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        with span("translate"):
+            translated_query, query_params = translate_to_sql(user_query, data.get('conversationId'), current_user['user_id'])
+    except LLMUnavailable as e:
+        logging.warning(f"Export not started, LLM unavailable: {e}")
+        response = jsonify({"error": LLM_BUSY_MESSAGE})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    generated_query = (translated_query or '').replace('"', "'")
+    if (not generated_query.strip().upper().startswith('SELECT') or is_write(generated_query)
+            or not is_single_statement(generated_query)):
+        return jsonify({"error": "Only questions that read data can be exported."}), 400
+
+    if COST_GUARD_ENABLED:
+        try:
+            with span("cost_guard"), db_connection() as conn:
+                with conn.cursor() as cursor:
+                    decision = cost_guard.check(cursor, generated_query, query_params, limit=False)
+                conn.rollback()
+        except PoolError:
+            return jsonify({"error": "Failed to connect to the database"}), 503
+        if decision.action == 'reject':
+            errors_total.inc(stage="cost_guard")
+            return jsonify({"error": decision.reason}), 400
+    release_db_connection()
+
+    if not export_slots.acquire(blocking=False):
+        response = jsonify({"error": "Too many exports are running. Please try again shortly."})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    export = CopyExport(db_pool, generated_query, query_params, export_format,
+                        chunk_size=EXPORT_CHUNK_SIZE, statement_timeout_ms=EXPORT_STATEMENT_TIMEOUT_MS)
+    try:
+        with span("export_start"):
+            export.start()
+    except Exception as e:
+        export_slots.release()
+        exports_total.inc(format=export_format, outcome="error")
+        if isinstance(e, PoolError):
+            return jsonify({"error": "Failed to connect to the database"}), 503
+        forget_translation(user_query, translated_query)
+        return jsonify({"error": f"Error executing query: {str(e)}"}), 400
+
+    finished = []
+    def finish(outcome):
+        # Runs once, from whichever comes first: the end of the stream or the response closing
+        if finished:
+            return
+        finished.append(outcome)
+        export.close()
+        export_slots.release()
+        exports_total.inc(format=export_format, outcome=outcome)
+        export_bytes_total.inc(export.bytes_sent)
+
+    def chunks():
+        try:
+            yield from export
+        except GeneratorExit:
+            finish("cancelled")
+            raise
+        except Exception:
+            finish("error")
+            raise
+        finish("ok")
+
+    filename = f"export-{datetime.datetime.now():%Y%m%d-%H%M%S}.{export.extension}"
+    response = Response(chunks(), content_type=export.content_type, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    response.call_on_close(lambda: finish("cancelled"))
+    return response
+
+def paginated(items, next_cursor):
+    # Pages keep the plain-list body the client already reads; the cursor for
+    # the next page travels in a header and is absent on the last page.
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 @app.route('/conversations', methods=['GET'])
 @token_required
 def get_conversations(current_user):
+    # Most recently active first. ?limit=N&cursor=<X-Next-Cursor> pages through the rest.
     try:
         user_id = current_user['user_id']
-        conn = connect_to_db()
-        cursor = conn.cursor()
-        
-        # Get the most recent title for each conversation
-        query = """
-            SELECT DISTINCT ON (conversation_id) conversation_id, title
-            FROM chatbot_history
-            WHERE user_id = %s
-            ORDER BY conversation_id, created_at DESC;
-        """
-        cursor.execute(query, (user_id,))
-        conversations = [{"id": str(row[0]), "title": row[1]} for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
-        return jsonify(conversations)
+        limit, after = page_request(request.args, 'cursor', CONVERSATIONS_PAGE_SIZE, MAX_PAGE_SIZE)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        # Make turns still queued for the history writer visible to this read
+        with span("history_flush"):
+            history_writer.flush()
+
+        query, params = conversations_page_query(user_id, limit, after)
+        with span("db"), db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+            conn.rollback()
+
+        return paginated(*conversations_page(rows, limit))
     except Exception as e:
         logging.error(f"Error fetching conversations: {e}")
         return jsonify({"error": "Could not fetch conversations."}), 500
@@ -517,25 +747,76 @@ def get_conversations(current_user):
 @app.route('/conversation/<conversation_id>', methods=['GET'])
 @token_required
 def get_conversation_history(current_user, conversation_id):
+    # The latest ?limit=N turns, oldest first. ?before=<X-Next-Cursor> loads the turns before them.
     try:
         user_id = current_user['user_id']
-        conn = connect_to_db()
-        cursor = conn.cursor()
-        
-        query = "SELECT user_query, nl_response FROM chatbot_history WHERE user_id = %s AND conversation_id = %s ORDER BY created_at ASC"
-        cursor.execute(query, (user_id, conversation_id))
-        
-        messages = []
-        for row in cursor.fetchall():
-            if row[0]: messages.append({"type": "user", "content": row[0]})
-            if row[1]: messages.append({"type": "bot", "content": row[1]})
-        
-        cursor.close()
-        conn.close()
-        return jsonify(messages)
+        limit, before = page_request(request.args, 'before', HISTORY_PAGE_SIZE, MAX_PAGE_SIZE, int)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        with span("history_flush"):
+            history_writer.flush()
+
+        query, params = history_page_query(user_id, conversation_id, limit, before)
+        with span("db"), db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+            conn.rollback()
+
+        return paginated(*history_page(rows, limit))
     except Exception as e:
         logging.error(f"Error fetching conversation history: {e}")
         return jsonify({"error": "Could not fetch conversation history."}), 500
 
+@app.route('/stats/db-pool', methods=['GET'])
+@token_required
+def get_db_pool_stats(current_user):
+    return jsonify(db_pool.stats())
+
+@app.route('/stats/caches', methods=['GET'])
+@token_required
+def get_cache_stats(current_user):
+    return jsonify({
+        "sql_translation": {**translation_cache.stats(), **translation_flight.stats()},
+        "sql_templates": sql_template_stats(),
+        "query_results": result_cache.stats(),
+        "history_writer": history_writer.stats(),
+        "tokens": token_cache.stats(),
+        "chat_sessions": conversation_sessions.stats(),
+    })
+
+@app.route('/stats/auth', methods=['GET'])
+@token_required
+def get_auth_stats(current_user):
+    return jsonify(password_verifier.stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus scrape target
+    if not metrics_authorized(request.headers.get('Authorization')):
+        return jsonify({'error': 'Token is invalid!'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats/cost-guard', methods=['GET'])
+@token_required
+def get_cost_guard_stats(current_user):
+    return jsonify(cost_guard.stats())
+
+@app.route('/stats/llm', methods=['GET'])
+@token_required
+def get_llm_stats(current_user):
+    return jsonify(llm_client.stats())
+
+@app.route('/stats/aggregates', methods=['GET'])
+@token_required
+def get_aggregate_stats(current_user):
+    return jsonify(dict(aggregate_store.stats(), enabled=AGGREGATES_ENABLED))
+
+@app.route('/stats/schema', methods=['GET'])
+@token_required
+def get_schema_stats(current_user):
+    return jsonify(schema_catalog.stats())
+
 if __name__ == '__main__':
     app.run(debug=True, port=3001)
\ No newline at end of file
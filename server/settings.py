@@ -0,0 +1,83 @@
+import os
+
+from dotenv import load_dotenv
+
+# Configuration read from the environment (and server/.env), shared by
+# server.py and async_server.py. Importing it reads settings and nothing else.
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Signs the JWTs of both apps, so a token issued by either is accepted by the other
+SECRET_KEY = 'your-super-secret-key-that-is-long-and-secure' # Replace with a secure key
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))  # 0 = verify on the request thread
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "16"))
+BCRYPT_ACQUIRE_TIMEOUT = float(os.getenv("BCRYPT_ACQUIRE_TIMEOUT", "2"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "60"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "100"))
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.5"))
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))
+HISTORY_ENQUEUE_TIMEOUT = float(os.getenv("HISTORY_ENQUEUE_TIMEOUT", "2"))
+CONVERSATIONS_PAGE_SIZE = int(os.getenv("CONVERSATIONS_PAGE_SIZE", "50"))
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "100"))  # turns per /conversation/<id> page
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+SQL_PROMPT_EXAMPLES = int(os.getenv("SQL_PROMPT_EXAMPLES", "6"))
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "1000"))
+QUERY_FETCH_SIZE = int(os.getenv("QUERY_FETCH_SIZE", "500"))
+QUERY_COUNT_TRUNCATED = os.getenv("QUERY_COUNT_TRUNCATED", "true").lower() == "true"
+COST_GUARD_ENABLED = os.getenv("COST_GUARD_ENABLED", "true").lower() == "true"
+COST_GUARD_MAX_COST = float(os.getenv("COST_GUARD_MAX_COST", "1000000"))
+COST_GUARD_MAX_ROWS = int(os.getenv("COST_GUARD_MAX_ROWS", "10000"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", "5000"))
+SUMMARIZER_MODE = os.getenv("SUMMARIZER_MODE", "auto")  # auto | local | llm
+SUMMARY_PROMPT_MAX_TOKENS = int(os.getenv("SUMMARY_PROMPT_MAX_TOKENS", "2000"))  # budget for results in the summary prompt
+SQL_TEMPLATES_ENABLED = os.getenv("SQL_TEMPLATES_ENABLED", "true").lower() == "true"
+CHAT_SESSIONS_ENABLED = os.getenv("CHAT_SESSIONS_ENABLED", "true").lower() == "true"
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "1000"))
+CHAT_SESSION_MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", str(16 * 1024 * 1024)))
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+CHAT_SESSION_TURNS = int(os.getenv("CHAT_SESSION_TURNS", "10"))
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "10"))  # calls per second, 0 = unlimited
+LLM_BURST = int(os.getenv("LLM_BURST", "20"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "30"))
+LLM_REQUEST_BUDGET = float(os.getenv("LLM_REQUEST_BUDGET", "45"))  # seconds of LLM time per request, 0 = no budget
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "20"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))  # shared by all /query/batch requests
+AGGREGATES_ENABLED = os.getenv("AGGREGATES_ENABLED", "true").lower() == "true"
+AGGREGATE_MAX_STALENESS = float(os.getenv("AGGREGATE_MAX_STALENESS", "30"))
+AGGREGATE_REFRESH_INTERVAL = float(os.getenv("AGGREGATE_REFRESH_INTERVAL", "300"))
+AGGREGATE_REFRESH = os.getenv("AGGREGATE_REFRESH", "true").lower() == "true"  # whether this process may refresh the views
+AGGREGATE_SYNC_INTERVAL = float(os.getenv("AGGREGATE_SYNC_INTERVAL", "2"))
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("EXPORT_STATEMENT_TIMEOUT_MS", "60000"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", "512"))
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", "3600"))
+SCHEMA_CATALOG_TTL = float(os.getenv("SCHEMA_CATALOG_TTL", "300"))  # seconds, 0 = reload only after DDL
+SCHEMA_CATALOG_EXCLUDE = [p.strip() for p in os.getenv("SCHEMA_CATALOG_EXCLUDE", "users,chatbot_*").split(",") if p.strip()]
+SCHEMA_PROMPT_MAX_TABLES = int(os.getenv("SCHEMA_PROMPT_MAX_TABLES", "8"))
+RESULT_CACHE_MAX_ROWS = int(os.getenv("RESULT_CACHE_MAX_ROWS", "50000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # /metrics requires "Authorization: Bearer <token>"
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"  # serve /metrics without a token
+
+# --- Async Serving (async_server.py) ---
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "2"))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "20"))
+ASYNC_BLOCKING_THREADS = int(os.getenv("ASYNC_BLOCKING_THREADS", "16"))
@@ -0,0 +1,49 @@
+# Creates the materialized views behind the aggregate rewrites (aggregates.py),
+# their indexes and the refresh state shared by every server process, then
+# refreshes them. Run it once before enabling AGGREGATES_ENABLED and again after
+# upgrading; it is safe to re-run, and can also be run from cron as the refresher
+# when every server process has AGGREGATE_REFRESH=false. The database user needs
+# CREATE on the schema and, to refresh, must own the views. Connects with the
+# same DB_* settings (environment or .env) as server.py.
+#
+#   python setup_aggregates.py [--no-refresh]
+
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from aggregates import AggregateStore, create_views
+from db_pool import ConnectionPool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and refresh the materialized aggregate views")
+    parser.add_argument("--no-refresh", action="store_true", help="only create what is missing")
+    args = parser.parse_args()
+
+    load_dotenv()
+    pool = ConnectionPool(
+        minconn=1, maxconn=1,
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
+    )
+    try:
+        started = time.perf_counter()
+        with pool.connection() as conn:
+            create_views(conn)
+        print(f"aggregate views ready in {time.perf_counter() - started:.2f}s")
+        if args.no_refresh:
+            return
+        started = time.perf_counter()
+        if not AggregateStore(pool).refresh(force=True):
+            sys.exit("another process is refreshing the aggregate views; try again shortly")
+        print(f"refreshed in {time.perf_counter() - started:.2f}s")
+    finally:
+        pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import re
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_IDENT = r'("?[A-Za-z_][\w$]*"?(?:\s*\.\s*"?[A-Za-z_][\w$]*"?)?)'
+
+_READ_TABLE = re.compile(r"\b(?:from|join)\s+" + _IDENT, re.I)
+_FROM = re.compile(r"\bfrom\b", re.I)
+_LIST_ITEM = re.compile(r"\s*(?:(?:lateral|only)\s+)?" + _IDENT + r'(?![\w$"]|\s*[(.])', re.I)
+_TOKEN = re.compile(r'[(),;]|"[^"]*"|[A-Za-z_][\w$]*')
+_FROM_LIST_END = {
+    "where", "group", "having", "order", "limit", "offset", "union", "intersect", "except", "window", "fetch", "for",
+    "returning",
+}
+_WRITE_TABLE = re.compile(
+    r"\b(?:insert\s+into|update(?:\s+only)?|delete\s+from(?:\s+only)?|"
+    r"alter\s+table(?:\s+if\s+exists)?(?:\s+only)?|drop\s+table(?:\s+if\s+exists)?|"
+    r"truncate(?:\s+table)?(?:\s+only)?|create\s+(?:temp(?:orary)?\s+|unlogged\s+)?table(?:\s+if\s+not\s+exists)?|"
+    r"copy|select\s+.*?\binto)\s+" + _IDENT,
+    re.I | re.S,
+)
+_WRITE_KEYWORD = re.compile(
+    r"\b(insert|update|delete|alter|create|drop|truncate|merge|copy|grant|revoke|vacuum|reindex|cluster|refresh|"
+    r"comment\s+on)\b",
+    re.I,
+)
+_DDL_KEYWORD = re.compile(r"\b(alter|create|drop|comment\s+on)\b", re.I)
+_VOLATILE = re.compile(
+    r"\b(now|random|clock_timestamp|statement_timestamp|timeofday|nextval|setval|currval|gen_random_uuid|"
+    r"current_date|current_time|current_timestamp|localtime|localtimestamp|pg_sleep)\b|\binto\b|\bfor\s+(update|share)\b",
+    re.I,
+)
+_SQL_KEYWORDS = {"select", "lateral", "only", "unnest", "generate_series"}
+_STATEMENT_START = re.compile(r"\s*\(*\s*(select|with|insert|update|delete)\b", re.I)
+
+
+def strip_literals(sql):
+    # Blank out comments and string literals so keywords inside them are never matched
+    return _STRING_LITERAL.sub("''", _COMMENT.sub(" ", sql))
+
+
+def _table_names(pattern, sql):
+    tables = set()
+    for match in pattern.finditer(strip_literals(sql)):
+        name = match.group(1).replace('"', "").replace(" ", "").lower()
+        name = name.split(".")[-1]
+        if name not in _SQL_KEYWORDS:
+            tables.add(name)
+    return tables
+
+
+def _listed_tables(stripped):
+    # Tables after a top-level comma of a FROM list ("FROM students st, subjects s"),
+    # which _READ_TABLE does not see; subqueries in the list are read by _READ_TABLE
+    tables = set()
+    for start in _FROM.finditer(stripped):
+        depth = 0
+        for token in _TOKEN.finditer(stripped, start.end()):
+            text = token.group().lower()
+            if text == "(":
+                depth += 1
+            elif text == ")":
+                depth -= 1
+                if depth < 0:
+                    break
+            elif depth == 0 and (text == ";" or text in _FROM_LIST_END):
+                break
+            elif depth == 0 and text == ",":
+                item = _LIST_ITEM.match(stripped, token.end())
+                if item:
+                    tables.add(item.group(1))
+    return {
+        name.replace('"', "").replace(" ", "").lower().split(".")[-1] for name in tables
+    } - _SQL_KEYWORDS
+
+
+def referenced_tables(sql):
+    return _table_names(_READ_TABLE, sql) | _listed_tables(strip_literals(sql)) | written_tables(sql)
+
+
+def written_tables(sql):
+    return _table_names(_WRITE_TABLE, sql)
+
+
+def is_sql_statement(sql):
+    # Whether model output reads as a statement at all rather than, say, a clarifying question
+    return bool(_STATEMENT_START.match(strip_literals(sql)))
+
+
+def is_single_statement(sql):
+    return ";" not in strip_literals(sql).strip().rstrip(";")
+
+
+def is_write(sql):
+    return bool(_WRITE_KEYWORD.search(strip_literals(sql)))
+
+
+def is_ddl(sql):
+    # Statements that can change which tables and columns exist
+    return bool(_DDL_KEYWORD.search(strip_literals(sql)))
+
+
+def is_cacheable_read(sql):
+    stripped = strip_literals(sql)
+    return (
+        stripped.strip().upper().startswith("SELECT")
+        and is_single_statement(sql)
+        and not _WRITE_KEYWORD.search(stripped)
+        and not _VOLATILE.search(stripped)
+    )
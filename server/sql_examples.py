@@ -0,0 +1,197 @@
+import math
+import re
+from collections import Counter
+
+from nl_normalize import normalize_question
+
+# Few-shot examples for NL->SQL generation. Only the examples most similar to the
+# user's question are placed in the prompt (see build_sql_prompt).
+SQL_EXAMPLES = [
+    # Alias normalization
+    {"category": "alias", "question": "Show DS-1 mark for Parthiban in PT1",
+     "notes": ["subject_name LIKE '%DATA STRUCTURES-1%'", "exam_name LIKE '%PERIODICAL TEST-1%'", "total_mark"],
+     "sql": "SELECT s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%' AND s.subject_name LIKE '%DATA STRUCTURES-1%' AND s.exam_name LIKE '%PERIODICAL TEST-1%';"},
+    {"category": "alias", "question": "Get OOPS score of 7376231CS229 in test 1",
+     "notes": ["subject_name LIKE '%OBJECT ORIENTED PROGRAMMING%'", "exam_name LIKE '%PERIODICAL TEST-1%'", "roll_no = '7376231CS229'"],
+     "sql": "SELECT s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.roll_no = '7376231CS229' AND s.subject_name LIKE '%OBJECT ORIENTED PROGRAMMING%' AND s.exam_name LIKE '%PERIODICAL TEST-1%';"},
+
+    # Basic select queries
+    {"category": "basic", "question": "Show me all students",
+     "sql": "SELECT * FROM students;"},
+    {"category": "basic", "question": "Give me details of student Parthiban",
+     "sql": "SELECT * FROM students WHERE name LIKE '%PARTHIBAN%';"},
+    {"category": "basic", "question": "Find student with roll number 7376231CS229",
+     "sql": "SELECT * FROM students WHERE roll_no = '7376231CS229';"},
+    {"category": "basic", "question": "Show all CSE students",
+     "sql": "SELECT * FROM students WHERE dept = 'CSE';"},
+    {"category": "basic", "question": "List students in semester 3",
+     "sql": "SELECT * FROM students WHERE sem = 'S3';"},
+    {"category": "basic", "question": "Show students from mechanical department",
+     "sql": "SELECT * FROM students WHERE dept = 'MECH';"},
+
+    # Filtered and conditional queries
+    {"category": "filter", "question": "Show CSE students in semester 5",
+     "sql": "SELECT * FROM students WHERE dept = 'CSE' AND sem = 'S5';"},
+    {"category": "filter", "question": "Find all students whose name starts with 'A'",
+     "sql": "SELECT * FROM students WHERE name LIKE 'A%';"},
+    {"category": "filter", "question": "Show students from either CSE or IT department",
+     "sql": "SELECT * FROM students WHERE dept IN ('CSE', 'IT');"},
+    {"category": "filter", "question": "List students not in ECE department",
+     "sql": "SELECT * FROM students WHERE dept != 'ECE';"},
+
+    # Subject and marks queries
+    {"category": "marks", "question": "Show all subjects for student Parthiban",
+     "sql": "SELECT s.subject_name, s.total_mark, s.exam_name FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%';"},
+    {"category": "marks", "question": "Get physics marks of Parthiban",
+     "sql": "SELECT s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%' AND s.subject_name LIKE '%PHYSICS%';"},
+    {"category": "marks", "question": "Show all marks above 80",
+     "sql": "SELECT st.name, s.subject_name, s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id WHERE s.total_mark > 80;"},
+    {"category": "marks", "question": "Students who scored below 50 in any subject",
+     "sql": "SELECT DISTINCT st.name, st.roll_no FROM subjects s JOIN students st ON s.student_id = st.id WHERE s.total_mark < 50;"},
+
+    # Aggregate functions and calculations
+    {"category": "aggregate", "question": "Calculate total marks of Parthiban",
+     "sql": "SELECT SUM(s.total_mark) as total_marks FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%';"},
+    {"category": "aggregate", "question": "Find average marks of Parthiban",
+     "sql": "SELECT AVG(s.total_mark) as average_marks FROM subjects s JOIN students st ON s.student_id = st.id WHERE st.name LIKE '%PARTHIBAN%';"},
+    {"category": "aggregate", "question": "Count total students in CSE",
+     "sql": "SELECT COUNT(*) as total_students FROM students WHERE dept = 'CSE';"},
+    {"category": "aggregate", "question": "Highest marks in Mathematics",
+     "sql": "SELECT MAX(s.total_mark) as highest_mark FROM subjects s WHERE s.subject_name LIKE '%MATHEMATICS%';"},
+    {"category": "aggregate", "question": "Department wise student count",
+     "sql": "SELECT dept, COUNT(*) as student_count FROM students GROUP BY dept;"},
+    {"category": "aggregate", "question": "Average marks by department",
+     "sql": "SELECT st.dept, AVG(s.total_mark) as avg_marks FROM subjects s JOIN students st ON s.student_id = st.id GROUP BY st.dept;"},
+
+    # Ranking and top performers
+    {"category": "ranking", "question": "Top 5 students by total marks",
+     "sql": "SELECT st.name, st.roll_no, SUM(s.total_mark) as total_marks FROM subjects s JOIN students st ON s.student_id = st.id GROUP BY st.id, st.name, st.roll_no ORDER BY total_marks DESC LIMIT 5;"},
+    {"category": "ranking", "question": "Students with marks above average",
+     "sql": "SELECT st.name, s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id WHERE s.total_mark > (SELECT AVG(total_mark) FROM subjects);"},
+    {"category": "ranking", "question": "Rank students by average marks",
+     "sql": "SELECT st.name, AVG(s.total_mark) as avg_marks FROM subjects s JOIN students st ON s.student_id = st.id GROUP BY st.id, st.name ORDER BY avg_marks DESC;"},
+
+    # Insert operations
+    {"category": "insert", "question": "Add student Rahul with roll number 7376231CS230 in CSE department",
+     "sql": "INSERT INTO students (id, roll_no, name, dept, mailid, sem) VALUES ('7376231CS230', '7376231CS230', 'RAHUL', 'CSE', 'rahul.cs23@bitsathy.ac.in', 'S1');"},
+    {"category": "insert", "question": "Add marks for Parthiban in Physics - 85 marks for mid-term",
+     "sql": "INSERT INTO subjects (student_id, subject_name, total_mark, exam_name, course_code) VALUES ((SELECT id FROM students WHERE name LIKE '%PARTHIBAN%'), 'PHYSICS', 85, 'Mid-term', 'PHY101');"},
+
+    # Update operations
+    {"category": "update", "question": "Update Parthiban's department to IT",
+     "sql": "UPDATE students SET dept = 'IT' WHERE name LIKE '%PARTHIBAN%';"},
+    {"category": "update", "question": "Update marks of Parthiban in Physics to 90",
+     "sql": "UPDATE subjects SET total_mark = 90 WHERE student_id = (SELECT id FROM students WHERE name LIKE '%PARTHIBAN%') AND subject_name LIKE '%PHYSICS%';"},
+    {"category": "update", "question": "Change email of student with roll number 7376231CS229",
+     "sql": "UPDATE students SET mailid = 'newemail@bitsathy.ac.in' WHERE roll_no = '7376231CS229';"},
+
+    # Delete operations
+    {"category": "delete", "question": "Delete student with roll number 7376231CS230",
+     "sql": "DELETE FROM students WHERE roll_no = '7376231CS230';"},
+    {"category": "delete", "question": "Remove all marks records for Parthiban",
+     "sql": "DELETE FROM subjects WHERE student_id = (SELECT id FROM students WHERE name LIKE '%PARTHIBAN%');"},
+    {"category": "delete", "question": "Delete students from CIVIL department",
+     "sql": "DELETE FROM students WHERE dept = 'CIVIL';"},
+
+    # Table modification (DDL)
+    {"category": "ddl", "question": "Add GPA column to students table",
+     "sql": "ALTER TABLE students ADD COLUMN gpa REAL;"},
+    {"category": "ddl", "question": "Add phone number column",
+     "sql": "ALTER TABLE students ADD COLUMN phone_number VARCHAR(15);"},
+
+    # Complex queries
+    {"category": "complex", "question": "Students who haven't taken any exams",
+     "sql": "SELECT st.* FROM students st LEFT JOIN subjects s ON st.id = s.student_id WHERE s.student_id IS NULL;"},
+    {"category": "complex", "question": "Subjects where no one scored above 90",
+     "sql": "SELECT DISTINCT subject_name FROM subjects WHERE subject_name NOT IN (SELECT subject_name FROM subjects WHERE total_mark > 90);"},
+    {"category": "complex", "question": "Students with perfect attendance in all subjects",
+     "sql": "SELECT st.name FROM students st JOIN subjects s ON st.id = s.student_id GROUP BY st.id, st.name HAVING COUNT(DISTINCT s.subject_name) >= 5;"},
+]
+
+# Words that tend to appear in questions of each category but not in its examples
+CATEGORY_KEYWORDS = {
+    "alias": "mark score test exam periodical cycle",
+    "basic": "show list details find student",
+    "filter": "where starts either not in semester department",
+    "marks": "marks mark score subject exam scored above below",
+    "aggregate": "total average count sum highest lowest maximum minimum mean wise number how many",
+    "ranking": "top rank best toppers highest order performers first",
+    "insert": "add insert new create enter",
+    "update": "update change set modify edit correct",
+    "delete": "delete remove drop erase",
+    "ddl": "column alter table field add",
+    "complex": "never without any no one all",
+}
+
+# Shown when nothing in the store resembles the question
+DEFAULT_EXAMPLE_QUESTIONS = [
+    "Show DS-1 mark for Parthiban in PT1",
+    "Show all CSE students",
+    "Calculate total marks of Parthiban",
+    "Top 5 students by total marks",
+]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "me", "my", "is", "are", "was", "what", "which",
+    "give", "get", "please", "and", "or", "with", "by", "from", "who", "whose", "all", "s",
+}
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(normalize_question(text)) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """In-process Okapi BM25 index over short documents."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._docs = [Counter(tokenize(d)) for d in documents]
+        self._lengths = [sum(d.values()) for d in self._docs]
+        self._avgdl = (sum(self._lengths) / len(self._lengths)) if self._docs else 0.0
+        df = Counter(term for doc in self._docs for term in doc)
+        n = len(self._docs)
+        self._idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query):
+        terms = set(tokenize(query))
+        scores = []
+        for doc, length in zip(self._docs, self._lengths):
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term)
+                if tf:
+                    denom = tf + self.k1 * (1 - self.b + self.b * length / self._avgdl)
+                    score += self._idf[term] * tf * (self.k1 + 1) / denom
+            scores.append(score)
+        return scores
+
+    def search(self, query, k):
+        scored = [(score, i) for i, score in enumerate(self.scores(query)) if score > 0]
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [i for _, i in scored[:k]]
+
+
+_index = BM25Index([f"{ex['question']} {CATEGORY_KEYWORDS[ex['category']]}" for ex in SQL_EXAMPLES])
+_default_examples = [ex for ex in SQL_EXAMPLES if ex["question"] in DEFAULT_EXAMPLE_QUESTIONS]
+
+
+def select_examples(user_query, k=6):
+    # k=None returns every example, i.e. the original monolithic prompt
+    if k is None:
+        return list(SQL_EXAMPLES)
+    hits = _index.search(user_query, k)
+    if not hits:
+        return _default_examples[:k]
+    return [SQL_EXAMPLES[i] for i in hits]
+
+
+def render_example(example):
+    lines = [f'User: "{example["question"]}"']
+    if example.get("notes"):
+        lines.append("→ Normalize to:")
+        lines.extend(f"- {note}" for note in example["notes"])
+    lines.append(f"SQL: {example['sql']}")
+    return "\n".join(lines)
@@ -0,0 +1,119 @@
+from sql_examples import render_example, select_examples
+
+SQL_PROMPT_INTRO = """
+You are an intelligent SQL chatbot connected to a student database management system. Your primary role is to understand natural language queries and generate accurate SQL commands while providing helpful guidance to users.
+
+"""
+
+# Descriptions for columns that have no COMMENT ON in the database; the
+# tables themselves come from the schema catalog (see schema_catalog.py).
+COLUMN_NOTES = {
+    ("students", "roll_no"): "Student roll number",
+    ("students", "name"): "Student full name",
+    ("students", "dept"): "Department code",
+    ("students", "mailid"): "Student email address",
+    ("students", "sem"): "Current semester",
+    ("students", "year"): "Academic year",
+    ("students", "speciallab"): "Special lab assignment",
+    ("subjects", "exam_name"): "Type of examination or test",
+    ("subjects", "course_code"): "Subject course code",
+    ("subjects", "subject_name"): "Name of the subject",
+    ("subjects", "total_mark"): "Marks or score obtained",
+}
+
+SQL_PROMPT_RULES = """DEPARTMENT CODES:
+================
+- CSE: Computer Science and Engineering
+- ECE: Electronics and Communication Engineering
+- EIE: Electronics and Instrumentation Engineering
+- MECH: Mechanical Engineering
+- CIVIL: Civil Engineering
+- MRTS: Mechatronics Engineering
+- CSBS: Computer Science and Business Systems
+- IT: Information Technology
+- AGRI: Agricultural Engineering
+- ISE: Information Science and Engineering
+NATURAL LANGUAGE UNDERSTANDING RULES:
+======================================
+You must normalize user input by handling:
+1. **Abbreviations & Subject Aliases**:
+   - DS-1 → Data Structures-1
+   - DS → Data Structures
+   - MATHS / MATH → Mathematics
+   - OOPS → Object Oriented Programming
+   - OS → Operating Systems
+   - CT1 → Cycle Test-1
+   - PT1 / PT-1 / Periodic Test 1 / Test 1 → Periodical Test-1
+
+2. **Synonyms & Field Mapping**:
+   - "mark" / "marks" → "total_mark"
+   - "test" → "exam_name"
+   - "subject" → "subject_name"
+
+3. **Variations**:
+   - Accept case-insensitive and partial matches
+   - Convert all user-provided keywords to canonical SQL-friendly values using fuzzy matching or mapping
+
+QUERY INTERPRETATION GUIDELINES:
+===============================
+1. Use LIKE with wildcards (%) for partial name matches
+2. Use exact matches for specific values (roll numbers, departments)
+3. Always use single quotes for string values
+4. Handle case-insensitive searches appropriately
+5. Join tables when accessing related information
+6. Use appropriate aggregate functions for calculations
+
+"""
+
+SQL_PROMPT_FOOTER = """IMPORTANT RULES:
+===============
+1. Always use single quotes for string literals
+2. Use LIKE with % wildcards for partial matches
+3. Join tables appropriately when accessing related data
+4. Handle case variations in user input gracefully
+5. Use appropriate aggregate functions for calculations
+6. Provide meaningful column aliases for better readability
+7. Consider NULL values and empty results
+8. Use DISTINCT when avoiding duplicates is important
+9. Always validate foreign key relationships in JOINs
+10. Use appropriate ORDER BY for sorted results
+
+ERROR HANDLING:
+==============
+- If query is ambiguous, ask for clarification
+- For unsupported operations, suggest alternatives
+- Validate data types and constraints
+- Handle edge cases gracefully
+- Provide helpful error messages
+
+Remember: Generate only the SQL query without additional formatting or explanations unless specifically requested."""
+
+
+def build_sql_prompt(user_query, k=6, schema=""):
+    # Normalization rules are always sent, along with `schema` (the catalog's
+    # rendering of the tables relevant to the question); of the few-shot
+    # examples only the k most similar to the question are (k=None sends all).
+    examples = "\n\n".join(render_example(ex) for ex in select_examples(user_query, k))
+    return (
+        f"{SQL_PROMPT_INTRO}{schema}{SQL_PROMPT_RULES}"
+        f"EXAMPLES:\n=========\n{examples}\n\n"
+        f"{SQL_PROMPT_FOOTER}\nUser: {user_query}\nSQL:"
+    )
+
+
+SQL_SESSION_ACK = "Understood. I will answer each question with a single SQL query and nothing else."
+
+
+def build_sql_primer():
+    # Opening exchange of a conversation's NL->SQL chat: everything in the
+    # prompt that depends on neither the question nor the current schema.
+    return [
+        {"role": "user", "parts": [f"{SQL_PROMPT_INTRO}{SQL_PROMPT_RULES}{SQL_PROMPT_FOOTER}"]},
+        {"role": "model", "parts": [SQL_SESSION_ACK]},
+    ]
+
+
+def build_sql_turn(user_query, k=6, schema=""):
+    # One question in a primed chat, with the tables and examples relevant to it
+    examples = "\n\n".join(render_example(ex) for ex in select_examples(user_query, k))
+    return f"{schema}EXAMPLES:\n=========\n{examples}\n\nUser: {user_query}\nSQL:"
@@ -0,0 +1,211 @@
+import re
+import threading
+from collections import Counter, namedtuple
+
+from nl_normalize import normalize_question
+
+# Compiles the most common question shapes straight to parameterized SQL. A
+# question is only compiled when every slot resolves to a value we are sure of;
+# anything else returns None and goes to the LLM.
+CompiledQuery = namedtuple("CompiledQuery", ["sql", "params", "template"])
+
+DEPARTMENT_CODES = ["cse", "ece", "eie", "mech", "civil", "mrts", "csbs", "it", "agri", "ise"]
+
+_VERB = r"(?:(?:show|list|get|give|display|find|fetch|tell)(?: me)?|what (?:is|are|was|were))"
+_DEPT = r"(?P<dept>" + "|".join(DEPARTMENT_CODES) + r")"
+_SEM = r"(?:semester|sem)[ -]?(?P<sem>\d{1,2})"
+_MARKS = r"(?:marks?|scores?)"
+
+_ROLL_NO = re.compile(r"^\d{5,}[a-z]{1,4}\d{1,4}$")
+_NAME = re.compile(r"^[a-z][a-z.']*(?: [a-z][a-z.']*){0,2}$")
+_SUBJECT = re.compile(r"^[a-z][a-z0-9\-]*(?: [a-z0-9\-]+){0,4}$")
+_NOT_A_VALUE = {
+    "all", "each", "every", "any", "student", "students", "total", "average", "highest", "lowest", "top", "the",
+    "department", "dept", "semester", "subject", "subjects", "exam", "exams", "marks", "mark", "everyone", "class",
+    "show", "list", "get", "give", "display", "find", "fetch", "tell", "what", "me", "is", "are",
+}
+# A slot holding one of these is several values or a condition ("parthiban or
+# logith", "physics above 50"), which a single LIKE filter would answer wrongly
+_CONDITION_WORDS = {"and", "or", "above", "below", "over", "under", "than", "greater", "less"}
+_EXAM_MENTION = re.compile(r"\b(?:periodical test|periodic test|pt|test|cycle test|ct)[ -]?\d\b|\bmid[ -]?term\b")
+
+_EXAMS = [
+    (re.compile(r"^(?:the )?(?:periodical test|periodic test|pt|test)[ -]?(\d)$"), "PERIODICAL TEST-{}"),
+    (re.compile(r"^(?:the )?(?:cycle test|ct)[ -]?(\d)$"), "CYCLE TEST-{}"),
+    (re.compile(r"^(?:the )?mid[ -]?term(?: exam)?$"), "MID-TERM"),
+]
+
+_MARKS_PATTERNS = [
+    # "ds-1 mark for parthiban in pt1"
+    re.compile(rf"^(?:{_VERB} )?(?:the )?(?P<subject>.+?) {_MARKS} (?:of|for|obtained by|scored by) (?P<student>.+?)(?: (?:in|for|during) (?P<exam>.+))?$"),
+    # "marks of parthiban in physics in pt1"
+    re.compile(rf"^(?:{_VERB} )?(?:the )?{_MARKS} (?:of|for|obtained by|scored by) (?P<student>.+?) in (?P<subject>.+?)(?: (?:in|for|during) (?P<exam>.+))?$"),
+]
+_DEPT_STUDENTS_PATTERNS = [
+    re.compile(rf"^(?:{_VERB} )?(?:all )?(?:the )?{_DEPT} (?:department |dept )?students(?: (?:in|of|from) {_SEM})?$"),
+    re.compile(rf"^(?:{_VERB} )?(?:all )?(?:the )?students (?:in|from|of) (?:the )?{_DEPT}(?: department| dept)?(?: (?:in|of|from) {_SEM})?$"),
+]
+_SEM_STUDENTS_PATTERNS = [
+    re.compile(rf"^(?:{_VERB} )?(?:all )?(?:the )?students (?:in|of|from) (?:the )?{_SEM}$"),
+    re.compile(rf"^(?:{_VERB} )?(?:all )?(?:the )?{_SEM} students$"),
+]
+_DEPT_WISE_COUNT_PATTERNS = [
+    re.compile(rf"^(?:{_VERB} )?(?:the )?(?:department|dept)[ -]?wise (?:student |students )?(?:count|strength)(?: of students)?$"),
+    re.compile(rf"^(?:{_VERB} )?(?:the )?(?:number|count) of students (?:in each|per|by|for each) (?:department|dept)$"),
+    re.compile(rf"^(?:{_VERB} )?(?:the )?(?:student|students) count (?:in each|per|by|for each) (?:department|dept)$"),
+    re.compile(r"^how many students (?:are there )?(?:in each|per) (?:department|dept)$"),
+]
+_DEPT_COUNT_PATTERNS = [
+    re.compile(rf"^how many students (?:are there )?(?:are )?(?:in|from) (?:the )?{_DEPT}(?: department| dept)?$"),
+    re.compile(rf"^how many {_DEPT} students (?:are there)?$"),
+    re.compile(rf"^(?:{_VERB} )?(?:the )?count (?:of )?(?:total )?students (?:in|from) (?:the )?{_DEPT}(?: department| dept)?$"),
+    re.compile(rf"^(?:{_VERB} )?(?:the )?(?:number|count) of {_DEPT} students$"),
+]
+_TOP_N_PATTERNS = [
+    re.compile(rf"^(?:{_VERB} )?(?:the )?top (?P<n>\d{{1,3}}) (?:{_DEPT} )?(?:students|performers|rankers|toppers)"
+               rf"(?: (?:by|based on|with|in) (?:their )?(?:total|overall) {_MARKS})?$"),
+]
+
+SQL_MARKS = ("SELECT s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id "
+             "WHERE {student} AND s.subject_name LIKE %s{exam};")
+SQL_EXAM_MARKS = ("SELECT s.subject_name, s.total_mark FROM subjects s JOIN students st ON s.student_id = st.id "
+                  "WHERE {student} AND s.exam_name LIKE %s;")
+SQL_STUDENTS = "SELECT * FROM students WHERE {where};"
+SQL_DEPT_WISE_COUNT = "SELECT dept, COUNT(*) as student_count FROM students GROUP BY dept;"
+SQL_DEPT_COUNT = "SELECT COUNT(*) as total_students FROM students WHERE dept = %s;"
+SQL_TOP_N = ("SELECT st.name, st.roll_no, SUM(s.total_mark) as total_marks FROM subjects s "
+             "JOIN students st ON s.student_id = st.id {where}"
+             "GROUP BY st.id, st.name, st.roll_no ORDER BY total_marks DESC LIMIT %s;")
+
+_stats_lock = threading.Lock()
+template_hits = Counter()
+template_misses = 0
+
+
+def canonical_exam(text):
+    text = (text or "").strip()
+    for pattern, canonical in _EXAMS:
+        match = pattern.match(text)
+        if match:
+            return canonical.format(*match.groups())
+    return None
+
+
+def _is_value(text, pattern):
+    words = text.split()
+    if set(words) & (_NOT_A_VALUE | _CONDITION_WORDS) or any(word.isdigit() for word in words):
+        return False
+    return bool(pattern.match(text)) and not _EXAM_MENTION.search(text)
+
+
+def _student_filter(student):
+    if _ROLL_NO.match(student):
+        return "st.roll_no = %s", student.upper()
+    if _is_value(student, _NAME):
+        return "st.name LIKE %s", f"%{student.upper()}%"
+    return None, None
+
+
+def _compile_marks(text):
+    for pattern in _MARKS_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        student_sql, student_param = _student_filter(match.group("student").strip())
+        if not student_sql:
+            continue
+        subject, exam_text = match.group("subject").strip(), match.group("exam")
+        exam = canonical_exam(exam_text) if exam_text else None
+        if exam_text and not exam:
+            continue
+        if canonical_exam(subject):
+            # "marks of parthiban in pt1": the only qualifier is the exam
+            if exam:
+                continue
+            sql = SQL_EXAM_MARKS.format(student=student_sql)
+            return CompiledQuery(sql, [student_param, f"%{canonical_exam(subject)}%"], "marks_in_exam")
+        if not _is_value(subject, _SUBJECT):
+            continue
+        params = [student_param, f"%{subject.upper()}%"]
+        exam_sql = ""
+        if exam:
+            exam_sql = " AND s.exam_name LIKE %s"
+            params.append(f"%{exam}%")
+        return CompiledQuery(SQL_MARKS.format(student=student_sql, exam=exam_sql), params, "subject_marks")
+    return None
+
+
+def _compile_students(text):
+    for pattern in _DEPT_STUDENTS_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            where, params = "dept = %s", [match.group("dept").upper()]
+            if match.group("sem"):
+                where += " AND sem = %s"
+                params.append(f"S{int(match.group('sem'))}")
+            return CompiledQuery(SQL_STUDENTS.format(where=where), params, "department_students")
+    for pattern in _SEM_STUDENTS_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            return CompiledQuery(SQL_STUDENTS.format(where="sem = %s"), [f"S{int(match.group('sem'))}"], "semester_students")
+    return None
+
+
+def _compile_counts(text):
+    for pattern in _DEPT_WISE_COUNT_PATTERNS:
+        if pattern.match(text):
+            return CompiledQuery(SQL_DEPT_WISE_COUNT, [], "department_wise_count")
+    for pattern in _DEPT_COUNT_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            return CompiledQuery(SQL_DEPT_COUNT, [match.group("dept").upper()], "department_count")
+    return None
+
+
+def _compile_top_n(text):
+    for pattern in _TOP_N_PATTERNS:
+        match = pattern.match(text)
+        if match and 0 < int(match.group("n")) <= 500:
+            where, params = "", []
+            if match.group("dept"):
+                where, params = "WHERE st.dept = %s ", [match.group("dept").upper()]
+            return CompiledQuery(SQL_TOP_N.format(where=where), params + [int(match.group("n"))], "top_n_by_total")
+    return None
+
+
+_COMPILERS = [_compile_counts, _compile_top_n, _compile_students, _compile_marks]
+
+
+def render_sql(sql, params):
+    # Inlines params for display and conversation context only; never executed
+    if not params:
+        return sql
+    literals = [str(p) if isinstance(p, (int, float)) else "'" + str(p).replace("'", "''") + "'" for p in params]
+    parts = sql.split("%s")
+    return "".join(part + (literals[i] if i < len(literals) else "") for i, part in enumerate(parts))
+
+
+def compile_question(user_query):
+    global template_misses
+    text = normalize_question(user_query)
+    for compiler in _COMPILERS:
+        compiled = compiler(text)
+        if compiled is not None:
+            with _stats_lock:
+                template_hits[compiled.template] += 1
+            return compiled
+    with _stats_lock:
+        template_misses += 1
+    return None
+
+
+def stats():
+    with _stats_lock:
+        hits = sum(template_hits.values())
+        total = hits + template_misses
+        return {
+            "hits": hits,
+            "misses": template_misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "by_template": dict(template_hits),
+        }
@@ -0,0 +1,109 @@
+import datetime
+import decimal
+import re
+
+from sql_analysis import strip_literals
+
+# Result shapes simple enough to describe without a second LLM call. Anything
+# else returns None from summarize_locally() so the caller can fall back to Gemini.
+MAX_LOCAL_LIST_ITEMS = 20
+MAX_LOCAL_VALUE_LENGTH = 80
+
+# (statement, message, message when no row was affected)
+_STATEMENT_ACKS = [
+    (re.compile(r"^\s*insert\b", re.I), "The record was added successfully.",
+     "Nothing was added: no rows matched what was to be inserted."),
+    (re.compile(r"^\s*update\b", re.I), "The record was updated successfully.",
+     "No matching record was found, so nothing was updated."),
+    (re.compile(r"^\s*delete\b", re.I), "The record was deleted successfully.",
+     "No matching record was found, so nothing was deleted."),
+    (re.compile(r"^\s*(alter|create|drop|truncate)\b", re.I), "The table structure was updated successfully.", None),
+]
+_LABEL_WORDS = {"avg": "average", "max": "highest", "min": "lowest", "sum": "total", "cnt": "count", "dept": "department",
+                "sem": "semester", "mailid": "email", "roll": "roll", "no": "number"}
+
+
+def format_value(value):
+    if value is None:
+        return "not available"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, (decimal.Decimal, float)):
+        rounded = round(float(value), 2)
+        return str(int(rounded)) if rounded == int(rounded) else f"{rounded:.2f}".rstrip("0")
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def humanize_column(name):
+    words = [w for w in re.split(r"[_\s]+", str(name).lower()) if w]
+    return " ".join(_LABEL_WORDS.get(w, w) for w in words) or "value"
+
+
+def _acknowledge(sql, rowcount):
+    for pattern, message, none_affected in _STATEMENT_ACKS:
+        if pattern.search(strip_literals(sql or "")):
+            if none_affected is None or rowcount is None or rowcount < 0:
+                return message
+            if rowcount == 0:
+                return none_affected
+            return f"{message} ({rowcount} row{'s' if rowcount != 1 else ''} affected)"
+    return None
+
+
+def _describe_row(columns, row):
+    return ", ".join(f"{humanize_column(c)}: {format_value(v)}" for c, v in zip(columns, row))
+
+
+def _truncation_suffix(results):
+    if results.notice:
+        return f"\n({results.notice})"
+    note = results.truncation_note()
+    return f"\n({note.capitalize()}. Ask a narrower question to see the rest.)" if note else ""
+
+
+def _numbered(lines):
+    return "\n".join(f"    {i}.{line}" for i, line in enumerate(lines, 1))
+
+
+def summarize_locally(user_query, sql, results, force=False):
+    """Describe a result without the LLM, or return None if it should go to Gemini.
+
+    With force=True every shape is formatted locally, falling back to one
+    numbered line per row for results the templates do not special-case.
+    """
+    if isinstance(results, str):
+        return f"Sorry, I couldn't answer that. {results}" if force else None
+
+    if not results:
+        ack = _acknowledge(sql, results.rowcount)
+        if ack:
+            return ack
+        return (
+            f'No matching records were found for "{user_query}".\n'
+            "Check the spelling of the student, subject or exam name, or try a broader question "
+            "(for example, leave out the exam or the subject)."
+        )
+
+    columns = results.columns
+    if len(results) == 1 and len(columns) == 1:
+        label = humanize_column(columns[0])
+        return f"{label.capitalize()}: {format_value(results.rows[0][0])}"
+
+    if len(columns) == 1:
+        values = [format_value(value) for value in results.column(0)]
+        simple = not results.truncated and len(values) <= MAX_LOCAL_LIST_ITEMS
+        if force or (simple and all(len(v) <= MAX_LOCAL_VALUE_LENGTH for v in values)):
+            label = humanize_column(columns[0])
+            total = results.total_rows if results.total_rows is not None else len(values)
+            return f"There are {total} results ({label}):\n{_numbered(values)}{_truncation_suffix(results)}"
+        return None
+
+    if force:
+        if len(results) == 1:
+            return f"Here is the result:\n{_describe_row(columns, results.rows[0])}"
+        total = results.total_rows if results.total_rows is not None else len(results)
+        rows = _numbered(_describe_row(columns, row) for row in results)
+        return f"There are {total} results:\n{rows}{_truncation_suffix(results)}"
+    return None
@@ -0,0 +1,268 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from caches import AsyncSingleFlight, ResultCache, SingleFlight, TTLCache
+from nl_normalize import normalize_question
+from sql_analysis import is_cacheable_read, is_sql_statement, referenced_tables, written_tables
+
+# --- Translation cache (question -> SQL) ---
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set("q", "SELECT 1")
+    now[0] += 59
+    assert cache.get("q") == "SELECT 1"
+    now[0] += 1
+    assert cache.get("q") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_discard_keeps_a_newer_value():
+    cache = TTLCache()
+    cache.set("q", "SELECT bad")
+    assert cache.discard("q", "SELECT bad")
+    assert cache.get("q") is None
+    cache.set("q", "SELECT good")
+    assert not cache.discard("q", "SELECT bad")
+    assert cache.get("q") == "SELECT good"
+
+
+@pytest.mark.parametrize("reply", [
+    "SELECT * FROM students",
+    "  with t as (select 1) select * from t",
+    "(SELECT 1) UNION (SELECT 2)",
+    "UPDATE students SET name = 'x' WHERE id = 1",
+    "DELETE FROM marks WHERE id = 1",
+    "insert into marks values (1)",
+])
+def test_statements_are_recognized(reply):
+    assert is_sql_statement(reply)
+
+
+@pytest.mark.parametrize("reply", [
+    "",
+    "Which department do you mean?",
+    "I can only answer questions about student records.",
+    "-- no query\nPlease rephrase",
+    "'select' is not allowed",
+    "DROP TABLE students",
+])
+def test_non_statements_are_not_cached(reply):
+    assert not is_sql_statement(reply)
+
+
+def test_equivalent_questions_share_a_cache_key():
+    key = normalize_question("Show PT1 marks of CSE")
+    assert normalize_question("  show  pt1 marks of cse? ") == key
+    assert normalize_question("Show periodical test-1 marks of computer science and engineering") == key
+    assert normalize_question("Show CT1 marks of CSE") != key
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def translate():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "SELECT 1"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("q", translate)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("q", translate))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == ["SELECT 1"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+
+def test_single_flight_shares_errors_and_does_not_remember_them():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("LLM down")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("q", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert errors == ["LLM down", "LLM down"]
+    assert flight.do("q", lambda: "SELECT 1") == "SELECT 1"
+    assert flight.stats()["executions"] == 2
+
+
+def test_async_single_flight_runs_concurrent_calls_once():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def translate():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "SELECT 1"
+
+        results = await asyncio.gather(*(flight.do("q", translate) for _ in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["SELECT 1"] * 5
+    assert len(calls) == 1
+    assert stats == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+
+def test_async_single_flight_follower_takes_over_from_a_cancelled_leader():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def translate():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "SELECT 1"
+
+        leader = asyncio.create_task(flight.do("q", translate))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("q", translate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        result = await follower
+        return result, leader.cancelled(), len(calls)
+
+    result, leader_cancelled, calls = asyncio.run(scenario())
+    assert leader_cancelled
+    assert result == "SELECT 1"
+    assert calls == 2
+
+
+# --- Result cache (SQL -> rows) ---
+
+
+def test_result_cache_drops_entries_for_written_tables_only():
+    cache = ResultCache()
+    marks_query = "SELECT * FROM marks m JOIN students s ON s.id = m.student_id"
+    cache.set(marks_query, "marks rows", referenced_tables(marks_query), 10, 100)
+    cache.set("SELECT * FROM subjects", "subject rows", {"subjects"}, 10, 100)
+
+    dropped = cache.invalidate_tables(written_tables("UPDATE students SET name = 'x' WHERE id = 1"))
+
+    assert dropped == 1
+    assert cache.get(marks_query) is None
+    assert cache.get("SELECT * FROM subjects") == "subject rows"
+    assert cache.stats()["tables"] == ["subjects"]
+
+
+def test_result_cache_drops_entries_for_every_table_of_a_from_list():
+    cache = ResultCache()
+    query = "SELECT st.name, s.total_mark FROM students st, subjects s WHERE st.id = s.student_id"
+    assert referenced_tables(query) == {"students", "subjects"}
+    cache.set(query, "rows", referenced_tables(query), 10, 100)
+
+    cache.invalidate_tables(written_tables("UPDATE subjects SET total_mark = 0 WHERE id = 1"))
+
+    assert cache.get(query) is None
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("SELECT * FROM students st JOIN marks m ON m.student_id = st.id, subjects s", {"students", "marks", "subjects"}),
+    ("SELECT * FROM (SELECT * FROM marks) m, public.subjects s, LATERAL (SELECT 1 FROM exams) e",
+     {"marks", "subjects", "exams"}),
+    ("SELECT name, dept FROM students, unnest(ids) u ORDER BY name, dept", {"students"}),
+])
+def test_from_lists_are_read_in_full(sql, tables):
+    assert referenced_tables(sql) == tables
+
+
+def test_result_cache_rejects_results_read_before_an_invalidation():
+    cache = ResultCache()
+    generation = cache.generation
+    cache.invalidate_tables({"students"})
+    assert not cache.set("SELECT * FROM subjects", "rows", {"subjects"}, 1, 10, generation)
+    assert cache.get("SELECT * FROM subjects") is None
+    assert cache.set("SELECT * FROM subjects", "rows", {"subjects"}, 1, 10, cache.generation)
+
+
+def test_result_cache_rejects_oversized_and_tableless_results():
+    cache = ResultCache(max_rows=100, max_bytes=1000)
+    assert not cache.set("big", "rows", {"marks"}, 26, 10)
+    assert not cache.set("wide", "rows", {"marks"}, 1, 251)
+    assert not cache.set("SELECT 1", "rows", set(), 1, 10)
+    assert cache.stats()["rejected"] == 3
+
+
+def test_result_cache_evicts_to_stay_within_budget():
+    cache = ResultCache(max_rows=100, max_bytes=10000)
+    for i in range(5):
+        cache.set(f"q{i}", i, {"marks"}, 25, 10)
+    stats = cache.stats()
+    assert stats["rows"] == 100 and stats["evictions"] == 1
+    assert cache.get("q0") is None
+    assert cache.get("q4") == 4
+
+
+def test_result_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl=30)
+    cache.set("SELECT * FROM marks", "rows", {"marks"}, 1, 10)
+    now[0] += 30
+    assert cache.get("SELECT * FROM marks") is None
+    assert cache.stats()["rows"] == 0
+
+
+@pytest.mark.parametrize("sql, cacheable", [
+    ("SELECT * FROM marks", True),
+    ("SELECT * FROM marks WHERE created_at > now()", False),
+    ("SELECT nextval('s')", False),
+    ("SELECT * INTO copy FROM marks", False),
+    ("SELECT 1; DELETE FROM marks", False),
+    ("UPDATE marks SET score = 1", False),
+    ("SELECT 'now()' AS label FROM marks", True),
+])
+def test_only_repeatable_reads_are_cacheable(sql, cacheable):
+    assert is_cacheable_read(sql) == cacheable
@@ -0,0 +1,32 @@
+import base64
+import datetime
+import json
+
+import pytest
+
+from pagination import CursorError, decode_cursor, encode_cursor
+
+
+def crafted(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_cursor_round_trips():
+    at = datetime.datetime(2024, 3, 1, 9, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(at, "conv-1")) == (at, "conv-1")
+    assert decode_cursor(encode_cursor(at, 42), int) == (at, 42)
+
+
+@pytest.mark.parametrize("token, key_type", [
+    (crafted(["2024-03-01T09:30:15", [1, 2]]), str),
+    (crafted(["2024-03-01T09:30:15", {"id": 1}]), str),
+    (crafted(["2024-03-01T09:30:15", "42"]), int),
+    (crafted(["2024-03-01T09:30:15", True]), int),
+    (crafted([1709285415, "conv-1"]), str),
+    (crafted(["yesterday", "conv-1"]), str),
+    (crafted(["2024-03-01T09:30:15"]), str),
+    ("not a cursor", str),
+])
+def test_malformed_cursors_are_rejected(token, key_type):
+    with pytest.raises(CursorError):
+        decode_cursor(token, key_type)
@@ -0,0 +1,139 @@
+import datetime
+import decimal
+
+from query_result import QueryResult
+from result_encoder import DITTO, encode_results, estimate_tokens, format_cell
+
+
+def marks_result(count, **kwargs):
+    rows = [
+        (f"STU{i:05d}", f"Student number {i}", "CSE", "Data Structures-1" if i < count // 2 else "Operating Systems",
+         decimal.Decimal(40 + i % 60))
+        for i in range(count)
+    ]
+    return QueryResult(["student_id", "name", "department", "subject", "marks"], rows, **kwargs)
+
+
+def test_small_result_lists_every_row():
+    text = encode_results(marks_result(6))
+    assert text.startswith("6 rows\n")
+    assert "Columns: student_id | name | subject | marks" in text
+    for i in range(6):
+        assert f"STU{i:05d}" in text
+
+
+def test_token_budget_is_respected():
+    results = marks_result(2000)
+    for budget in (200, 500, 2000):
+        text = encode_results(results, max_tokens=budget)
+        assert estimate_tokens(text) <= budget
+        assert "Column summary:" in text
+
+
+def test_over_budget_lists_leading_rows_and_counts_the_rest():
+    text = encode_results(marks_result(2000), max_tokens=500)
+    lines = text.splitlines()
+    first = next(line for line in lines if line.startswith("First "))
+    shown = int(first.split()[1])
+    assert 0 < shown < 2000
+    assert lines[-1] == f"{2000 - shown} more rows not listed to keep this short."
+    assert "STU00000" in text
+    assert "STU01999" not in text
+
+
+def test_over_budget_summarizes_columns():
+    text = encode_results(marks_result(2000), max_tokens=300)
+    assert "  marks: min 40, max 99, average " in text
+    assert "  student_id: 2000 distinct values" in text
+    assert "  subject: 2 distinct values; most common Data Structures-1 (1000), Operating Systems (1000)" in text
+
+
+def test_constant_columns_are_stated_once():
+    text = encode_results(marks_result(10))
+    assert "Same in every row: department = CSE" in text
+    assert text.count("CSE") == 1
+
+
+def test_repeated_text_collapses_to_ditto():
+    text = encode_results(marks_result(10))
+    rows = text.splitlines()[-10:]
+    assert rows[0].split(" | ")[2] == "Data Structures-1"
+    assert [row.split(" | ")[2] for row in rows[1:5]] == [DITTO] * 4
+    assert rows[5].split(" | ")[2] == "Operating Systems"
+    assert rows[6].split(" | ")[2] == DITTO
+    assert f"({DITTO} means the same value as the row above)" in text
+    assert text.count("Data Structures-1") == 1
+
+
+def test_repeated_numbers_are_not_dittoed():
+    results = QueryResult(["name", "marks"], [("a", 50), ("b", 50), ("c", 50.5)])
+    text = encode_results(results)
+    assert text.splitlines()[-2:] == ["b | 50", "c | 50.5"]
+    assert "means the same value" not in text
+
+
+def test_truncation_is_marked():
+    results = marks_result(100, truncated=True, total_rows=5000)
+    text = encode_results(results)
+    assert text.splitlines()[0] == "100 rows (truncated, showing the first 100 of 5000 total rows)"
+    budgeted = encode_results(results, max_tokens=200)
+    assert budgeted.splitlines()[0] == "100 rows (truncated, showing the first 100 of 5000 total rows)"
+
+
+def test_truncation_without_total_is_marked():
+    text = encode_results(marks_result(1, truncated=True))
+    assert text.splitlines()[0] == "1 row (truncated, showing the first 1 rows)"
+
+
+def test_cost_guard_notice_is_marked():
+    text = encode_results(marks_result(3, truncated=True, notice="limited to 3 rows"))
+    assert text.splitlines()[0] == "3 rows (limited to 3 rows)"
+
+
+def test_single_row_is_one_line():
+    results = QueryResult(["department", "average"], [("ECE", decimal.Decimal("71.456"))])
+    assert encode_results(results) == "department = ECE; average = 71.46"
+
+
+def test_empty_result_names_the_columns():
+    assert encode_results(QueryResult(["a", "b"], [])) == "No rows (columns: a, b)"
+
+
+def test_write_reports_rows_affected():
+    assert encode_results(QueryResult([], [], rowcount=3)) == "The statement affected 3 rows."
+    assert encode_results(QueryResult([], [], rowcount=1)) == "The statement affected 1 row."
+
+
+def test_format_cell():
+    assert format_cell(None) == "NULL"
+    assert format_cell(True) == "yes"
+    assert format_cell(decimal.Decimal("80.00")) == "80"
+    assert format_cell(2.5) == "2.5"
+    assert format_cell(datetime.date(2024, 3, 1)) == "2024-03-01"
+    assert format_cell("a|b\n  c") == "a/b c"
+    assert len(format_cell("x" * 500)) == 120
+
+
+def wide_result(columns, count, constant=0):
+    names = [f"measurement_column_{i}" for i in range(columns)]
+    rows = [
+        tuple("fixed value" if c < constant else f"value {r} of column {c}" for c in range(columns))
+        for r in range(count)
+    ]
+    return QueryResult(names, rows)
+
+
+def test_wide_results_stay_within_the_budget():
+    for budget in (100, 300, 1000):
+        for result in (wide_result(200, 50), wide_result(200, 50, constant=150)):
+            text = encode_results(result, max_tokens=budget)
+            assert estimate_tokens(text) <= budget
+            assert text.splitlines()[0] == "50 rows"
+            assert text.splitlines()[-1] == "50 more rows not listed to keep this short."
+
+
+def test_columns_left_out_of_the_summary_are_counted():
+    text = encode_results(wide_result(200, 50), max_tokens=300)
+    summarized = [line for line in text.splitlines() if line.startswith("  measurement_column_")]
+    assert 0 < len(summarized) < 200
+    assert f"  ({200 - len(summarized)} more columns not summarized)" in text
@@ -0,0 +1,27 @@
+import pytest
+
+from sql_templates import compile_question
+
+
+@pytest.mark.parametrize("question, params", [
+    ("Show DS-1 mark for Parthiban in PT1", ["%PARTHIBAN%", "%DATA STRUCTURES-1%", "%PERIODICAL TEST-1%"]),
+    ("marks of logith in physics in CT1", ["%LOGITH%", "%PHYSICS%", "%CYCLE TEST-1%"]),
+    ("Get physics marks of Parthiban", ["%PARTHIBAN%", "%PHYSICS%"]),
+])
+def test_single_valued_slots_compile(question, params):
+    compiled = compile_question(question)
+    assert compiled.template == "subject_marks"
+    assert compiled.params == params
+
+
+@pytest.mark.parametrize("question", [
+    "show marks of parthiban or logith in physics",
+    "marks of parthiban in physics above 50",
+    "marks of parthiban in physics greater than 50",
+    "marks of parthiban in physics and chemistry",
+    "marks of parthiban in pt1 and ct1",
+    "marks of parthiban in pt1 ct1",
+    "marks of parthiban in physics 2024",
+])
+def test_several_values_or_conditions_go_to_the_llm(question):
+    assert compile_question(question) is None
@@ -0,0 +1,201 @@
+# Bulk user import: reads users from CSV (header row with name, email,
+# password, role) or JSON Lines, hashes their passwords in parallel worker
+# processes and inserts them in one transaction. Rows whose email already
+# exists, or repeats an earlier row, are reported and skipped. Connects with
+# the same DB_* settings (environment or .env) as server.py.
+#
+#   python user_import.py teachers.csv [--rounds 12] [--workers 8] [--strict] [--dry-run]
+#   python user_import.py - --format jsonl < users.jsonl
+
+import argparse
+import concurrent.futures
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import bcrypt
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+INSERT_USERS_SQL = """
+    INSERT INTO users (name, email, password, role) VALUES %s
+    ON CONFLICT (email) DO NOTHING
+    RETURNING email
+"""
+
+
+class UserRow:
+    __slots__ = ("line", "name", "email", "password", "role")
+
+    def __init__(self, line, name, email, password, role):
+        self.line = line
+        self.name = name
+        self.email = email
+        self.password = password
+        self.role = role
+
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def read_records(stream, fmt):
+    # Yields (line number, dict) for every non-blank record
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"invalid JSON: {e}")
+
+
+def parse_users(records, default_role):
+    # Returns (rows to import, [(line, email, problem)]); only the first row for an email is kept
+    rows, problems, seen = [], [], {}
+    for line, record in records:
+        if isinstance(record, Exception):
+            problems.append((line, "", str(record)))
+            continue
+        if not isinstance(record, dict):
+            problems.append((line, "", "expected an object with name, email, password and role"))
+            continue
+        email = str(record.get("email") or "").strip()
+        password = str(record.get("password") or "")
+        if "@" not in email:
+            problems.append((line, email, "missing or invalid email"))
+        elif not password:
+            problems.append((line, email, "missing password"))
+        elif email in seen:
+            problems.append((line, email, f"duplicate of line {seen[email]}"))
+        else:
+            seen[email] = line
+            rows.append(UserRow(line, str(record.get("name") or "").strip(), email, password,
+                                str(record.get("role") or default_role).strip()))
+    return rows, problems
+
+
+def existing_emails(cursor, emails):
+    cursor.execute("SELECT email FROM users WHERE email = ANY(%s)", (list(emails),))
+    return {email for email, in cursor.fetchall()}
+
+
+def hash_passwords(passwords, rounds, workers):
+    if workers <= 1 or len(passwords) < 2:
+        return [hash_password(password, rounds) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 8))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_password, passwords, [rounds] * len(passwords), chunksize=chunksize))
+
+
+def import_users(conn, rows, rounds=12, workers=None, page_size=1000, strict=False, dry_run=False):
+    # Returns (imported, [(line, email, problem)], timings). Everything is
+    # written in one transaction, which is rolled back on dry runs and, with
+    # strict, when any row conflicts with an existing email.
+    workers = workers or os.cpu_count() or 1
+    timings = {}
+    problems = []
+    with conn.cursor() as cursor:
+        # Known conflicts are dropped before hashing, which is where the time goes
+        started = time.perf_counter()
+        taken = existing_emails(cursor, [row.email for row in rows])
+        fresh = []
+        for row in rows:
+            if row.email in taken:
+                problems.append((row.line, row.email, "email already exists"))
+            else:
+                fresh.append(row)
+        timings["check"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        hashes = hash_passwords([row.password for row in fresh], rounds, workers)
+        timings["hash"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        values = [(row.name, row.email, hashed, row.role) for row, hashed in zip(fresh, hashes)]
+        inserted = set()
+        if values:
+            inserted = {email for email, in execute_values(cursor, INSERT_USERS_SQL, values,
+                                                           page_size=page_size, fetch=True)}
+        for row in fresh:
+            if row.email not in inserted:
+                # Created by someone else since the check above
+                problems.append((row.line, row.email, "email already exists"))
+        timings["insert"] = time.perf_counter() - started
+
+    conflicts = any(problem == "email already exists" for _, _, problem in problems)
+    if dry_run or (strict and conflicts):
+        conn.rollback()
+        imported = 0
+    else:
+        conn.commit()
+        imported = len(inserted)
+    problems.sort()
+    return imported, problems, timings
+
+
+def connect():
+    load_dotenv()
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import users from CSV or JSON Lines")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension, else csv")
+    parser.add_argument("--default-role", default="teacher", help="role for rows that do not set one")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="hashing processes (1 = inline)")
+    parser.add_argument("--page-size", type=int, default=1000, help="rows per INSERT statement")
+    parser.add_argument("--strict", action="store_true", help="import nothing if any row is rejected")
+    parser.add_argument("--dry-run", action="store_true", help="validate, hash and insert, then roll back")
+    args = parser.parse_args()
+
+    fmt = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "csv")
+    if args.path == "-":
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+    else:
+        stream = open(args.path, encoding="utf-8-sig", newline="")
+    with stream:
+        rows, problems = parse_users(read_records(stream, fmt), args.default_role)
+
+    if args.strict and problems:
+        imported, db_problems, timings = 0, [], {}
+    else:
+        conn = connect()
+        try:
+            imported, db_problems, timings = import_users(
+                conn, rows, rounds=args.rounds, workers=args.workers, page_size=args.page_size,
+                strict=args.strict, dry_run=args.dry_run,
+            )
+        finally:
+            conn.close()
+    problems = sorted(problems + db_problems)
+
+    for line, email, problem in problems:
+        print(f"line {line}: {email or '-'}: {problem}", file=sys.stderr)
+    timing = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+    verb = "Would import" if args.dry_run else "Imported"
+    print(f"{verb} {len(rows) - len(db_problems) if args.dry_run else imported} users, "
+          f"rejected {len(problems)}" + (f" ({timing})" if timing else ""))
+    if args.strict and problems:
+        print("Nothing was imported (--strict)", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()